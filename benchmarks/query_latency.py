@@ -0,0 +1,149 @@
+"""Query-latency benchmark for the output table indexes.
+
+Builds a synthetic warehouse db shaped like the exporter outputs and times
+typical lookups by job_uuid, bam, fastq and picard_metrics before and after
+building the indexes with ``ensure_indexes`` and ``ANALYZE``.
+
+    python -m benchmarks.query_latency --jobs 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.sqlite import ensure_indexes
+
+QUERIES = [
+    ("fastqc by job_uuid", "fastqc_data_Per_base_sequence_quality", "job_uuid"),
+    ("fastqc by fastq", "fastqc_data_Per_base_sequence_quality", "fastq"),
+    (
+        "picard by picard_metrics",
+        "picard_QualityByCycleMetrics_histogram",
+        "picard_metrics",
+    ),
+    ("picard by bam", "picard_QualityByCycleMetrics_histogram", "bam"),
+    ("star by job_uuid", "star_gene_counts", "job_uuid"),
+    ("star by bam", "star_gene_counts", "bam"),
+]
+
+
+def build_db(path, jobs, batch=1000):
+    """
+    Writes ``jobs`` synthetic jobs in batches with pandas like the exporters.
+    """
+    conn = sqlite3.connect(path)
+    for start in range(0, jobs, batch):
+        fastqc, picard, star = [], [], []
+        for j in range(start, min(start + batch, jobs)):
+            job, bam, fq = "job{0}".format(j), "s{0}.bam".format(j), "s{0}.fq".format(j)
+            for base in range(50):
+                fastqc.append(
+                    {
+                        "Base": base,
+                        "Mean": 30.0,
+                        "job_uuid": job,
+                        "fastq": fq,
+                        "fastqc_zip": fq + "_fastqc.zip",
+                    }
+                )
+            for cycle in range(150):
+                for col in ["MEAN_QUALITY", "MEAN_ORIGINAL_QUALITY"]:
+                    picard.append(
+                        {
+                            "job_uuid": job,
+                            "picard_metrics": bam + ".qbc.txt",
+                            "bam": bam,
+                            "CYCLE": cycle,
+                            "colname": col,
+                            "value": 30.0,
+                        }
+                    )
+            for strand in ["unstranded", "first_strand", "second_strand"]:
+                for cat in ["N_genes", "N_unmapped", "N_multimapping"]:
+                    star.append(
+                        {
+                            "category": cat,
+                            "value": 1,
+                            "strand": strand,
+                            "star_file": bam + ".ReadsPerGene.out.tab",
+                            "bam": bam,
+                            "job_uuid": job,
+                        }
+                    )
+        with conn:
+            for table, rows in [
+                ("fastqc_data_Per_base_sequence_quality", fastqc),
+                ("picard_QualityByCycleMetrics_histogram", picard),
+                ("star_gene_counts", star),
+            ]:
+                pd.DataFrame(rows).to_sql(table, conn, if_exists="append")
+    return conn
+
+
+def time_queries(conn, jobs, nqueries):
+    """
+    Returns the median latency in milliseconds of each lookup.
+    """
+    rng = random.Random(0)
+    res = {}
+    for label, table, col in QUERIES:
+        times = []
+        for _ in range(nqueries):
+            j = rng.randrange(jobs)
+            value = {
+                "job_uuid": "job{0}".format(j),
+                "bam": "s{0}.bam".format(j),
+                "fastq": "s{0}.fq".format(j),
+                "picard_metrics": "s{0}.bam.qbc.txt".format(j),
+            }[col]
+            start = time.perf_counter()
+            conn.execute(
+                'SELECT * FROM "{0}" WHERE "{1}" = ?'.format(table, col), (value,)
+            ).fetchall()
+            times.append((time.perf_counter() - start) * 1000.0)
+        res[label] = statistics.median(times)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        conn = build_db(path, args.jobs)
+        print(
+            "Built {0} jobs in {1:.1f}s".format(args.jobs, time.perf_counter() - start)
+        )
+
+        before = time_queries(conn, args.jobs, args.queries)
+
+        start = time.perf_counter()
+        with conn:
+            ensure_indexes(conn)
+        conn.execute("ANALYZE")
+        print("Indexed in {0:.1f}s".format(time.perf_counter() - start))
+
+        after = time_queries(conn, args.jobs, args.queries)
+        conn.close()
+
+        print("{0:<28}{1:>14}{2:>14}".format("query", "scan (ms)", "indexed (ms)"))
+        for label, _, _ in QUERIES:
+            print(
+                "{0:<28}{1:>14.3f}{2:>14.3f}".format(label, before[label], after[label])
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
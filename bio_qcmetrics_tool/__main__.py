@@ -1,8 +1,5 @@
 """Main entrypoint for all modules."""
 import argparse
-import importlib
-import inspect
-import pkgutil
 from signal import SIG_DFL, SIGPIPE, signal
 
 from bio_qcmetrics_tool.utils.logger import Logger
@@ -22,38 +19,50 @@ def main(args=None, extra_subparser=None):
     # Set up logger
     Logger.setup_root_logger()
 
-    parser = argparse.ArgumentParser("bio_qcmetrics_tool")
+    parser = build_parser()
+    options = parser.parse_args(args)
+    cls = options.func(options)
+    cls.run()
+
+
+def build_parser(parser_class=argparse.ArgumentParser):
+    """
+    Builds the full CLI argument parser. Subparsers are created with the
+    same ``parser_class``.
+    """
+    parser = parser_class("bio_qcmetrics_tool")
     parser.add_argument('--version', action='version', version=__version__)
     main_subparsers = parser.add_subparsers(dest="main_subcommand")
     main_subparsers.required = True
 
     add_export_tools(main_subparsers)
+    add_commands(main_subparsers)
+    return parser
 
-    options = parser.parse_args()
-    cls = options.func(options)
-    cls.do_work()
+
+def add_commands(subparsers):
+    """
+    Add the subcommands that are not exporters.
+    """
+    from bio_qcmetrics_tool.commands import COMMANDS
+
+    for cmd in COMMANDS:
+        cmd.add(subparsers=subparsers)
 
 
 def add_export_tools(subparsers):
     """
     Dynamically load all export tools.
     """
-    from bio_qcmetrics_tool.modules.base import ExportQcModule
-
-    def predicate(obj):
-        return inspect.isclass(obj) and issubclass(obj, ExportQcModule)
+    from bio_qcmetrics_tool.api import exporters
 
     export_parser = subparsers.add_parser(
         name="export", description="Export metrics files into a standardized format"
     )
     export_parser_sps = export_parser.add_subparsers(dest="subcommand")
     export_parser_sps.required = True
-    mod = importlib.import_module("bio_qcmetrics_tool.modules")
-    for p in pkgutil.walk_packages(mod.__path__, mod.__name__ + "."):
-        if p[2]:
-            curr = importlib.import_module(p[1])
-            for m in inspect.getmembers(curr, predicate):
-                m[1].add(subparsers=export_parser_sps)
+    for cls in exporters().values():
+        cls.add(subparsers=export_parser_sps)
 
 
 if __name__ == "__main__":
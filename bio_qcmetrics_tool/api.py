@@ -0,0 +1,267 @@
+"""In-process Python API of the exporters.
+
+Each ``export_*`` function takes the same options as its ``export`` subcommand
+as keyword arguments and a ``sink`` that decides where the metrics go:
+
+* ``None`` returns the list of
+  `~bio_qcmetrics_tool.modules.table.MetricTable` objects of the export,
+  including the ``qc_flags`` table when ``rules`` is given.
+* A `sqlite3.Connection` appends the tables to the connection within its
+  transaction, opening one if needed, and never commits. The caller must
+  commit, or may roll the export back. A failed export is rolled back
+  without touching earlier writes of the caller.
+* A path writes the output file like the CLI, in ``export_format``
+  (``"sqlite"`` unless given). ``journal`` and ``resume`` are only supported
+  with a path.
+
+Example::
+
+    from bio_qcmetrics_tool import api
+
+    tables = api.export_picard(inputs=["x.metrics"], job_uuid="uuid")
+    df = tables[0].to_frame()
+"""
+import argparse
+import importlib
+import inspect
+import pkgutil
+import sqlite3
+
+__all__ = [
+    "exporters",
+    "export",
+    "export_fastqc",
+    "export_picard",
+    "export_readgroup",
+    "export_samtools_flagstat",
+    "export_samtools_idxstats",
+    "export_samtools_stats",
+    "export_star",
+    "export_tenx_barcode_metrics",
+    "export_tenx_matrix_metrics",
+    "export_tenx_scrna_metrics",
+]
+
+_EXPORTERS = None
+
+
+def exporters():
+    """
+    Returns a dict of all exporter classes by subcommand name, e.g.,
+    ``"picardmetrics"``.
+    """
+    global _EXPORTERS
+    if _EXPORTERS is None:
+        from bio_qcmetrics_tool.modules.base import ExportQcModule
+
+        def predicate(obj):
+            return inspect.isclass(obj) and issubclass(obj, ExportQcModule)
+
+        found = dict()
+        mod = importlib.import_module("bio_qcmetrics_tool.modules")
+        for p in pkgutil.walk_packages(mod.__path__, mod.__name__ + "."):
+            if p[2]:
+                curr = importlib.import_module(p[1])
+                for _, cls in inspect.getmembers(curr, predicate):
+                    found[cls.__get_name__().replace("export", "")] = cls
+        _EXPORTERS = found
+    return _EXPORTERS
+
+
+def _option_actions(cls):
+    parser = argparse.ArgumentParser()
+    subparser = cls.add(subparsers=parser.add_subparsers())
+    return [
+        action
+        for action in subparser._actions
+        if action.dest != argparse.SUPPRESS and action.dest != "help"
+    ]
+
+
+def default_options(cls):
+    """
+    Returns the default value of every command-line option of an exporter.
+    """
+    return {action.dest: action.default for action in _option_actions(cls)}
+
+
+def list_options(cls):
+    """
+    Returns the names of the command-line options of an exporter that take
+    a list, i.e., that may be given more than once or take several values.
+    """
+    return set(
+        action.dest
+        for action in _option_actions(cls)
+        if isinstance(action, argparse._AppendAction) or action.nargs in ("+", "*")
+    )
+
+
+def export(tool, sink=None, **options):
+    """
+    Runs the exporter named ``tool`` in this process.
+
+    :param tool: the exporter subcommand name, e.g., ``"picardmetrics"``
+    :param sink: None, a `sqlite3.Connection` or an output path
+    :param options: the command-line options of the exporter. A single value
+        of an option that may be given more than once is a one-element list.
+    :returns: the list of metric tables when ``sink`` is None, else None
+    """
+    try:
+        cls = exporters()[tool]
+    except KeyError:
+        raise ValueError(
+            "Unknown exporter {0}. Choose from {1}".format(
+                tool, ", ".join(sorted(exporters()))
+            )
+        )
+
+    opts = default_options(cls)
+    unknown = set(options) - set(opts)
+    if unknown:
+        raise TypeError(
+            "Unknown options for {0}: {1}".format(tool, ", ".join(sorted(unknown)))
+        )
+    opts.update(options)
+    opts.pop("func", None)
+    # Like the CLI, list options are lists even when given a single value
+    for name in list_options(cls):
+        if opts[name] is None:
+            opts[name] = []
+        elif not isinstance(opts[name], (list, tuple)):
+            opts[name] = [opts[name]]
+        else:
+            opts[name] = list(opts[name])
+
+    if (opts.get("journal") or opts.get("resume")) and (
+        sink is None or isinstance(sink, sqlite3.Connection)
+    ):
+        raise ValueError("journal and resume require an output path sink")
+
+    if isinstance(sink, sqlite3.Connection):
+        from bio_qcmetrics_tool.utils.sqlite import savepoint
+
+        opts["export_format"] = None
+        obj = cls(options=opts)
+        obj.do_work()
+        obj._sqlite_conn = sink
+        try:
+            with savepoint(sink, "api_export"):
+                obj.export_to("sqlite", obj.output_tables())
+        finally:
+            obj._sqlite_conn = None
+    elif sink is not None:
+        opts["output"] = sink
+        opts["export_format"] = opts.get("export_format") or "sqlite"
+        cls(options=opts).run()
+    else:
+        opts["export_format"] = None
+        obj = cls(options=opts)
+        obj.do_work()
+        return obj.output_tables()
+
+
+def export_fastqc(inputs, job_uuid, sink=None, **options):
+    """Extract FastQC report from zip archive(s)."""
+    return export("fastqc", sink=sink, inputs=inputs, job_uuid=job_uuid, **options)
+
+
+def export_picard(inputs, job_uuid, derived_from_file=None, sink=None, **options):
+    """Extract Picard metrics."""
+    return export(
+        "picardmetrics",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        derived_from_file=derived_from_file,
+        **options,
+    )
+
+
+def export_readgroup(inputs, job_uuid, bam, sink=None, **options):
+    """Extract readgroup metadata."""
+    return export(
+        "readgroup", sink=sink, inputs=inputs, job_uuid=job_uuid, bam=bam, **options
+    )
+
+
+def export_samtools_flagstat(inputs, job_uuid, bam, sink=None, **options):
+    """Extract samtools flagstats metrics."""
+    return export(
+        "samtoolsflagstats",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        bam=bam,
+        **options,
+    )
+
+
+def export_samtools_idxstats(inputs, job_uuid, bam, sink=None, **options):
+    """Extract samtools idxstats metrics."""
+    return export(
+        "samtoolsidxstats",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        bam=bam,
+        **options,
+    )
+
+
+def export_samtools_stats(input, job_uuid, bam, sink=None, **options):
+    """Extract samtools stats metrics."""
+    return export(
+        "samtoolsstats", sink=sink, input=input, job_uuid=job_uuid, bam=bam, **options
+    )
+
+
+def export_star(
+    job_uuid, bam, final_log_inputs=None, gene_counts_inputs=None, sink=None, **options
+):
+    """Extract STAR logs/gene counts metrics."""
+    return export(
+        "starstats",
+        sink=sink,
+        job_uuid=job_uuid,
+        bam=bam,
+        final_log_inputs=final_log_inputs,
+        gene_counts_inputs=gene_counts_inputs,
+        **options,
+    )
+
+
+def export_tenx_scrna_metrics(inputs, job_uuid, bam, sink=None, **options):
+    """Extract 10x scrna metrics."""
+    return export(
+        "tenxscrnametrics",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        bam=bam,
+        **options,
+    )
+
+
+def export_tenx_barcode_metrics(inputs, job_uuid, bam, sink=None, **options):
+    """Extract distributions from 10x per-barcode metrics."""
+    return export(
+        "tenxbarcodemetrics",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        bam=bam,
+        **options,
+    )
+
+
+def export_tenx_matrix_metrics(inputs, job_uuid, bam, sink=None, **options):
+    """Extract per-cell QC from 10x Matrix Market output."""
+    return export(
+        "tenxmatrixmetrics",
+        sink=sink,
+        inputs=inputs,
+        job_uuid=job_uuid,
+        bam=bam,
+        **options,
+    )
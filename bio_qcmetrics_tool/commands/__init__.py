@@ -0,0 +1,9 @@
+"""Subcommands that operate on exporters or their outputs"""
+from __future__ import absolute_import  # noqa: F401
+
+from .index import BuildIndexes  # noqa: F401
+from .merge import MergeOutputs  # noqa: F401
+from .serve import ExportServer  # noqa: F401
+from .watch import WatchFolders  # noqa: F401
+
+COMMANDS = [ExportServer, WatchFolders, MergeOutputs, BuildIndexes]
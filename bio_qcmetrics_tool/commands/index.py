@@ -0,0 +1,56 @@
+"""Build indexes and planner statistics on an output db in bulk."""
+import sqlite3
+
+from bio_qcmetrics_tool.modules.base import Subcommand
+from bio_qcmetrics_tool.utils.sqlite import ensure_indexes
+
+
+class BuildIndexes(Subcommand):
+    """Create the natural key and lookup indexes of all tables and ANALYZE"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="index", options=options)
+
+    @classmethod
+    def __get_name__(cls):
+        return "index"
+
+    @classmethod
+    def __get_description__(cls):
+        return (
+            "Create natural key and lookup indexes on all tables of a sqlite db "
+            "and refresh the query planner statistics."
+        )
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-o", "--output", required=True, help="The path to the sqlite db"
+        )
+
+        subparser.add_argument(
+            "--unique",
+            action="store_true",
+            help="Create the natural key indexes as UNIQUE indexes.",
+        )
+
+        subparser.add_argument(
+            "--no_analyze",
+            action="store_true",
+            help="Don't run ANALYZE after building the indexes.",
+        )
+
+    def do_work(self):
+        super().do_work()
+
+        conn = sqlite3.connect(self.options["output"])
+        try:
+            with conn:
+                created = ensure_indexes(conn, unique=self.options.get("unique"))
+            self.logger.info("Created {0} indexes".format(len(created)))
+            if not self.options.get("no_analyze"):
+                self.logger.info("Running ANALYZE")
+                conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        return created
@@ -0,0 +1,304 @@
+"""Merge many per-job sqlite outputs into a single db.
+
+Sources are ATTACHed and copied with ``INSERT ... SELECT`` so rows never
+pass through Python. Missing tables and columns are added to the target,
+and rows of a (job_uuid, source file) already present in the target are
+skipped. The per-(job_uuid, bam) ``sample_qc_summary`` rows are combined by
+upsert and the ``qc_metric_sketches`` get the summary values that were not in
+the target yet (or, for dbs without a summary, are merged whole). Journal and
+quarantine rows already in the target are kept.
+Large merges are split into chunks that are pre-merged in parallel
+processes and then reduced in a tree.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from bio_qcmetrics_tool.modules.base import Subcommand
+from bio_qcmetrics_tool.utils.journal import JOURNAL_TABLE, QUARANTINE_TABLE
+from bio_qcmetrics_tool.utils.logger import Logger
+from bio_qcmetrics_tool.utils.sketch import (
+    SKETCH_TABLE,
+    attached_summary_rows,
+    merge_sketches,
+    new_summary_values,
+    update_sketches,
+)
+from bio_qcmetrics_tool.utils.sqlite import (
+    SAMPLE_SUMMARY_TABLE,
+    ensure_indexes,
+    get_source_key,
+    get_table_columns,
+    quote,
+)
+
+
+class SqliteMerger:
+    """Copies the tables of source sqlite dbs into a target db"""
+
+    def __init__(self, target, dedup=True, fast=False):
+        """
+        :param target: path to the target sqlite db
+        :param dedup: skip rows of a (job_uuid, source) already in the target
+        :param fast: disable journaling, for temporary pre-merge dbs
+        """
+        self.logger = Logger.get_logger(self.__class__.__name__)
+        self.target = target
+        self.dedup = dedup
+        self.conn = sqlite3.connect(target, isolation_level=None)
+        if fast:
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+        self.max_attached = self.conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        self.columns = dict()
+        for (name,) in self.conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type='table'"
+        ):
+            self.columns[name] = get_table_columns(self.conn, name)
+
+    def close(self):
+        self.conn.close()
+
+    def merge(self, sources):
+        """
+        Merges all sources, attaching as many as sqlite allows per transaction.
+        """
+        for i in range(0, len(sources), self.max_attached):
+            self._merge_group(sources[i : i + self.max_attached])
+
+    def _merge_group(self, sources):
+        aliases = []
+        for i, src in enumerate(sources):
+            alias = "src{0}".format(i)
+            self.conn.execute("ATTACH DATABASE ? AS {0}".format(alias), (src,))
+            aliases.append(alias)
+
+        try:
+            self.conn.execute("BEGIN")
+            for alias in aliases:
+                self._merge_source(alias)
+            self.conn.execute("COMMIT")
+        except Exception:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            for alias in aliases:
+                self.conn.execute("DETACH DATABASE {0}".format(alias))
+
+    def _merge_source(self, alias):
+        tables = self.conn.execute(
+            "SELECT name, sql FROM {0}.sqlite_master "
+            "WHERE type='table' AND name NOT LIKE 'sqlite_%'".format(alias)
+        ).fetchall()
+        sketch_values = None
+        names = [name for name, _ in tables]
+        if SKETCH_TABLE in names and SAMPLE_SUMMARY_TABLE in names:
+            # Before the summary upsert, to skip rows already merged
+            sketch_values = new_summary_values(
+                self.conn, attached_summary_rows(self.conn, alias)
+            )
+        for name, sql in tables:
+            src_cols = get_table_columns(self.conn, name, schema=alias)
+            self._reconcile(name, sql, alias, src_cols)
+            self._copy(name, alias, src_cols, sketch_values)
+
+    def _reconcile(self, name, sql, alias, src_cols):
+        """
+        Creates the table in the target or adds the columns it is missing.
+        """
+        if name not in self.columns:
+            # The stored statement is unqualified so it creates the table in main
+            self.conn.execute(sql)
+            self.columns[name] = list(src_cols)
+            # The natural key index starts with (job_uuid, source) and is
+            # used for deduplication
+            ensure_indexes(self.conn, [name])
+            return
+
+        info = self.conn.execute(
+            "PRAGMA {0}.table_info({1})".format(alias, quote(name))
+        ).fetchall()
+        for row in info:
+            col, ctype = row[1], row[2]
+            if col not in self.columns[name]:
+                self.conn.execute(
+                    "ALTER TABLE main.{0} ADD COLUMN {1} {2}".format(
+                        quote(name), quote(col), ctype
+                    )
+                )
+                self.columns[name].append(col)
+
+    def _copy(self, name, alias, src_cols, sketch_values=None):
+        cols = ", ".join(quote(c) for c in src_cols)
+        sql = "INSERT INTO main.{0} ({1}) SELECT {1} FROM {2}.{0} AS s".format(
+            quote(name), cols, alias
+        )
+        if name == SAMPLE_SUMMARY_TABLE:
+            # One row per (job_uuid, bam): fill in the metrics of each source
+            # without clearing those of tools missing from it. `WHERE true`
+            # avoids a parsing ambiguity of upserts with a SELECT.
+            updates = [
+                "{0} = COALESCE(excluded.{0}, {0})".format(quote(c))
+                for c in src_cols
+                if c not in ("job_uuid", "bam")
+            ]
+            sql += " WHERE true ON CONFLICT(job_uuid, bam) DO {0}".format(
+                "UPDATE SET " + ", ".join(updates) if updates else "NOTHING"
+            )
+            self.conn.execute(sql)
+            return
+
+        if name == SKETCH_TABLE:
+            # One row per metric, combined in Python
+            if sketch_values is None:
+                merge_sketches(self.conn, alias)
+            else:
+                update_sketches(self.conn, sketch_values)
+            return
+
+        if name in (JOURNAL_TABLE, QUARANTINE_TABLE):
+            # Keyed by (tool, job_uuid, input) instead of a source column
+            self.conn.execute(sql.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1))
+            return
+
+        key = get_source_key(src_cols)
+        if self.dedup and key:
+            sql += " WHERE NOT EXISTS (SELECT 1 FROM main.{0} AS m WHERE {1})".format(
+                quote(name),
+                " AND ".join("m.{0} IS s.{0}".format(quote(c)) for c in key),
+            )
+        self.conn.execute(sql)
+
+
+def merge_dbs(target, sources, dedup=True, fast=False, analyze=False):
+    """
+    Merges the source dbs into the target db and optionally refreshes the
+    query planner statistics.
+    """
+    merger = SqliteMerger(target, dedup=dedup, fast=fast)
+    try:
+        merger.merge(sources)
+        if analyze:
+            merger.conn.execute("ANALYZE")
+    finally:
+        merger.close()
+    return target
+
+
+def _premerge(args):
+    """
+    Process pool entrypoint that merges a chunk into a temporary db.
+    """
+    target, sources, dedup = args
+    return merge_dbs(target, sources, dedup=dedup, fast=True)
+
+
+class MergeOutputs(Subcommand):
+    """Merge many sqlite outputs into one db"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="merge", options=options)
+
+    @classmethod
+    def __get_name__(cls):
+        return "merge"
+
+    @classmethod
+    def __get_description__(cls):
+        return "Merge many per-job sqlite outputs into a single sqlite db."
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-i",
+            "--inputs",
+            action="append",
+            default=[],
+            help="Input sqlite db. May be used one or more times",
+        )
+
+        subparser.add_argument(
+            "--input_list",
+            help="File with the paths of input sqlite dbs, one per line.",
+        )
+
+        subparser.add_argument(
+            "-o", "--output", required=True, help="The path to the target sqlite db"
+        )
+
+        subparser.add_argument(
+            "--threads",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of parallel pre-merge processes.",
+        )
+
+        subparser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=500,
+            help="Number of dbs merged by each pre-merge task.",
+        )
+
+        subparser.add_argument(
+            "--no_dedup",
+            action="store_true",
+            help="Do not skip rows of a job_uuid/source already in the target.",
+        )
+
+    def do_work(self):
+        super().do_work()
+
+        inputs = list(self.options.get("inputs") or [])
+        if self.options.get("input_list"):
+            with open(self.options["input_list"], "rt") as fh:
+                inputs.extend(line.strip() for line in fh if line.strip())
+
+        if not inputs:
+            msg = "You must provide at least one --inputs or --input_list"
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        self.logger.info("Merging {0} sqlite dbs...".format(len(inputs)))
+        self.merge(inputs)
+
+    def merge(self, inputs):
+        """
+        Pre-merges chunks of the inputs in parallel, level by level, until a
+        single chunk is left and merges that into the output.
+        """
+        dedup = not self.options.get("no_dedup", False)
+        threads = self.options.get("threads", 1)
+        chunk_size = max(self.options.get("chunk_size", 500), 2)
+
+        tmpdir = tempfile.mkdtemp(
+            dir=os.path.dirname(os.path.abspath(self.options["output"]))
+        )
+        try:
+            level = inputs
+            depth = 0
+            while threads > 1 and len(level) > chunk_size:
+                tasks = []
+                for i in range(0, len(level), chunk_size):
+                    target = os.path.join(
+                        tmpdir, "level{0}_{1}.db".format(depth, len(tasks))
+                    )
+                    tasks.append((target, level[i : i + chunk_size], dedup))
+                self.logger.info(
+                    "Pre-merging {0} dbs in {1} chunks".format(len(level), len(tasks))
+                )
+                with ProcessPoolExecutor(max_workers=threads) as executor:
+                    merged = list(executor.map(_premerge, tasks))
+
+                if depth > 0:
+                    for fil in level:
+                        os.remove(fil)
+                level = merged
+                depth += 1
+
+            merge_dbs(self.options["output"], level, dedup=dedup, analyze=True)
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,217 @@
+"""Long-running export server.
+
+Keeps one interpreter warm with all exporters loaded and runs export
+requests received over HTTP on a UNIX socket (or a local TCP port). A
+request has the same arguments as the CLI::
+
+    curl --unix-socket /tmp/qc.sock -X POST http://localhost/export \\
+        -d '{"args": ["export", "samtoolsflagstats", "-i", "x.flagstat",
+                      "-j", "uuid", "-b", "x.bam",
+                      "--export_format", "sqlite", "-o", "out.db"]}'
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import socketserver
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bio_qcmetrics_tool.modules.base import Subcommand
+from bio_qcmetrics_tool.modules.exceptions import InvalidRequestException
+from bio_qcmetrics_tool.utils.sqlite import SqliteConnectionPool
+
+
+class RequestArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser that raises instead of exiting the server process"""
+
+    def error(self, message):
+        raise InvalidRequestException(message)
+
+    def exit(self, status=0, message=None):
+        raise InvalidRequestException(
+            message or "Exited with status {0}".format(status)
+        )
+
+    def _print_message(self, message, file=None):
+        pass
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """HTTP server listening on a UNIX socket"""
+
+    daemon_threads = True
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP client connection over a UNIX socket"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ExportRequestHandler(BaseHTTPRequestHandler):
+    """Handles ``POST /export`` and ``GET /health``"""
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._respond(200, {"status": "ok"})
+        else:
+            self._respond(404, {"status": "error", "error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/export":
+            self._respond(404, {"status": "error", "error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            args = body["args"]
+            if not isinstance(args, list):
+                raise InvalidRequestException("'args' must be a list")
+        except (ValueError, KeyError, InvalidRequestException) as e:
+            self._respond(
+                400, {"status": "error", "error": "Bad request: {0}".format(e)}
+            )
+            return
+
+        code, result = self.server.app.submit(args)
+        self._respond(code, result)
+
+    def _respond(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        self.server.app.logger.debug(format % args)
+
+
+class ExportServer(Subcommand):
+    """Serve export requests from a warm interpreter"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="serve", options=options)
+        self.parser = None
+        self.pool = None
+        self.executor = None
+
+    @classmethod
+    def __get_name__(cls):
+        return "serve"
+
+    @classmethod
+    def __get_description__(cls):
+        return (
+            "Serve export requests over HTTP on a UNIX socket or local port "
+            "using a warm interpreter, a worker pool and pooled sqlite connections."
+        )
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        group = subparser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--socket", help="Path of the UNIX socket to listen on.")
+        group.add_argument("--port", type=int, help="TCP port to listen on.")
+
+        subparser.add_argument(
+            "--host",
+            default="127.0.0.1",
+            help="Address to bind when using --port.",
+        )
+
+        subparser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of concurrent export workers.",
+        )
+
+    def do_work(self):
+        super().do_work()
+
+        server = self.make_server()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.logger.info("Shutting down")
+        finally:
+            self.close(server)
+
+    def make_server(self):
+        """
+        Loads all exporters, starts the worker pool and binds the server.
+        """
+        from bio_qcmetrics_tool.__main__ import build_parser
+
+        self.parser = build_parser(parser_class=RequestArgumentParser)
+        self.pool = SqliteConnectionPool()
+        self.executor = ThreadPoolExecutor(max_workers=self.options["workers"])
+
+        if self.options.get("socket"):
+            path = self.options["socket"]
+            if os.path.exists(path):
+                os.remove(path)
+            server = ThreadingUnixHTTPServer(path, ExportRequestHandler)
+            self.logger.info("Listening on UNIX socket {0}".format(path))
+        else:
+            server = ThreadingHTTPServer(
+                (self.options["host"], self.options["port"]), ExportRequestHandler
+            )
+            self.logger.info("Listening on {0}:{1}".format(*server.server_address[:2]))
+        server.app = self
+        return server
+
+    def close(self, server):
+        server.server_close()
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+        if self.options.get("socket") and os.path.exists(self.options["socket"]):
+            os.remove(self.options["socket"])
+
+    def submit(self, args):
+        """
+        Runs the export request on the worker pool and returns the HTTP status
+        code and response payload.
+        """
+        future = self.executor.submit(self.run_export, args)
+        return future.result()
+
+    def run_export(self, args):
+        start = time.monotonic()
+        if not args or args[0] != "export":
+            args = ["export"] + list(args)
+
+        try:
+            options = self.parser.parse_args([str(i) for i in args])
+        except InvalidRequestException as e:
+            return 400, {"status": "error", "error": str(e)}
+
+        try:
+            exporter = options.func(options)
+            exporter.connection_pool = self.pool
+            exporter.run()
+        except Exception as e:
+            self.logger.exception("Export request failed: {0}".format(args))
+            return 500, {
+                "status": "error",
+                "error": "{0}: {1}".format(e.__class__.__name__, e),
+            }
+
+        elapsed = time.monotonic() - start
+        self.logger.info("Export request finished in {0:.3f}s".format(elapsed))
+        return 200, {"status": "ok", "elapsed": elapsed}
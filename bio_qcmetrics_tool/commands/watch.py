@@ -0,0 +1,318 @@
+"""Watch-folder incremental ingestion.
+
+Polls one or more directory trees for new metrics files, waits until they
+are complete (unchanged over two scans and older than ``--settle`` seconds)
+and exports each batch of arrivals into the output db in a single
+transaction. A small JSON state file records what has already been ingested.
+"""
+import fnmatch
+import json
+import os
+import time
+
+from bio_qcmetrics_tool.modules.base import Subcommand
+from bio_qcmetrics_tool.modules.fastqc import ExportFastqc
+from bio_qcmetrics_tool.modules.picard import ExportPicardMetrics
+from bio_qcmetrics_tool.modules.readgroups import ExportReadgroup
+from bio_qcmetrics_tool.modules.samtools import (
+    ExportSamtoolsFlagstats,
+    ExportSamtoolsIdxstats,
+    ExportSamtoolsStats,
+)
+from bio_qcmetrics_tool.modules.scrna import ExportTenXScrnaMetrics
+from bio_qcmetrics_tool.modules.star import ExportStarStats
+from bio_qcmetrics_tool.utils.prefetch import DEFAULT_WORKERS, prefetch
+from bio_qcmetrics_tool.utils.sqlite import SharedTransaction
+
+
+def infer_bam(fname):
+    """
+    Guesses the bam a metrics file was derived from using its name: anything
+    up to ``.bam`` if present, otherwise the part before the first dot.
+    """
+    if ".bam" in fname:
+        return fname[: fname.index(".bam") + 4]
+    for suffix in ["Log.final.out", "ReadsPerGene.out.tab"]:
+        if fname.endswith(suffix):
+            return fname[: -len(suffix)].rstrip("._") + ".bam"
+    return fname.split(".")[0] + ".bam"
+
+
+# File name suffixes of Picard metrics, e.g., ``x.alignment_summary_metrics``,
+# ``x.marked_dup_metrics.txt``, ``x.metrics`` or ``x.rnaseqmetrics.txt``
+PICARD_PATTERNS = (
+    "*_metrics",
+    "*_metrics.txt",
+    "*.metrics",
+    "*.metrics.txt",
+    "*.rnaseqmetrics.txt",
+    "*.RNA_Metrics",
+)
+
+# Ordered list of (filename glob or tuple of globs, exporter class, options
+# builder). The first matching rule wins.
+WATCH_RULES = [
+    ("*_fastqc.zip", ExportFastqc, lambda p, bam: {"inputs": [p]}),
+    (
+        "*Log.final.out",
+        ExportStarStats,
+        lambda p, bam: {
+            "final_log_inputs": [p],
+            "gene_counts_inputs": [],
+            "bam": [bam],
+        },
+    ),
+    (
+        "*ReadsPerGene.out.tab",
+        ExportStarStats,
+        lambda p, bam: {
+            "final_log_inputs": [],
+            "gene_counts_inputs": [p],
+            "bam": [bam],
+        },
+    ),
+    ("*flagstat*", ExportSamtoolsFlagstats, lambda p, bam: {"inputs": [p], "bam": bam}),
+    ("*idxstat*", ExportSamtoolsIdxstats, lambda p, bam: {"inputs": [p], "bam": bam}),
+    ("*samtools_stats*", ExportSamtoolsStats, lambda p, bam: {"input": p, "bam": bam}),
+    (
+        "*metrics_summary.csv",
+        ExportTenXScrnaMetrics,
+        lambda p, bam: {"inputs": [p], "bam": bam},
+    ),
+    (
+        PICARD_PATTERNS,
+        ExportPicardMetrics,
+        lambda p, bam: {"inputs": [p], "derived_from_file": bam},
+    ),
+    ("*readgroup*.json", ExportReadgroup, lambda p, bam: {"inputs": [p], "bam": bam}),
+    ("*.ndjson", ExportReadgroup, lambda p, bam: {"inputs": [p], "bam": bam}),
+]
+
+
+def match_rule(fname):
+    """
+    Returns the (exporter class, options builder) for a file name or None.
+    """
+    for patterns, cls, builder in WATCH_RULES:
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        if any(fnmatch.fnmatch(fname, pattern) for pattern in patterns):
+            return cls, builder
+    return None
+
+
+class WatchFolders(Subcommand):
+    """Incrementally ingest new metrics files from watched directories"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="watch", options=options)
+        self.state = {"ingested": dict(), "failed": dict()}
+        self.pending = dict()
+
+    @classmethod
+    def __get_name__(cls):
+        return "watch"
+
+    @classmethod
+    def __get_description__(cls):
+        return (
+            "Watch directories for new metrics files and export them "
+            "incrementally into a sqlite db."
+        )
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-d",
+            "--directory",
+            action="append",
+            required=True,
+            help="Directory to watch recursively. May be used one or more times",
+        )
+
+        subparser.add_argument(
+            "-o", "--output", required=True, help="The path to the output sqlite db"
+        )
+
+        subparser.add_argument(
+            "--state",
+            help="Path to the state file of ingested inputs. "
+            "Defaults to <output>.watch.json",
+        )
+
+        subparser.add_argument(
+            "-j",
+            "--job_uuid",
+            help="The job uuid of all inputs. Defaults to the name of the "
+            "directory holding each file.",
+        )
+
+        subparser.add_argument(
+            "-b",
+            "--bam",
+            help="The bam of all inputs. Defaults to a name derived from each file.",
+        )
+
+        subparser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds between directory scans.",
+        )
+
+        subparser.add_argument(
+            "--settle",
+            type=float,
+            default=5.0,
+            help="Seconds a file must be unmodified before it is ingested.",
+        )
+
+        subparser.add_argument(
+            "--prefetch",
+            type=int,
+            default=DEFAULT_WORKERS,
+            metavar="THREADS",
+            help="Number of threads reading each batch of new files concurrently.",
+        )
+
+        subparser.add_argument(
+            "--once",
+            action="store_true",
+            help="Scan twice, --interval seconds apart, ingest completed files "
+            "and exit.",
+        )
+
+    def do_work(self):
+        super().do_work()
+
+        self.load_state()
+        try:
+            if self.options.get("once"):
+                # Files must be unchanged over two scans
+                self.poll()
+                time.sleep(self.options["interval"])
+            while True:
+                ready = self.poll()
+                if ready:
+                    self.ingest(ready)
+                if self.options.get("once"):
+                    break
+                time.sleep(self.options["interval"])
+        except KeyboardInterrupt:
+            self.logger.info("Stopped watching")
+
+    def state_path(self):
+        return self.options.get("state") or self.options["output"] + ".watch.json"
+
+    def load_state(self):
+        path = self.state_path()
+        if os.path.exists(path):
+            with open(path, "rt") as fh:
+                self.state = json.load(fh)
+
+    def save_state(self):
+        path = self.state_path()
+        tmp = path + ".tmp"
+        with open(tmp, "wt") as fh:
+            json.dump(self.state, fh)
+        os.replace(tmp, path)
+
+    def scan(self):
+        """
+        Yields (path, stat) for all candidate files under the watched dirs.
+        """
+        stack = list(self.options["directory"])
+        while stack:
+            curr = stack.pop()
+            try:
+                entries = list(os.scandir(curr))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and match_rule(entry.name):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        # Removed since the directory was listed
+                        continue
+                    yield entry.path, st
+
+    def poll(self):
+        """
+        Scans the directories and returns the paths of new files that are
+        complete, i.e., seen with the same size and modification time by the
+        previous scan and older than the settle time. Files seen for the first
+        time are never complete, since a copy that preserves the modification
+        time may still be in progress.
+        """
+        now = time.time()
+        settle = self.options.get("settle", 5.0)
+        ready = []
+        seen = dict()
+        for path, st in self.scan():
+            sig = [st.st_size, st.st_mtime_ns]
+            seen[path] = sig
+            if self.state["ingested"].get(path) == sig:
+                continue
+            if self.state["failed"].get(path, [None, None])[:2] == sig:
+                continue
+            if self.pending.get(path) != sig:
+                continue
+            if now - st.st_mtime >= settle:
+                ready.append(path)
+        self.pending = seen
+        return sorted(ready)
+
+    def exporter_options(self, path):
+        """
+        Builds the exporter class and options for an input file.
+        """
+        fname = os.path.basename(path)
+        cls, builder = match_rule(fname)
+        job_uuid = self.options.get("job_uuid") or os.path.basename(
+            os.path.dirname(os.path.abspath(path))
+        )
+        bam = self.options.get("bam") or infer_bam(fname)
+        options = {
+            "job_uuid": job_uuid,
+            "export_format": "sqlite",
+            "output": self.options["output"],
+        }
+        options.update(builder(path, bam))
+        return cls, options
+
+    def ingest(self, paths):
+        """
+        Reads a batch of files concurrently, exports them in one transaction
+        and records them in the state file once committed. Files that fail,
+        including ones removed or unreadable since they were polled, are
+        recorded as failed and don't stop the batch.
+        """
+        self.logger.info("Ingesting {0} new files".format(len(paths)))
+        ingested = dict()
+        failed = dict()
+        buffers = prefetch(paths, workers=self.options.get("prefetch", DEFAULT_WORKERS))
+        with SharedTransaction(self.options["output"]) as txn:
+            for path in paths:
+                try:
+                    cls, options = self.exporter_options(path)
+                    exporter = cls(options=options)
+                    exporter.connection_pool = txn
+                    if path in buffers:
+                        exporter.prefetched[path] = buffers[path]
+                    exporter.do_work()
+                    ingested[path] = self.pending[path]
+                except Exception as e:
+                    self.logger.error("Failed to ingest {0}: {1}".format(path, e))
+                    failed[path] = self.pending[path] + [str(e)]
+
+        self.state["ingested"].update(ingested)
+        self.state["failed"].update(failed)
+        for path in ingested:
+            self.state["failed"].pop(path, None)
+        self.save_state()
+        return ingested, failed
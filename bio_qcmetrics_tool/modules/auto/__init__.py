@@ -0,0 +1,3 @@
+from __future__ import absolute_import  # noqa: F401
+
+from .export_auto import ExportAuto  # noqa: F401
@@ -0,0 +1,190 @@
+"""QC Module for exporting a mix of metrics files with detected types"""
+import os
+
+from bio_qcmetrics_tool.modules.auto.sniff import KINDS, SNIFF_SIZE, classify, read_head
+from bio_qcmetrics_tool.modules.base import ExportQcModule
+from bio_qcmetrics_tool.modules.exceptions import ParserException
+
+
+class ExportAuto(ExportQcModule):
+    """Detect the type of metrics files and export them with their exporters"""
+
+    input_options = ["inputs"]
+    cacheable = True
+
+    # Options passed on to the exporters that have them
+    SHARED_OPTIONS = ["cache_dir", "cache_size", "layout"]
+
+    def __init__(self, options=dict()):
+        super().__init__(name="auto", options=options)
+        self.exporters = []
+        self._files = None
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-i",
+            "--inputs",
+            action="append",
+            required=True,
+            help="Input metrics file, directory or tar archive. Directories are "
+            "searched recursively. May be used one or more times",
+        )
+
+        subparser.add_argument(
+            "-j",
+            "--job_uuid",
+            type=str,
+            required=True,
+            help="The job uuid associated with the inputs.",
+        )
+
+        subparser.add_argument(
+            "-b",
+            "--bam",
+            type=str,
+            help="The bam file associated with the inputs. Required by the "
+            "samtools and STAR exporters.",
+        )
+
+        subparser.add_argument(
+            "--layout",
+            choices=["long", "wide"],
+            default="long",
+            help="The --layout of the exporters that have one.",
+        )
+
+    @classmethod
+    def __get_description__(cls):
+        return "Detect the type of metrics files and export them."
+
+    @staticmethod
+    def walk(path):
+        """
+        Yields the paths of all regular files under a directory.
+        """
+        stack = [path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in sorted(entries, key=lambda i: i.name):
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path
+
+    def input_paths(self):
+        """
+        Returns the input files, with directories replaced by the files
+        they contain. The walk is cached until the inputs change, e.g., when
+        archives are expanded.
+        """
+        inputs = super().input_paths()
+        if self._files is None or self._files[0] != inputs:
+            files = []
+            for path in inputs:
+                if path in self.prefetched or not os.path.isdir(path):
+                    files.append(path)
+                else:
+                    files.extend(self.walk(path))
+            self._files = (inputs, files)
+        return self._files[1]
+
+    def journal_units(self):
+        return [
+            ("inputs", index, path) for index, path in enumerate(self.input_paths())
+        ]
+
+    def classify_path(self, path):
+        """
+        Returns the kind of a metrics file from its first bytes.
+        """
+        data = self.prefetched.get(path)
+        head = data[:SNIFF_SIZE] if data is not None else read_head(path)
+        return classify(head)
+
+    def do_work(self):
+        super().do_work()
+
+        groups = dict()
+        for path in self.input_paths():
+            kind = self.classify_path(path)
+            if kind is None:
+                self.logger.info("Skipping unrecognized file {0}".format(path))
+                continue
+            tool, option = KINDS[kind]
+            groups.setdefault(tool, dict()).setdefault(option, []).append(path)
+
+        self.logger.info(
+            "Detected {0}".format(
+                ", ".join(
+                    "{0} {1}".format(sum(len(v) for v in opts.values()), tool)
+                    for tool, opts in groups.items()
+                )
+                or "no metrics files"
+            )
+        )
+        for tool, inputs in groups.items():
+            self.run_exporter(tool, inputs)
+
+        self.export()
+
+    def run_exporter(self, tool, inputs):
+        """
+        Parses the inputs with an exporter, keeping its tables for export.
+        Single-input exporters are run once per file.
+        """
+        from bio_qcmetrics_tool.api import default_options, exporters
+
+        cls = exporters()[tool]
+        defaults = default_options(cls)
+        defaults.pop("func", None)
+        bam = self.options.get("bam")
+        if "bam" in defaults and not bam:
+            raise ParserException("--bam is required to export {0} files".format(tool))
+
+        runs = [inputs]
+        if "input" in inputs:
+            runs = [{"input": path} for path in inputs["input"]]
+        for run in runs:
+            paths = [
+                path
+                for value in run.values()
+                for path in (value if isinstance(value, list) else [value])
+            ]
+            opts = dict(defaults)
+            for name in cls.input_options:
+                if opts.get(name) is None and name != "input":
+                    opts[name] = []
+            opts.update(run)
+            opts["job_uuid"] = self.options["job_uuid"]
+            opts["export_format"] = None
+            for name in self.SHARED_OPTIONS:
+                if name in opts:
+                    opts[name] = self.options.get(name, opts[name])
+            if "bam" in opts:
+                # STAR takes one bam per input file
+                opts["bam"] = [bam] * len(paths) if tool == "starstats" else bam
+            if "derived_from_file" in opts:
+                opts["derived_from_file"] = bam
+
+            obj = cls(options=opts)
+            obj.prefetched = {
+                path: self.prefetched[path] for path in paths if path in self.prefetched
+            }
+            obj.do_work()
+            if self.streams_rows():
+                # Written right away rather than kept for the export
+                self.to_jsonl(obj.export_tables())
+            else:
+                self.exporters.append(obj)
+
+    def metric_tables(self):
+        for obj in self.exporters:
+            yield from obj.export_tables()
+
+    def sample_summary(self):
+        summary = dict()
+        for obj in self.exporters:
+            for bam, values in obj.sample_summary().items():
+                summary.setdefault(bam, dict()).update(values)
+        return summary
@@ -0,0 +1,89 @@
+"""Classification of metrics files from their first bytes"""
+import re
+import struct
+import zlib
+
+# Number of bytes read from the start of each file
+SNIFF_SIZE = 4096
+
+ZIP_MAGIC = b"PK\003\004"
+GZIP_MAGIC = b"\037\213"
+
+# (exporter subcommand, input option) of each kind of file
+KINDS = {
+    "fastqc": ("fastqc", "inputs"),
+    "picard": ("picardmetrics", "inputs"),
+    "star_log": ("starstats", "final_log_inputs"),
+    "star_gene_counts": ("starstats", "gene_counts_inputs"),
+    "flagstat": ("samtoolsflagstats", "inputs"),
+    "idxstats": ("samtoolsidxstats", "inputs"),
+    "samtools_stats": ("samtoolsstats", "input"),
+}
+
+FLAGSTAT_RE = re.compile(r"^\d+ \+ \d+ in total")
+STAR_LOG_LABELS = ("Started job on |", "Number of input reads |")
+PICARD_HEADERS = ("## htsjdk.samtools.metrics", "## METRICS CLASS")
+
+
+def read_head(path, size=SNIFF_SIZE):
+    """
+    Returns the first ``size`` bytes of a file.
+    """
+    with open(path, "rb") as fh:
+        return fh.read(size)
+
+
+def _zip_first_name(head):
+    if len(head) < 30:
+        return ""
+    name_len = struct.unpack("<H", head[26:28])[0]
+    return head[30 : 30 + name_len].decode("utf-8", errors="replace")
+
+
+def _is_idxstats(lines):
+    if not lines:
+        return False
+    for line in lines:
+        cols = line.split("\t")
+        if len(cols) != 4 or not all(col.isdigit() for col in cols[1:]):
+            return False
+    return True
+
+
+def classify(head):
+    """
+    Returns the kind of metrics file (a key of `KINDS`) starting with the
+    ``head`` bytes, or None when it is not recognized.
+    """
+    if head.startswith(ZIP_MAGIC):
+        return "fastqc" if "_fastqc/" in _zip_first_name(head) else None
+
+    if head.startswith(GZIP_MAGIC):
+        try:
+            head = zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(head, SNIFF_SIZE)
+        except zlib.error:
+            return None
+
+    text = head.decode("utf-8", errors="replace")
+    # The last line may be cut
+    lines = text.splitlines()[:-1] if len(head) >= SNIFF_SIZE else text.splitlines()
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return None
+
+    first = lines[0]
+    if first.startswith(PICARD_HEADERS):
+        return "picard"
+    if any(label in text for label in STAR_LOG_LABELS):
+        return "star_log"
+    if first.startswith("N_unmapped\t"):
+        return "star_gene_counts"
+    if FLAGSTAT_RE.match(first):
+        return "flagstat"
+    if "produced by samtools stats" in first or any(
+        line.startswith(("CHK\t", "SN\t")) for line in lines
+    ):
+        return "samtools_stats"
+    if _is_idxstats(lines[:10]):
+        return "idxstats"
+    return None
@@ -1,7 +1,49 @@
 """Module containing base classes for all modules"""
+import argparse
+import os
+import sqlite3
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+import pandas as pd
+
+from bio_qcmetrics_tool.modules.exceptions import (
+    ArchiveMemberNotFoundException,
+    ParserException,
+)
+from bio_qcmetrics_tool.modules.table import MetricTable
+from bio_qcmetrics_tool.utils import (
+    archive,
+    duckdb,
+    journal,
+    postgres,
+    prefetch,
+    rules,
+    s3,
+    sketch,
+    sqlite,
+)
+from bio_qcmetrics_tool.utils.cache import ParseCache
+from bio_qcmetrics_tool.utils.jsonl import JsonlWriter
 from bio_qcmetrics_tool.utils.logger import Logger
+from bio_qcmetrics_tool.utils.parse import open_buffer, open_file
+
+# File extension of each export format, used to name the outputs when
+# several formats are written in one run
+EXPORT_EXTENSIONS = {"sqlite": ".db", "jsonl": ".jsonl", "duckdb": ".duckdb"}
+
+
+def split_export_formats(value):
+    """
+    Splits a comma-separated ``--export_format`` value into unique formats.
+    """
+    formats = []
+    for fmt in value.split(","):
+        fmt = fmt.strip()
+        if fmt and fmt not in formats:
+            formats.append(fmt)
+    return formats
 
 
 class Subcommand(metaclass=ABCMeta):
@@ -59,6 +101,12 @@ class Subcommand(metaclass=ABCMeta):
         """
         return cls(options=vars(options))
 
+    def run(self):
+        """
+        Entrypoint used by the CLI to run the subcommand.
+        """
+        self.do_work()
+
     @classmethod
     def add(cls, subparsers):
         """Adds the given subcommand to the subprsers."""
@@ -75,29 +123,593 @@ class ExportQcModule(Subcommand):
     """Base class for CLI modules that take raw metrics files and
     export the data into a particular format."""
 
+    # Optional `~bio_qcmetrics_tool.utils.sqlite.SqliteConnectionPool` used
+    # instead of opening a new connection for every export.
+    connection_pool = None
+
+    # Options holding paths of (small) input files that can be prefetched
+    input_options = []
+
+    # Whether the parsers use the persistent parse cache (`--cache_dir`)
+    cacheable = False
+
+    # Long tables written as one row per input file with ``--layout wide``,
+    # as ``{table: (category column, {value column: column name format})}``.
+    # The wide table is named ``<table>_wide``.
+    wide_tables = dict()
+
+    # List options holding one value per input file of the input options,
+    # e.g., one bam per input
+    parallel_options = []
+
+    def __init__(self, name=None, options=dict(), **kwargs):
+        self.prefetched = dict()
+        self.streamed = set()
+        self._parse_cache = None
+        super().__init__(name=name, options=options, **kwargs)
+
     @abstractmethod
-    def to_sqlite(self):
+    def do_work(self):
         """
-        Implement the exporting to sqlite db.
+        Wrapper function used by CLI to process the data for this
+        module. Reads the members of tar archive inputs and prefetches the
+        other inputs when ``--prefetch`` is set.
         """
+        super().do_work()
+        if (
+            self.options.get("sketches")
+            and self.options.get("export_format")
+            and "sqlite" not in self.export_formats()
+        ):
+            raise ParserException("--sketches requires --export_format sqlite")
+        self.expand_archives()
+        workers = self.options.get("prefetch")
+        paths = [p for p in self.input_paths() if p not in self.prefetched]
+        if workers and paths:
+            self.logger.info(
+                "Prefetching {0} inputs with {1} threads".format(len(paths), workers)
+            )
+            self.prefetched.update(prefetch.prefetch(paths, workers=workers))
 
-    def export(self):
+    def run(self):
+        """
+        Entrypoint used by the CLI. Exports one input at a time when
+        ``--journal`` or ``--resume`` is set.
+        """
+        if self.options.get("journal") or self.options.get("resume"):
+            self.do_journaled_work()
+        else:
+            self.do_work()
+
+    def journal_units(self):
+        """
+        Returns the (input option, index, path) of every input of a journaled
+        export.
+        """
+        return [
+            (key, index, path)
+            for key in self.input_options
+            for index, path in enumerate(self._option_values(key))
+        ]
+
+    def unit_options(self, key, index, path):
+        """
+        Returns the options exporting only the input at ``index`` of the
+        input option ``key``.
+        """
+        opts = dict(self.options)
+        for name in self.input_options:
+            opts[name] = [] if isinstance(self.options.get(name), list) else None
+        opts[key] = [path] if isinstance(self.options.get(key), list) else path
+        for name in self.parallel_options:
+            opts[name] = self._option_values(name)[index : index + 1]
+        opts.update(journal=False, resume=False, prefetch=0, defer_indexes=True)
+        return opts
+
+    def do_journaled_work(self):
+        """
+        Exports the inputs one at a time into the sqlite output. Each input
+        is committed together with its `qc_journal` row, and inputs that fail
+        are rolled back and recorded in `qc_quarantine` instead of stopping
+        the run. With ``--resume`` the inputs journaled or quarantined by an
+        earlier run are skipped.
+        """
+        if self.export_formats() != ["sqlite"]:
+            raise ParserException("--journal requires --export_format sqlite")
+        ExportQcModule.do_work(self)
+
+        tool = self.__get_name__().replace("export", "")
+        job_uuid = self.options.get("job_uuid")
+        conn = sqlite3.connect(
+            self.options["output"], factory=sqlite.DeferredCommitConnection
+        )
+        try:
+            journal.create_tables(conn)
+            conn.commit()
+            skip = set()
+            if self.options.get("resume"):
+                for table in (journal.JOURNAL_TABLE, journal.QUARANTINE_TABLE):
+                    skip.update(journal.get_inputs(conn, table, tool, job_uuid))
+
+            counts = dict(exported=0, quarantined=0, skipped=0)
+            for key, index, path in self.journal_units():
+                if path in skip:
+                    counts["skipped"] += 1
+                    continue
+                obj = self.__class__(options=self.unit_options(key, index, path))
+                if path in self.prefetched:
+                    obj.prefetched[path] = self.prefetched[path]
+                obj._sqlite_conn = conn
+
+                conn.execute("BEGIN")
+                conn.deferred = True
+                try:
+                    obj.do_work()
+                    journal.record_done(conn, tool, job_uuid, path)
+                except Exception as e:
+                    conn.deferred = False
+                    conn.rollback()
+                    self.logger.error("Quarantined {0}: {1!r}".format(path, e))
+                    journal.record_failure(conn, tool, job_uuid, path, e)
+                    counts["quarantined"] += 1
+                else:
+                    counts["exported"] += 1
+                conn.deferred = False
+                conn.commit()
+
+            if not self.options.get("defer_indexes"):
+                sqlite.ensure_indexes(conn)
+                conn.commit()
+        finally:
+            conn.close()
+        self.logger.info(
+            "Exported {exported}, quarantined {quarantined} and skipped "
+            "{skipped} inputs".format(**counts)
+        )
+
+    def _option_values(self, key):
+        value = self.options.get(key)
+        if not value:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    def input_paths(self):
+        """
+        Returns the paths of all inputs listed in `input_options`, except
+        tar archives that are not expanded yet.
+        """
+        return [
+            path
+            for key in self.input_options
+            for path in self._option_values(key)
+            if archive.split_archive_path(path) is None
+        ]
+
+    def expand_archives(self):
+        """
+        Replaces the tar archive inputs, ``archive.tar[.gz][::GLOB]``, of
+        `input_options` with their matching members. Every archive is
+        streamed once and its members are read into `prefetched`.
+        """
+        patterns = dict()
+        for key in self.input_options:
+            for value in self._option_values(key):
+                spec = archive.split_archive_path(value)
+                if spec is not None:
+                    patterns.setdefault(spec[0], []).append(spec[1])
+        if not patterns:
+            return
+
+        members = dict()
+        for path in patterns:
+            self.logger.info("Reading members of archive {0}".format(path))
+            members[path] = archive.read_members(path, patterns[path])
+
+        for key in self.input_options:
+            value = self.options.get(key)
+            expanded = []
+            for item in self._option_values(key):
+                spec = archive.split_archive_path(item)
+                if spec is None:
+                    expanded.append(item)
+                    continue
+                path, pattern = spec
+                matched = [
+                    name
+                    for name in members[path]
+                    if archive.match_member(name, pattern)
+                ]
+                if not matched:
+                    raise ArchiveMemberNotFoundException(
+                        "No member of {0} matches {1}".format(path, pattern)
+                    )
+                for name in matched:
+                    member = archive.member_path(path, name)
+                    self.prefetched[member] = members[path][name]
+                    expanded.append(member)
+
+            if not value or expanded == self._option_values(key):
+                continue
+            if isinstance(value, list):
+                self.options[key] = expanded
+            elif len(expanded) == 1:
+                self.options[key] = expanded[0]
+            else:
+                raise ParserException(
+                    "--{0} takes a single file but {1} matches {2} archive "
+                    "members".format(key, value, len(expanded))
+                )
+
+    def open_input(self, fpath, mode="rt"):
+        """
+        Opens an input file, gzipped or not, from its prefetched buffer when
+        available or from disk or S3 otherwise.
+        """
+        data = self.prefetched.get(fpath)
+        if data is not None:
+            return open_buffer(data, mode)
+        if s3.is_s3_url(fpath):
+            return s3.open_url(fpath, mode)
+        return open_file(fpath, mode)
+
+    def cached_parse(self, fpath, func, *args, extra=None):
+        """
+        Returns ``func(*args)``, the parsed contents of ``fpath``, from the
+        parse cache when ``--cache_dir`` is set. ``extra`` holds any options
+        that change the parsed result.
+        """
+        cache_dir = self.options.get("cache_dir")
+        if not cache_dir or not os.path.isfile(fpath):
+            return func(*args)
+
+        if self._parse_cache is None:
+            self._parse_cache = ParseCache(
+                cache_dir, max_size=self.options.get("cache_size", 1024) * 1024 * 1024
+            )
+        namespace = "{0}.{1}".format(self.__class__.__name__, func.__name__)
+        return self._parse_cache.get_or_parse(
+            namespace, fpath, lambda: func(*args), extra=extra
+        )
+
+    def input_size(self, fpath):
         """
-        All tools must provide ability to export to various formats.
+        Returns the size of an input file on disk or S3.
         """
-        if self.options["export_format"] == "sqlite":
-            return self.to_sqlite()
+        data = self.prefetched.get(fpath)
+        if data is not None:
+            return len(data)
+        if s3.is_s3_url(fpath):
+            return s3.get_client().head(fpath)
+        return os.stat(fpath).st_size
+
+    @contextmanager
+    def sqlite_connection(self, output=None):
+        """
+        Yields a connection to the sqlite output file. Nested calls share the
+        same connection so everything written within the outermost call is
+        committed in a single transaction.
+        """
+        conn = getattr(self, "_sqlite_conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        output = output or self.options["output"]
+        if self.connection_pool is not None:
+            ctx = self.connection_pool.connection(output)
+        else:
+            ctx = sqlite.connect(output)
+
+        with ctx as conn:
+            self._sqlite_conn = conn
+            try:
+                yield conn
+                if not self.options.get("defer_indexes"):
+                    sqlite.ensure_indexes(conn)
+                    conn.execute("PRAGMA optimize")
+            finally:
+                self._sqlite_conn = None
+
+    @abstractmethod
+    def metric_tables(self):
+        """
+        Yields the `~bio_qcmetrics_tool.modules.table.MetricTable` objects
+        of the export. Implementations should be generators so that streaming
+        formats hold a single table in memory at a time.
+        """
+
+    def export_tables(self):
+        """
+        Yields the tables to write, i.e., the `metric_tables` with the
+        `wide_tables` pivoted to one row per input file when ``--layout`` is
+        ``wide``.
+        """
+        wide = self.options.get("layout") == "wide"
+        for table in self.metric_tables():
+            spec = self.wide_tables.get(table.name) if wide else None
+            if spec is None or not len(table):
+                yield table
+            else:
+                yield table.to_wide("{0}_wide".format(table.name), *spec)
+
+    def output_tables(self):
+        """
+        Returns the list of `export_tables` followed by the `qc_flags` table
+        when ``--rules`` is set.
+        """
+        tables = list(self.export_tables())
+        if self.options.get("rules"):
+            tables.append(self.qc_flags(tables))
+        return tables
+
+    def iter_rows(self, tables=None):
+        """
+        Yields a (table name, row dict) tuple for every row of the export.
+        """
+        for table in self.export_tables() if tables is None else tables:
+            for row in table.rows():
+                yield table.name, row
+
+    def metric_frames(self, tables=None):
+        """
+        Returns a ``{table name: DataFrame}`` dict with one DataFrame per
+        output table.
+        """
+        frames = dict()
+        for table in self.export_tables() if tables is None else tables:
+            if len(table):
+                frames.setdefault(table.name, []).append(table.to_frame())
+        return dict(
+            (name, dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True))
+            for name, dfs in frames.items()
+        )
+
+    def to_sqlite(self, tables=None, output=None):
+        """
+        Writes the metric tables to the sqlite db with one DataFrame per
+        output table.
+        """
+        frames = self.metric_frames(tables)
+        if not frames:
+            return
+
+        output = output or self.options["output"]
+        self.logger.info("Writing metrics to sqlite file {0}".format(output))
+        with self.sqlite_connection(output) as conn:
+            for name, df in frames.items():
+                sqlite.add_missing_columns(
+                    conn, name, df.columns, types=sqlite.get_frame_types(df)
+                )
+                sqlite.append_frame(conn, name, df)
+
+    def to_duckdb(self, conn, tables=None):
+        """
+        Appends the metric tables to a DuckDB connection, one columnar
+        append per output table.
+        """
+        for name, df in self.metric_frames(tables).items():
+            duckdb.append_frame(conn, name, df)
+
+    def to_postgres(self, conn, tables=None):
+        """
+        Loads the metric tables into PostgreSQL with ``COPY FROM STDIN``.
+        Returns the names of the tables that were written.
+        """
+        copy_format = self.options.get("postgres_copy_format") or "csv"
+        frames = self.metric_frames(tables)
+        for name, df in frames.items():
+            postgres.copy_frame(conn, name, df, copy_format=copy_format)
+        return list(frames)
+
+    def to_jsonl(self, tables=None, output=None):
+        """
+        Streams the rows as JSON lines tagged with their table name to the
+        output file, or to stdout when the output is ``-``.
+        """
+        with JsonlWriter(output or self.options["output"]) as writer:
+            for table, row in self.iter_rows(tables):
+                writer.write(table, row)
+
+    def streams_rows(self):
+        """
+        Whether the rows of each input are written as soon as it is parsed,
+        which is the case with ``jsonl`` as the only format and no ``--rules``.
+        """
+        return (
+            bool(self.options.get("export_format"))
+            and self.export_formats() == ["jsonl"]
+            and not self.options.get("rules")
+        )
+
+    def stream_rows(self, source):
+        """
+        Writes the rows of the input just parsed into ``self.data[source]``
+        when `streams_rows`, so the first records reach the output before the
+        next input is read. `export` then skips the inputs written this way.
+        """
+        if not self.streams_rows():
+            return
+        with self._scoped_data([source]):
+            self.to_jsonl()
+        self.streamed.add(source)
+
+    @contextmanager
+    def _scoped_data(self, sources):
+        data = self.data
+        self.data = dict((k, data[k]) for k in sources)
+        try:
+            yield
+        finally:
+            self.data = data
+
+    def sample_summary(self):
+        """
+        Returns the headline metrics of this export for the `sample_qc_summary`
+        table as ``{bam: {column: value}}``, which are written to the rows of
+        the ``--job_uuid`` of the export. Tools without per-bam headline
+        metrics return an empty dict.
+        """
+        return dict()
+
+    def qc_flags(self, tables):
+        """
+        Evaluates the ``--rules`` on the tables and returns the `qc_flags`
+        table.
+        """
+        loaded = rules.load_rules(self.options["rules"])
+        frames = self.metric_frames(tables)
+        skipped = rules.skipped_rules(loaded, frames)
+        if skipped:
+            self.logger.warning(
+                "Skipped {0} rules on tables not in this export: {1}".format(
+                    len(skipped),
+                    ", ".join("{0} ({1})".format(r.name, r.table) for r in skipped),
+                )
+            )
+        flags = rules.evaluate_rules(loaded, frames)
+        self.logger.info(
+            "{0} of {1} QC checks failed".format(
+                int((~flags["passed"].astype(bool)).sum()), len(flags)
+            )
+        )
+        return MetricTable(
+            rules.FLAGS_TABLE,
+            columns=dict((col, flags[col].tolist()) for col in flags.columns),
+        )
+
+    def export_formats(self):
+        """
+        Returns the list of formats given by ``--export_format``, which may be
+        comma-separated.
+        """
+        return split_export_formats(self.options["export_format"])
+
+    def output_path(self, export_format):
+        """
+        Returns the output path of a format. With several formats, the
+        extension of ``--output`` is replaced by the one of each format.
+        """
+        output = self.options["output"]
+        if export_format == "postgres" and self.options.get("postgres_dsn"):
+            return self.options["postgres_dsn"]
+        if len(self.export_formats()) == 1:
+            return output
+        if export_format == "postgres":
+            raise ValueError(
+                "--postgres_dsn is required to export postgres with other formats"
+            )
+        if output == "-":
+            if export_format != "jsonl":
+                raise ValueError(
+                    "Only jsonl can be written to stdout, not {0}".format(export_format)
+                )
+            return output
+        base, ext = os.path.splitext(output)
+        if ext not in EXPORT_EXTENSIONS.values():
+            base = output
+        return base + EXPORT_EXTENSIONS[export_format]
+
+    def export_to(self, export_format, tables=None, output=None):
+        """
+        Writes the metric tables in a single format.
+        """
+        if export_format == "sqlite":
+            with self.sqlite_connection(output) as conn:
+                self.to_sqlite(tables, output)
+                summary = self.sample_summary()
+                if summary:
+                    job_uuid = self.options["job_uuid"]
+                    if self.options.get("sketches"):
+                        # Before the upsert, to skip values already exported
+                        values = sketch.new_summary_values(
+                            conn, ((job_uuid, bam, m) for bam, m in summary.items())
+                        )
+                    sqlite.upsert_sample_summary(conn, summary, job_uuid)
+                    if self.options.get("sketches"):
+                        sketch.update_sketches(conn, values)
+        elif export_format == "jsonl":
+            self.to_jsonl(tables, output)
+        elif export_format == "duckdb":
+            output = output or self.options["output"]
+            self.logger.info("Writing metrics to duckdb file {0}".format(output))
+            with duckdb.connect(output) as conn:
+                self.to_duckdb(conn, tables)
+                summary = self.sample_summary()
+                if summary:
+                    duckdb.upsert_sample_summary(
+                        conn, summary, self.options["job_uuid"]
+                    )
+        elif export_format == "postgres":
+            dsn = output or self.output_path(export_format)
+            self.logger.info("Writing metrics to postgres")
+            with postgres.DEFAULT_POOL.connection(dsn) as conn:
+                names = self.to_postgres(conn, tables)
+                summary = self.sample_summary()
+                if summary:
+                    postgres.upsert_sample_summary(
+                        conn, summary, self.options["job_uuid"]
+                    )
+                if not self.options.get("defer_indexes"):
+                    postgres.ensure_indexes(conn, names)
         else:
             raise NotImplementedError("Not implemented")
 
+    def export(self):
+        """
+        All tools must provide ability to export to various formats. With
+        several formats the metric tables are built once and written to all
+        outputs concurrently. Without a format nothing is written, which is
+        how `bio_qcmetrics_tool.api` collects the tables in memory.
+        """
+        if not self.options.get("export_format"):
+            return
+
+        if self.streamed:
+            remaining = [k for k in self.data if k not in self.streamed]
+            with self._scoped_data(remaining):
+                self.to_jsonl()
+            return
+
+        formats = self.export_formats()
+        tables = self.output_tables() if self.options.get("rules") else None
+        if len(formats) == 1:
+            self.export_to(formats[0], tables)
+            return
+
+        outputs = [self.output_path(fmt) for fmt in formats]
+        if tables is None:
+            tables = self.output_tables()
+        with ThreadPoolExecutor(max_workers=len(formats)) as pool:
+            futures = [
+                pool.submit(self.export_to, fmt, tables, output)
+                for fmt, output in zip(formats, outputs)
+            ]
+            for future in futures:
+                future.result()
+
     @classmethod
     def exporters(cls):
         """
         The available export formats.
         """
-        exporters = ["sqlite"]
+        exporters = ["sqlite", "jsonl", "postgres", "duckdb"]
         return exporters
 
+    @classmethod
+    def _export_format_type(cls, value):
+        """
+        Validates the comma-separated ``--export_format`` value.
+        """
+        formats = split_export_formats(value)
+        invalid = [fmt for fmt in formats if fmt not in cls.exporters()]
+        if invalid or not formats:
+            raise argparse.ArgumentTypeError(
+                "invalid choice: {0} (choose from {1})".format(
+                    ", ".join(invalid) or repr(value), ", ".join(cls.exporters())
+                )
+            )
+        return ",".join(formats)
+
     @classmethod
     def add(cls, subparsers):
         """Adds the given subcommand to the subprsers."""
@@ -112,12 +724,95 @@ class ExportQcModule(Subcommand):
         # All export tool include these options
         subparser.add_argument(
             "--export_format",
-            choices=cls.exporters(),
+            type=cls._export_format_type,
             required=True,
-            help="The available formats to export",
+            metavar="{{{0}}}".format(",".join(cls.exporters())),
+            help="The formats to export. Several comma-separated formats are "
+            "written in one run",
+        )
+        subparser.add_argument(
+            "-o",
+            "--output",
+            required=True,
+            help="The path to the output file. Use - to write jsonl to stdout. "
+            "With several formats, each is written to this path with the "
+            "extension of the format, e.g., out.db and out.jsonl. For postgres "
+            "this is the connection string unless --postgres_dsn is set",
+        )
+        subparser.add_argument(
+            "--postgres_dsn",
+            help="Connection string of the PostgreSQL database, e.g., "
+            "postgresql://user@host/db. Required when postgres is exported "
+            "together with other formats",
+        )
+        subparser.add_argument(
+            "--postgres_copy_format",
+            choices=postgres.COPY_FORMATS,
+            default="csv",
+            help="The COPY format used to load rows into PostgreSQL",
+        )
+        if cls.input_options:
+            subparser.add_argument(
+                "--prefetch",
+                type=int,
+                default=0,
+                metavar="THREADS",
+                help="Read the inputs into memory with this many concurrent threads "
+                "before parsing. Useful for many small files on network "
+                "filesystems.",
+            )
+            subparser.add_argument(
+                "--journal",
+                action="store_true",
+                help="Export the inputs one at a time into the sqlite output, "
+                "recording each in the qc_journal table in the same transaction. "
+                "Inputs that fail are recorded in the qc_quarantine table "
+                "instead of stopping the run.",
+            )
+            subparser.add_argument(
+                "--resume",
+                action="store_true",
+                help="Run with --journal, skipping the inputs already journaled "
+                "or quarantined by an earlier run.",
+            )
+        if cls.cacheable:
+            subparser.add_argument(
+                "--cache_dir",
+                help="Directory of a persistent cache of parsed inputs. Inputs "
+                "that are unchanged since they were cached are not parsed again.",
+            )
+            subparser.add_argument(
+                "--cache_size",
+                type=int,
+                default=1024,
+                help="Maximum size of the parse cache in MiB. The least recently "
+                "used entries are evicted first.",
+            )
+        subparser.add_argument(
+            "--rules",
+            help="TOML file of QC gating rules evaluated on the exported tables. "
+            "The results are written to the qc_flags table.",
+        )
+        subparser.add_argument(
+            "--sketches",
+            action="store_true",
+            help="Add the sample summary metrics of this export to the cohort "
+            "statistics in the qc_metric_sketches table of the sqlite output.",
         )
+        if cls.wide_tables:
+            subparser.add_argument(
+                "--layout",
+                choices=["long", "wide"],
+                default="long",
+                help="Write {0} as category/value rows (long) or as one row per "
+                "input file with a column per category (wide), in tables named "
+                "with a _wide suffix.".format(", ".join(sorted(cls.wide_tables))),
+            )
         subparser.add_argument(
-            "-o", "--output", required=True, help="The path to the output file"
+            "--defer_indexes",
+            action="store_true",
+            help="Don't create sqlite indexes during export. Build them in bulk "
+            "afterwards with the `index` subcommand.",
         )
 
         subparser.set_defaults(func=cls.__from_subparser__)
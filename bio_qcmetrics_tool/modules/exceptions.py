@@ -45,3 +45,23 @@ class DuplicateInputException(BioQcMetricsException):
 
     def __str__(self):
         return self.message
+
+
+class InvalidRequestException(BioQcMetricsException):
+    """Exception thrown when a served export request can't be parsed"""
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class ArchiveMemberNotFoundException(BioQcMetricsException):
+    """Exception thrown when no member of an input archive matches"""
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -12,20 +12,29 @@ Some of the file-parsing logic is adapted from:
 
 """
 import os
-import sqlite3
 import zipfile
 
-import pandas as pd
-
 from bio_qcmetrics_tool.modules.base import ExportQcModule
+from bio_qcmetrics_tool.modules.table import MetricTable
+from bio_qcmetrics_tool.utils import s3
 from bio_qcmetrics_tool.utils.parse import parse_type
 
+# Reported in the Sequence Duplication Levels module but exported with the
+# Basic Statistics
+TOTAL_DEDUP = "Total Deduplicated Percentage"
+
 
 class ExportFastqc(ExportQcModule):
     """Export FastQC metrics"""
 
+    input_options = ["inputs"]
+    wide_tables = {"fastqc_data_Basic_Statistics": ("Measure", {"Value": "{0}"})}
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="fastqc", options=options)
+        self.sections = self._section_set(self.options.get("sections"))
+        self.exclude_sections = self._section_set(self.options.get("exclude_sections"))
 
     @classmethod
     def __add_arguments__(cls, subparser):
@@ -45,6 +54,20 @@ class ExportFastqc(ExportQcModule):
             help="The job uuid associated with the inputs.",
         )
 
+        subparser.add_argument(
+            "--sections",
+            action="append",
+            help="Only export these sections, e.g., fastqc_summary or "
+            "Basic_Statistics. May be used one or more times or comma-separated",
+        )
+
+        subparser.add_argument(
+            "--exclude_sections",
+            action="append",
+            help="Don't export these sections, e.g., Overrepresented_sequences. "
+            "May be used one or more times or comma-separated",
+        )
+
     @classmethod
     def __get_description__(cls):
         return "Extract FastQC report from zip archive(s)."
@@ -62,11 +85,39 @@ class ExportFastqc(ExportQcModule):
                 basename
             )
             self.logger.info("Processing {0}".format(basename))
-            self.data[basename] = dict()
+            self.data[basename] = self.cached_parse(
+                fqzipfile,
+                self.parse_fastqc_zip,
+                fqzipfile,
+                basename,
+                extra=(
+                    self.options["job_uuid"],
+                    sorted(self.sections or []),
+                    sorted(self.exclude_sections or []),
+                ),
+            )
+            self.stream_rows(basename)
+
+        # Export
+        self.export()
+
+    def parse_fastqc_zip(self, fqzipfile, basename):
+        """
+        Extracts the selected sections of a FastQC zip archive into
+        ``self.data[basename]`` and returns them.
+        """
+        self.data[basename] = dict()
 
-            with zipfile.ZipFile(fqzipfile, mode="r") as fqzip:
+        with self.open_input(fqzipfile, "rb") as fh:
+            # Objects in S3 are read with ranged GETs of the needed parts only
+            s3.prefetch_zip_directory(fh)
+            with zipfile.ZipFile(fh, mode="r") as fqzip:
                 # Get file names
                 fqc_data_file, fqc_summary_file = self.get_fastqc_file_names(fqzip)
+                members = [fqc_data_file]
+                if self.keep_section("fastqc_summary"):
+                    members.append(fqc_summary_file)
+                s3.prefetch_zip_members(fh, fqzip, members)
 
                 # Get fastq name
                 with fqzip.open(fqc_data_file, mode="r") as dfo:
@@ -78,73 +129,83 @@ class ExportFastqc(ExportQcModule):
                     raise Exception(msg)
 
                 # Load fastqc summary
-                with fqzip.open(fqc_summary_file, mode="r") as sfo:
-                    self.parse_fastqc_summary(basename, fastq_name, sfo)
+                if self.keep_section("fastqc_summary"):
+                    with fqzip.open(fqc_summary_file, mode="r") as sfo:
+                        self.parse_fastqc_summary(basename, fastq_name, sfo)
 
                 # Load fastqc data
-                with fqzip.open(fqc_data_file, mode="r") as dfo:
-                    self.parse_fastqc_data(basename, fastq_name, dfo)
+                if self.sections is None or self.sections - {"fastqc_summary"}:
+                    with fqzip.open(fqc_data_file, mode="r") as dfo:
+                        self.parse_fastqc_data(basename, fastq_name, dfo)
 
-        # Export
-        self.export()
+        return self.data[basename]
 
-    def to_sqlite(self):
-        """
-        Export to sqlite file.
-        """
-        sum_dat = []
-        detail_dat = {}
+    def metric_tables(self):
         for source in sorted(self.data):
             for section in self.data[source]:
                 if section == "fastqc_summary":
-                    curr = self.data[source][section]
-                    curr["fastqc_zip"] = source
-                    sum_dat.append(curr)
-                else:
-                    if section not in detail_dat:
-                        detail_dat[section] = []
-
-                    record = self.data[source][section]
-                    curr = record["data"]
-                    if section.lower() == "basic_statistics":
-                        for k in curr:
-                            rec = {}
-                            rec["job_uuid"] = record["job_uuid"]
-                            rec["fastq"] = record["fastq"]
-                            rec["fastqc_zip"] = source
-                            val = str(curr[k]) if curr[k] is not None else None
-                            rec["Measure"] = k
-                            rec["Value"] = val
-                            detail_dat[section].append(rec)
-                    elif record.get("colnames"):
-                        for row in curr:
-                            rec = dict(
-                                zip(
-                                    record["colnames"],
-                                    [str(i) if i is not None else None for i in row],
-                                )
-                            )
-                            rec["job_uuid"] = record["job_uuid"]
-                            rec["fastq"] = record["fastq"]
-                            rec["fastqc_zip"] = source
-                            detail_dat[section].append(rec)
-
-        self.logger.info(
-            "Writing metrics to sqlite file {0}".format(self.options["output"])
+                    summary = self.data[source][section]
+                    keys = list(summary)
+                    yield MetricTable.from_rows(
+                        "fastqc_summary",
+                        keys,
+                        [[summary[k] for k in keys]],
+                        constants={"fastqc_zip": source},
+                    )
+                    continue
+
+                record = self.data[source][section]
+                constants = {
+                    "job_uuid": record["job_uuid"],
+                    "fastq": record["fastq"],
+                    "fastqc_zip": source,
+                }
+                curr = record["data"]
+                table = "fastqc_data_{0}".format(section)
+                if section.lower() == "basic_statistics":
+                    yield MetricTable(
+                        table,
+                        constants=constants,
+                        columns={
+                            "Measure": list(curr),
+                            "Value": [
+                                str(v) if v is not None else None for v in curr.values()
+                            ],
+                        },
+                    )
+                elif record.get("colnames"):
+                    yield MetricTable.from_rows(
+                        table,
+                        record["colnames"],
+                        [
+                            [str(i) if i is not None else None for i in row]
+                            for row in curr
+                        ],
+                        constants=constants,
+                    )
+
+    @staticmethod
+    def _section_set(values):
+        """
+        Normalizes section names given as options into a set, or None.
+        """
+        if not values:
+            return None
+        return set(
+            name.strip().replace(" ", "_").lower()
+            for value in values
+            for name in value.split(",")
+            if name.strip()
         )
 
-        with sqlite3.connect(self.options["output"]) as conn:
-            # Summary table
-            sum_df = pd.DataFrame(sum_dat)
-            table_name = "fastqc_summary"
-            sum_df.to_sql(table_name, conn, if_exists="append")
-
-            # All other tables
-            for k in detail_dat:
-                if detail_dat[k]:
-                    table_name = "fastqc_data_{0}".format(k)
-                    df = pd.DataFrame(detail_dat[k])
-                    df.to_sql(table_name, conn, if_exists="append")
+    def keep_section(self, section):
+        """
+        Whether a section is selected by --sections/--exclude_sections.
+        """
+        name = section.replace(" ", "_").lower()
+        if self.sections is not None and name not in self.sections:
+            return False
+        return self.exclude_sections is None or name not in self.exclude_sections
 
     def get_fastqc_file_names(self, zip_object):
         """
@@ -189,9 +250,9 @@ class ExportFastqc(ExportQcModule):
         """
         Extracts all the sections from the fastqc data file.
         """
-        total_dedup = None
+        totals = {}
         for section, state, header, extra, data in self._fastqc_data_section_generator(
-            fo
+            fo, totals
         ):
             if section not in self.data[source]:
                 self.data[source][section] = {
@@ -218,42 +279,74 @@ class ExportFastqc(ExportQcModule):
                 self.data[source][section]["data"] = []
                 self.data[source][section]["colnames"] = header
 
-                if extra and section.lower() == "sequence_duplication_levels":
-                    total_dedup = parse_type(extra)
                 for record in data:
                     row = [parse_type(i) for i in record]
                     self.data[source][section]["data"].append(row)
 
-        self.data[source]["Basic_Statistics"]["data"][
-            "Total Deduplicated Percentage"
-        ] = total_dedup
+        if "Basic_Statistics" in self.data[source]:
+            total_dedup = totals.get(TOTAL_DEDUP)
+            self.data[source]["Basic_Statistics"]["data"][TOTAL_DEDUP] = (
+                parse_type(total_dedup) if total_dedup is not None else None
+            )
 
-    def _fastqc_data_section_generator(self, fo):
+    def _fastqc_data_section_generator(self, fo, totals=None):
         """
-        Extract a section of fastqc data and yield it.
+        Extract a section of fastqc data and yield it. Lines of sections that
+        are not selected are skipped as raw bytes without decoding or
+        splitting, and reading stops once all selected sections were found.
+        The ``#Total Deduplicated Percentage`` line is always read into
+        ``totals`` since it belongs to Basic_Statistics, even when its own
+        section is skipped.
         """
+        totals = {} if totals is None else totals
+        need_total = self.keep_section("Basic_Statistics")
         section = None
         state = None
         header = None
         extra = None
         data = []
+        skipping = False
+        remaining = None if self.sections is None else set(self.sections)
+
+        def done():
+            if remaining is None or remaining - {"fastqc_summary"}:
+                return False
+            return not need_total or TOTAL_DEDUP in totals
+
         for line in fo:
+            if skipping:
+                if line.startswith(b">>END_MODULE"):
+                    skipping = False
+                elif line.startswith(b"#" + TOTAL_DEDUP.encode("utf-8")):
+                    line = line.decode("utf-8").rstrip("\r\n")
+                    totals[TOTAL_DEDUP] = line.split("\t")[1]
+                    if done():
+                        return
+                continue
             line = line.decode("utf-8").rstrip("\r\n")
             if line.startswith("##") and not section:
                 continue
             elif line.startswith(">>END_MODULE"):
                 yield section, state, header, extra, data
+                if remaining is not None and section:
+                    remaining.discard(section.lower())
+                    if done():
+                        return
                 section = None
                 header = None
                 extra = None
                 data = []
             elif line.startswith(">>"):
                 sdat = line[2:].split("\t")
+                if not self.keep_section(sdat[0]):
+                    skipping = True
+                    continue
                 section = sdat[0].replace(" ", "_")
                 state = sdat[1]
             elif line.startswith("#") and section:
-                if line.startswith("#Total Deduplicated Percentage"):
+                if line.startswith("#" + TOTAL_DEDUP):
                     extra = line.split("\t")[1]
+                    totals[TOTAL_DEDUP] = extra
                 else:
                     header = line[1:].split("\t")
             else:
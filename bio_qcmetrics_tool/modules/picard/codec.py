@@ -17,7 +17,7 @@ class PicardMetricsFile:
     HISTO_HEADER = "## HISTOGRAM\t"
     METRIC_HEADER = "## METRICS CLASS\t"
 
-    def __init__(self, fpath, tool=None, headers=None, metrics=None):
+    def __init__(self, fpath, tool=None, headers=None, metrics=None, open_func=None):
         """
         Initialize with the path to Picard metrics file. The slots of this
         class include:
@@ -33,8 +33,12 @@ class PicardMetricsFile:
 
         :param metrics: subclass of PicardMetric
         :type metrics: `~bio_qcmetrics_tool.modules.picard.metrics.base.PicardMetric`
+
+        :param open_func: function used to open the file, defaults to `open`
+        :type open_func: callable
         """
         self.fpath = fpath
+        self.open_func = open if open_func is None else open_func
         self.tool = tool
 
         self.headers = [] if headers is None else headers
@@ -65,7 +69,7 @@ class PicardMetricsFile:
         """
         header = None
         cls = None
-        with open(self.fpath, "rt") as fh:
+        with self.open_func(self.fpath, "rt") as fh:
             line = ""
             major_header_len = len(self.MAJOR_HEADER_PREFIX)
             minor_header_len = len(self.MINOR_HEADER_PREFIX)
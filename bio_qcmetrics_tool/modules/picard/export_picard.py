@@ -1,16 +1,32 @@
 """QC Module for Exporting Picard Metrics"""
 import os
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
 from bio_qcmetrics_tool.modules.picard.codec import PicardMetricsFile
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+# Metrics of each picard class copied to the sample_qc_summary table
+SUMMARY_FIELDS = {
+    "RnaSeqMetrics": [
+        "PCT_MRNA_BASES",
+        "PCT_CODING_BASES",
+        "PCT_RIBOSOMAL_BASES",
+        "PCT_USABLE_BASES",
+        "MEDIAN_CV_COVERAGE",
+        "MEDIAN_5PRIME_TO_3PRIME_BIAS",
+    ]
+}
+
+# Columns that break picard metrics down by read group
+PICARD_LEVEL_COLUMNS = ["SAMPLE", "LIBRARY", "READ_GROUP"]
 
 
 class ExportPicardMetrics(ExportQcModule):
     """Extract Picard metrics"""
 
+    input_options = ["inputs"]
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="picard", options=options)
 
@@ -54,15 +70,53 @@ class ExportPicardMetrics(ExportQcModule):
             assert source not in self.data, "Duplicate input files?? {0}".format(source)
             self.data[source] = {}
             self.logger.info("Processing {0}".format(source))
-            picard_metrics_obj = PicardMetricsFile(picard_file)
-            self.data[source][
-                picard_metrics_obj.metrics.class_name
-            ] = picard_metrics_obj.metrics.extract_metrics()
+            class_name, metrics = self.cached_parse(
+                picard_file, self.parse_picard_file, picard_file
+            )
+            self.data[source][class_name] = metrics
+            self.stream_rows(source)
 
         self.export()
 
-    def to_sqlite(self):
-        data = {}
+    def parse_picard_file(self, picard_file):
+        """
+        Returns the metrics class name and extracted metrics of a file.
+        """
+        picard_metrics_obj = PicardMetricsFile(picard_file, open_func=self.open_input)
+        return (
+            picard_metrics_obj.metrics.class_name,
+            picard_metrics_obj.metrics.extract_metrics(),
+        )
+
+    def sample_summary(self):
+        """
+        Uses the all-reads row of each metric, i.e., the one without a
+        sample, library or read group. Requires ``--derived_from_file``.
+        """
+        if not self.options.get("derived_from_file"):
+            return dict()
+        bam = os.path.basename(self.options["derived_from_file"])
+        curr = dict()
+        for source in sorted(self.data):
+            for section in self.data[source]:
+                metric = self.data[source][section]["metric"]
+                if section not in SUMMARY_FIELDS or not metric:
+                    continue
+                rows = [dict(zip(metric["colnames"], row)) for row in metric["data"]]
+                rows = [
+                    row
+                    for row in rows
+                    if all(row.get(col) is None for col in PICARD_LEVEL_COLUMNS)
+                ] or rows
+                if not rows:
+                    continue
+                curr["picard_job_uuid"] = self.options["job_uuid"]
+                for key in SUMMARY_FIELDS[section]:
+                    if key in rows[0]:
+                        curr["picard_{0}".format(key.lower())] = rows[0][key]
+        return {bam: curr} if curr else dict()
+
+    def metric_tables(self):
         derived_from = (
             os.path.basename(self.options["derived_from_file"])
             if self.options["derived_from_file"]
@@ -70,44 +124,35 @@ class ExportPicardMetrics(ExportQcModule):
         )
         for source in sorted(self.data):
             for section in self.data[source]:
-                derived_key = self.data[source][section]["derived_from_key"]
+                constants = {
+                    "job_uuid": self.options["job_uuid"],
+                    "picard_metrics": source,
+                    self.data[source][section]["derived_from_key"]: derived_from,
+                }
                 if self.data[source][section]["metric"]:
-                    table = "picard_{0}".format(section)
-                    if table not in data:
-                        data[table] = []
                     record = self.data[source][section]["metric"]
-                    for row in record["data"]:
-                        curr = dict(zip(record["colnames"], row))
-                        curr["job_uuid"] = self.options["job_uuid"]
-                        curr["picard_metrics"] = source
-                        curr[derived_key] = derived_from
-                        data[table].append(curr)
+                    yield MetricTable.from_rows(
+                        "picard_{0}".format(section),
+                        record["colnames"],
+                        record["data"],
+                        constants=constants,
+                    )
 
                 if self.data[source][section]["histogram"]:
-                    table = "picard_{0}_histogram".format(section)
-                    if table not in data:
-                        data[table] = []
                     record = self.data[source][section]["histogram"]
                     hist_bin = record["colnames"][0]
-                    hist_cols = record["colnames"][1:]
-                    for col in hist_cols:
-                        for row in record["data"]:
-                            rec = dict(zip(record["colnames"], row))
-                            curr = dict()
-                            curr["job_uuid"] = self.options["job_uuid"]
-                            curr["picard_metrics"] = source
-                            curr[derived_key] = derived_from
-                            curr[hist_bin] = rec[hist_bin]
-                            curr["colname"] = col
-                            curr["value"] = rec[col]
-                            data[table].append(curr)
-
-        self.logger.info(
-            "Writing metrics to sqlite file {0}".format(self.options["output"])
-        )
-
-        with sqlite3.connect(self.options["output"]) as conn:
-            for table in data:
-                if data[table]:
-                    df = pd.DataFrame(data[table])
-                    df.to_sql(table, conn, if_exists="append")
+                    bins = [row[0] for row in record["data"]]
+                    table = MetricTable(
+                        "picard_{0}_histogram".format(section),
+                        constants=constants,
+                        columns={hist_bin: [], "colname": [], "value": []},
+                    )
+                    for i, col in enumerate(record["colnames"][1:], 1):
+                        table.extend(
+                            {
+                                hist_bin: bins,
+                                "colname": [col] * len(bins),
+                                "value": [row[i] for row in record["data"]],
+                            }
+                        )
+                    yield table
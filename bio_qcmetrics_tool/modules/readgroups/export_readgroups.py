@@ -1,17 +1,20 @@
 """Extract readgroup information"""
-import json
 import os
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
-from bio_qcmetrics_tool.modules.exceptions import DuplicateInputException
+from bio_qcmetrics_tool.modules.exceptions import (
+    DuplicateInputException,
+    ParserException,
+)
+from bio_qcmetrics_tool.modules.table import MetricTable
+from bio_qcmetrics_tool.utils.parse import parse_json_records
 
 
 class ExportReadgroup(ExportQcModule):
     """Extract Readgroup metadata"""
 
+    input_options = ["inputs"]
+
     def __init__(self, options=dict()):
         super().__init__(name="readgroup", options=options)
 
@@ -22,7 +25,9 @@ class ExportReadgroup(ExportQcModule):
             "--inputs",
             action="append",
             required=True,
-            help="Input readgroup JSON files",
+            help="Input readgroup JSON files. Each file may hold a single "
+            "readgroup object, a JSON array of readgroups or NDJSON with one "
+            "readgroup per line.",
         )
 
         subparser.add_argument(
@@ -41,6 +46,13 @@ class ExportReadgroup(ExportQcModule):
             help="The bam associated with the inputs.",
         )
 
+        subparser.add_argument(
+            "--layout",
+            choices=["long", "wide"],
+            default="long",
+            help="Write key/value rows (long) or one row per readgroup (wide).",
+        )
+
     @classmethod
     def __get_description__(cls):
         return "Extract readgroup metadata"
@@ -52,6 +64,7 @@ class ExportReadgroup(ExportQcModule):
             "Processing {0} readgroup files...".format(len(self.options["inputs"]))
         )
 
+        rgids = set()
         for rgfile in self.options["inputs"]:
             basename = os.path.basename(rgfile)
             if basename in self.data:
@@ -61,33 +74,71 @@ class ExportReadgroup(ExportQcModule):
             self.logger.info("Processing {0}".format(basename))
             self.data[basename] = dict()
 
-            with open(rgfile, "rt") as fh:
-                data = json.load(fh)
-                self.data[basename]["readgroup"] = data
+            with self.open_input(rgfile, "rb") as fh:
+                records = parse_json_records(fh.read())
+
+            for rg in records:
+                if not isinstance(rg, dict) or "ID" not in rg:
+                    raise ParserException(
+                        "Readgroup record without an ID in {0}".format(basename)
+                    )
+                if rg["ID"] in rgids:
+                    raise DuplicateInputException(
+                        "Duplicate readgroup ID?? {0}".format(rg["ID"])
+                    )
+                rgids.add(rg["ID"])
+            self.data[basename]["readgroups"] = records
+            self.stream_rows(basename)
 
         # Export
         self.export()
 
-    def to_sqlite(self):
-        data = []
+    def metric_tables(self):
+        if self.options.get("layout") == "wide":
+            yield self._wide_table()
+        else:
+            yield self._long_table()
+
+    def _long_table(self):
+        """
+        One key/value row per readgroup field.
+        """
+        table = MetricTable(
+            "readgroups",
+            constants={
+                "job_uuid": self.options["job_uuid"],
+                "bam": os.path.basename(self.options["bam"]),
+            },
+            columns={"ID": [], "key": [], "value": []},
+        )
         for fil in sorted(self.data):
-            rgid = self.data[fil]["readgroup"]["ID"]
-            for key in sorted(self.data[fil]["readgroup"]):
-                rec = {
-                    "job_uuid": self.options["job_uuid"],
-                    "bam": os.path.basename(self.options["bam"]),
-                    "ID": rgid,
-                    "key": key,
-                    "value": self.data[fil]["readgroup"][key],
-                }
-                data.append(rec)
-
-        self.logger.info(
-            "Writing metrics to sqlite file {0}".format(self.options["output"])
+            for readgroup in self.data[fil]["readgroups"]:
+                keys = sorted(readgroup)
+                table.extend(
+                    {
+                        "ID": [readgroup["ID"]] * len(keys),
+                        "key": keys,
+                        "value": [readgroup[k] for k in keys],
+                    }
+                )
+        return table
+
+    def _wide_table(self):
+        """
+        One row per readgroup with the readgroup fields as columns.
+        """
+        table = MetricTable(
+            "readgroups_wide",
+            constants={
+                "job_uuid": self.options["job_uuid"],
+                "bam": os.path.basename(self.options["bam"]),
+            },
+            columns={"readgroup_file": []},
         )
-
-        if data:
-            with sqlite3.connect(self.options["output"]) as conn:
-                df = pd.DataFrame(data)
-                table_name = "readgroups"
-                df.to_sql(table_name, conn, if_exists="append")
+        for fil in sorted(self.data):
+            for readgroup in self.data[fil]["readgroups"]:
+                rec = {"readgroup_file": fil}
+                for key in sorted(readgroup):
+                    rec[key] = readgroup[key]
+                table.append(rec)
+        return table
@@ -11,21 +11,37 @@ Some of the file-parsing logic is adapted from:
 """
 import os
 import re
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
 from bio_qcmetrics_tool.modules.exceptions import (
     DuplicateInputException,
     ParserException,
 )
-from bio_qcmetrics_tool.utils.parse import get_read_func
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+# (category, field, column) copied to the sample_qc_summary table
+SUMMARY_FIELDS = [
+    ("total", "passed", "flagstat_total"),
+    ("mapped", "passed", "flagstat_mapped"),
+    ("mapped", "passed_pct", "flagstat_mapped_pct"),
+    ("properly paired", "passed_pct", "flagstat_properly_paired_pct"),
+    ("singletons", "passed_pct", "flagstat_singletons_pct"),
+    ("duplicates", "passed", "flagstat_duplicates"),
+]
 
 
 class ExportSamtoolsFlagstats(ExportQcModule):
     """Extract samtools flagstats"""
 
+    input_options = ["inputs"]
+    wide_tables = {
+        "samtools_flagstat": (
+            "category",
+            {"n_passed": "{0}_passed", "n_failed": "{0}_failed"},
+        )
+    }
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="samtools flagstats", options=options)
 
@@ -74,8 +90,7 @@ class ExportSamtoolsFlagstats(ExportQcModule):
                 )
             self.logger.info("Processing {0}".format(basename))
             self.data[basename] = dict()
-            rfunc = get_read_func(flagfile)
-            fsize = os.stat(flagfile).st_size
+            fsize = self.input_size(flagfile)
             if fsize > 5000:
                 raise ParserException(
                     "Input file size '{0}' is larger than expected! Are you sure this is a flagstats file?".format(
@@ -83,41 +98,53 @@ class ExportSamtoolsFlagstats(ExportQcModule):
                     )
                 )
 
-            with rfunc(flagfile, "rt") as fh:
-                fdat = fh.read()
-                self.data[basename]["flagstat"] = {
-                    "bam": os.path.basename(self.options["bam"]),
-                    "job_uuid": self.options["job_uuid"],
-                    "data": self._parse_flagstat(fdat),
-                }
+            self.data[basename]["flagstat"] = {
+                "bam": os.path.basename(self.options["bam"]),
+                "job_uuid": self.options["job_uuid"],
+                "data": self.cached_parse(
+                    flagfile, self._parse_flagstat_file, flagfile
+                ),
+            }
+            self.stream_rows(basename)
 
         # Export data
         self.export()
 
-    def to_sqlite(self):
-        data = []
+    def sample_summary(self):
+        summary = dict()
         for source in sorted(self.data):
             record = self.data[source]["flagstat"]
-            for section in sorted(record["data"]):
-                curr = {
+            curr = summary.setdefault(record["bam"], dict())
+            curr["flagstat_job_uuid"] = record["job_uuid"]
+            for section, field, column in SUMMARY_FIELDS:
+                if field in record["data"].get(section, {}):
+                    curr[column] = record["data"][section][field]
+        return summary
+
+    def metric_tables(self):
+        for source in sorted(self.data):
+            record = self.data[source]["flagstat"]
+            sections = sorted(record["data"])
+            yield MetricTable(
+                "samtools_flagstat",
+                constants={
                     "job_uuid": record["job_uuid"],
                     "bam": record["bam"],
                     "flagstat_file": source,
-                    "category": section,
-                    "n_passed": record["data"][section].get("passed"),
-                    "n_failed": record["data"][section].get("failed"),
-                }
-                data.append(curr)
-
-        if data:
-            self.logger.info(
-                "Writing metrics to sqlite file {0}".format(self.options["output"])
+                },
+                columns={
+                    "category": sections,
+                    "n_passed": [record["data"][i].get("passed") for i in sections],
+                    "n_failed": [record["data"][i].get("failed") for i in sections],
+                },
             )
 
-            with sqlite3.connect(self.options["output"]) as conn:
-                df = pd.DataFrame(data)
-                table_name = "samtools_flagstat"
-                df.to_sql(table_name, conn, if_exists="append")
+    def _parse_flagstat_file(self, fpath):
+        """
+        Parse the flagstat data of an input file
+        """
+        with self.open_input(fpath, "rt") as fh:
+            return self._parse_flagstat(fh.read())
 
     def _parse_flagstat(self, fh):
         """
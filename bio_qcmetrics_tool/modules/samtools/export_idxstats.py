@@ -12,21 +12,22 @@ Some of the file-parsing logic is adapted from:
 """
 
 import os
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
 from bio_qcmetrics_tool.modules.exceptions import (
     DuplicateInputException,
     ParserException,
 )
-from bio_qcmetrics_tool.utils.parse import get_read_func, parse_type
+from bio_qcmetrics_tool.modules.table import MetricTable
+from bio_qcmetrics_tool.utils.parse import parse_type
 
 
 class ExportSamtoolsIdxstats(ExportQcModule):
     """Extract samtools idxstats"""
 
+    input_options = ["inputs"]
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="samtools idxstats", options=options)
 
@@ -75,39 +76,37 @@ class ExportSamtoolsIdxstats(ExportQcModule):
                 )
             self.logger.info("Processing {0}".format(basename))
             self.data[basename] = dict()
-            rfunc = get_read_func(idxfile)
-            with rfunc(idxfile, "rt") as fh:
-                self.data[basename]["idxstat"] = {
-                    "bam": os.path.basename(self.options["bam"]),
-                    "job_uuid": self.options["job_uuid"],
-                    "colnames": ["NAME", "LENGTH", "ALIGNED_READS", "UNALIGNED_READS"],
-                    "values": self._parse(fh),
-                }
+            self.data[basename]["idxstat"] = {
+                "bam": os.path.basename(self.options["bam"]),
+                "job_uuid": self.options["job_uuid"],
+                "colnames": ["NAME", "LENGTH", "ALIGNED_READS", "UNALIGNED_READS"],
+                "values": self.cached_parse(idxfile, self._parse_file, idxfile),
+            }
+            self.stream_rows(basename)
 
         # Export data
         self.export()
 
-    def to_sqlite(self):
-        data = []
+    def metric_tables(self):
         for source in sorted(self.data):
             record = self.data[source]["idxstat"]
-            cols = record["colnames"]
-            for row in record["values"]:
-                curr = dict(zip(cols, row))
-                curr["job_uuid"] = record["job_uuid"]
-                curr["bam"] = record["bam"]
-                curr["idxstat_file"] = source
-                data.append(curr)
-
-        if data:
-            self.logger.info(
-                "Writing metrics to sqlite file {0}".format(self.options["output"])
+            yield MetricTable.from_rows(
+                "samtools_idxstat",
+                record["colnames"],
+                record["values"],
+                constants={
+                    "job_uuid": record["job_uuid"],
+                    "bam": record["bam"],
+                    "idxstat_file": source,
+                },
             )
 
-            with sqlite3.connect(self.options["output"]) as conn:
-                df = pd.DataFrame(data)
-                table_name = "samtools_idxstat"
-                df.to_sql(table_name, conn, if_exists="append")
+    def _parse_file(self, fpath):
+        """
+        Parse the idxstat data of an input file
+        """
+        with self.open_input(fpath, "rt") as fh:
+            return self._parse(fh)
 
     def _parse(self, fh):
         """
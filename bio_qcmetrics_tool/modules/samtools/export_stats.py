@@ -11,21 +11,33 @@ Some of the file-parsing logic is adapted from:
 
 """
 import os
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
 from bio_qcmetrics_tool.modules.exceptions import (  # noqa: F401
     DuplicateInputException,
     ParserException,
 )
-from bio_qcmetrics_tool.utils.parse import get_read_func
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+# SN metrics copied to the sample_qc_summary table
+SUMMARY_FIELDS = [
+    "raw_total_sequences",
+    "reads_mapped",
+    "reads_properly_paired",
+    "reads_duplicated",
+    "error_rate",
+    "average_length",
+    "average_quality",
+    "insert_size_average",
+]
 
 
 class ExportSamtoolsStats(ExportQcModule):
     """Extract samtools stats"""
 
+    input_options = ["input"]
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="samtools stats", options=options)
 
@@ -60,35 +72,43 @@ class ExportSamtoolsStats(ExportQcModule):
         basename = os.path.basename(statfile)
         self.logger.info("Processing {0}".format(basename))
         self.data = dict()
-        rfunc = get_read_func(statfile)
-
-        with rfunc(statfile, "rt") as fh:
-            self.data["samtools_stats"] = {
-                "bam": os.path.basename(self.options["bam"]),
-                "job_uuid": self.options["job_uuid"],
-                "data": self._parse_stats(fh),
-            }
+        self.data["samtools_stats"] = {
+            "bam": os.path.basename(self.options["bam"]),
+            "job_uuid": self.options["job_uuid"],
+            "data": self.cached_parse(statfile, self._parse_stats_file, statfile),
+        }
 
         # Export data
         self.export()
 
-    def to_sqlite(self):
-        data = {
-            "bam": [self.data["samtools_stats"]["bam"]],
-            "job_uuid": [self.data["samtools_stats"]["job_uuid"]],
-            "samtools_stats_file": [os.path.basename(self.options["input"])],
-        }
-        for key in self.data["samtools_stats"]["data"]:
-            data[key] = [self.data["samtools_stats"]["data"][key]]
-
-        if data:
-            self.logger.info(
-                "Writing metrics to sqlite file {0}".format(self.options["output"])
-            )
-            with sqlite3.connect(self.options["output"]) as conn:
-                df = pd.DataFrame(data)
-                table_name = "samtools_stats"
-                df.to_sql(table_name, conn, if_exists="append")
+    def sample_summary(self):
+        record = self.data["samtools_stats"]
+        curr = {"samtools_stats_job_uuid": record["job_uuid"]}
+        for key in SUMMARY_FIELDS:
+            if key in record["data"]:
+                curr["samtools_stats_{0}".format(key)] = record["data"][key]
+        return {record["bam"]: curr}
+
+    def metric_tables(self):
+        record = self.data["samtools_stats"]
+        keys = list(record["data"])
+        yield MetricTable.from_rows(
+            "samtools_stats",
+            keys,
+            [[record["data"][k] for k in keys]],
+            constants={
+                "bam": record["bam"],
+                "job_uuid": record["job_uuid"],
+                "samtools_stats_file": os.path.basename(self.options["input"]),
+            },
+        )
+
+    def _parse_stats_file(self, fpath):
+        """
+        Parse the stats data of an input file
+        """
+        with self.open_input(fpath, "rt") as fh:
+            return self._parse_stats(fh)
 
     def _parse_stats(self, fh):
         """
@@ -1,3 +1,5 @@
 from __future__ import absolute_import  # noqa: F401
 
+from .export_scrna_barcodes import ExportTenXBarcodeMetrics  # noqa: F401
+from .export_scrna_matrix import ExportTenXMatrixMetrics  # noqa: F401
 from .export_scrna_metrics import ExportTenXScrnaMetrics  # noqa: F401
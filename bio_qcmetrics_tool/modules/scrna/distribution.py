@@ -0,0 +1,114 @@
+"""Bounded-memory summaries of large per-barcode/per-cell distributions.
+
+Single-cell outputs hold millions of values per metric, so instead of
+keeping them around we accumulate counts into fixed log-spaced bins and
+derive quantiles and knee-plot points from the bins.
+"""
+import numpy as np
+
+
+class LogHistogram:
+    """
+    Histogram of non-negative values with one bin for zero and
+    ``bins_per_decade`` log-spaced bins per power of ten up to
+    ``max_decades``. Values above the last edge land in the last bin.
+    """
+
+    def __init__(self, bins_per_decade=32, max_decades=10):
+        self.bins_per_decade = bins_per_decade
+        self.max_decades = max_decades
+        self.nbins = bins_per_decade * max_decades + 1
+        self.counts = np.zeros(self.nbins, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        """
+        Adds an array of values to the histogram.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+
+        idx = np.zeros(values.size, dtype=np.int64)
+        pos = values >= 1.0
+        idx[pos] = (
+            np.floor(np.log10(values[pos]) * self.bins_per_decade).astype(np.int64) + 1
+        )
+        # Values in (0, 1) share the first non-zero bin
+        idx[(values > 0.0) & ~pos] = 1
+        np.clip(idx, 0, self.nbins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.nbins)
+
+        self.n += int(values.size)
+        self.total += float(values.sum())
+        vmin = float(values.min())
+        vmax = float(values.max())
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+
+    def bin_edges(self):
+        """
+        Returns the (start, end) arrays of all bins. The zero bin is [0, 0]
+        and the first non-zero bin also holds values below one.
+        """
+        exps = np.arange(self.nbins - 1, dtype=np.float64) / self.bins_per_decade
+        starts = np.concatenate([[0.0], 10.0**exps])
+        ends = np.concatenate([[0.0], 10.0 ** (exps + 1.0 / self.bins_per_decade)])
+        return starts, ends
+
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def quantiles(self, qs):
+        """
+        Approximate quantiles, interpolated log-linearly inside the bin holding
+        each requested rank and clamped to the observed min/max.
+        """
+        if not self.n:
+            return [None for _ in qs]
+
+        starts, ends = self.bin_edges()
+        cum = np.cumsum(self.counts)
+        res = []
+        for q in qs:
+            rank = q * (self.n - 1)
+            i = int(np.searchsorted(cum, rank, side="right"))
+            i = min(i, self.nbins - 1)
+            if i == 0:
+                val = 0.0
+            else:
+                frac = (rank - cum[i - 1]) / self.counts[i]
+                lo, hi = starts[i], ends[i]
+                if i == 1:
+                    lo = min(lo, self.min) if self.min > 0 else 0.0
+                    val = lo + frac * (hi - lo)
+                else:
+                    val = float(np.exp(np.log(lo) + frac * (np.log(hi) - np.log(lo))))
+            res.append(float(min(max(val, self.min), self.max)))
+        return res
+
+    def nonempty_bins(self):
+        """
+        Yields (bin_start, bin_end, count) for all non-empty bins.
+        """
+        starts, ends = self.bin_edges()
+        for i in np.flatnonzero(self.counts):
+            yield float(starts[i]), float(ends[i]), int(self.counts[i])
+
+    def knee_points(self):
+        """
+        Points of the barcode-rank (knee) plot: for every non-empty bin in
+        descending order, the rank of the last barcode with a value at least
+        the bin start.
+        """
+        starts, _ = self.bin_edges()
+        points = []
+        rank = 0
+        for i in np.flatnonzero(self.counts)[::-1]:
+            rank += int(self.counts[i])
+            points.append((rank, float(starts[i])))
+        return points
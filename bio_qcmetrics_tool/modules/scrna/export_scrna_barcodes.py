@@ -0,0 +1,262 @@
+"""QC Module for Exporting 10x per-barcode metrics
+
+Per-barcode outputs (e.g., ``per_barcode_metrics.csv``) hold millions of
+rows, so they are streamed in chunks and reduced to histograms, quantiles
+and knee-plot points instead of being stored row by row.
+"""
+import os
+
+import pandas as pd
+
+from bio_qcmetrics_tool.modules.base import ExportQcModule
+from bio_qcmetrics_tool.modules.exceptions import (
+    DuplicateInputException,
+    ParserException,
+)
+from bio_qcmetrics_tool.modules.scrna.distribution import LogHistogram
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class ExportTenXBarcodeMetrics(ExportQcModule):
+    """Extract distributions from 10x per-barcode metrics"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="10x scrna barcode metrics", options=options)
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-i",
+            "--inputs",
+            action="append",
+            required=True,
+            help="Input per-barcode metrics csv file (optionally gzipped). "
+            "May be used one or more times",
+        )
+
+        subparser.add_argument(
+            "-j",
+            "--job_uuid",
+            type=str,
+            required=True,
+            help="The job uuid associated with the inputs.",
+        )
+
+        subparser.add_argument(
+            "-b",
+            "--bam",
+            type=str,
+            required=True,
+            help="The bam that the metrics were derived from.",
+        )
+
+        subparser.add_argument(
+            "--umi_column",
+            default="gex_umis_count",
+            help="Column holding the UMI count per barcode.",
+        )
+
+        subparser.add_argument(
+            "--genes_column",
+            default="gex_genes_count",
+            help="Column holding the number of detected genes per barcode.",
+        )
+
+        subparser.add_argument(
+            "--cell_column",
+            default="is_cell",
+            help="Column flagging barcodes called as cells.",
+        )
+
+        subparser.add_argument(
+            "--reads_column",
+            default="gex_raw_reads",
+            help="Column holding the number of reads per barcode.",
+        )
+
+        subparser.add_argument(
+            "--chunksize",
+            type=int,
+            default=500000,
+            help="Number of rows to read at a time.",
+        )
+
+        subparser.add_argument(
+            "--bins_per_decade",
+            type=int,
+            default=32,
+            help="Resolution of the log-spaced histograms.",
+        )
+
+    @classmethod
+    def __get_description__(cls):
+        return "Extract distributions from 10x per-barcode metrics."
+
+    def do_work(self):
+        super().do_work()
+
+        self.logger.info(
+            "Processing {0} 10x per-barcode metrics files...".format(
+                len(self.options["inputs"])
+            )
+        )
+
+        for barcodefile in self.options["inputs"]:
+            basename = os.path.basename(barcodefile)
+            if basename in self.data:
+                raise DuplicateInputException(
+                    "Duplicate input files?? {0}".format(basename)
+                )
+            self.logger.info("Processing {0}".format(basename))
+            self.data[basename] = dict()
+            stats, histograms = self._parse_barcodes(barcodefile)
+            self.data[basename]["10x_scrna_barcodes"] = {
+                "bam": os.path.basename(self.options["bam"]),
+                "job_uuid": self.options["job_uuid"],
+                "stats": stats,
+                "histograms": histograms,
+            }
+            self.stream_rows(basename)
+
+        # Export data
+        self.export()
+
+    def metric_tables(self):
+        for source in sorted(self.data):
+            record = self.data[source]["10x_scrna_barcodes"]
+            constants = {
+                "job_uuid": record["job_uuid"],
+                "bam": record["bam"],
+                "metrics_file": source,
+            }
+            keys = sorted(record["stats"])
+            yield MetricTable(
+                "10x_scrna_barcode_stats",
+                constants=constants,
+                columns={
+                    "category": keys,
+                    "value": [record["stats"][k] for k in keys],
+                },
+            )
+
+            summary = MetricTable("10x_scrna_barcode_summary", constants=constants)
+            histograms = MetricTable(
+                "10x_scrna_barcode_histogram",
+                constants=constants,
+                columns={
+                    "metric": [],
+                    "population": [],
+                    "bin_start": [],
+                    "bin_end": [],
+                    "n_barcodes": [],
+                },
+            )
+            knee = MetricTable("10x_scrna_barcode_knee", constants=constants)
+            for (metric, population), hist in sorted(record["histograms"].items()):
+                if not hist.n:
+                    continue
+                curr = {
+                    "metric": metric,
+                    "population": population,
+                    "n": hist.n,
+                    "mean": hist.mean(),
+                    "min": hist.min,
+                    "max": hist.max,
+                }
+                for q, val in zip(QUANTILES, hist.quantiles(QUANTILES)):
+                    curr["p{0:02d}".format(int(q * 100))] = val
+                summary.append(curr)
+
+                bins = list(hist.nonempty_bins())
+                histograms.extend(
+                    {
+                        "metric": [metric] * len(bins),
+                        "population": [population] * len(bins),
+                        "bin_start": [i[0] for i in bins],
+                        "bin_end": [i[1] for i in bins],
+                        "n_barcodes": [i[2] for i in bins],
+                    }
+                )
+
+                if metric == "umis" and population == "barcode":
+                    points = hist.knee_points()
+                    knee = MetricTable(
+                        "10x_scrna_barcode_knee",
+                        constants=constants,
+                        columns={
+                            "rank": [i[0] for i in points],
+                            "umis": [i[1] for i in points],
+                        },
+                    )
+
+            yield summary
+            yield histograms
+            yield knee
+
+    def _parse_barcodes(self, fpath):
+        """
+        Streams the per-barcode file in chunks and accumulates the stats and
+        histograms of UMIs and genes for all barcodes and for cells.
+        """
+        umi_col = self.options.get("umi_column", "gex_umis_count")
+        genes_col = self.options.get("genes_column", "gex_genes_count")
+        cell_col = self.options.get("cell_column", "is_cell")
+        reads_col = self.options.get("reads_column", "gex_raw_reads")
+        bins_per_decade = self.options.get("bins_per_decade", 32)
+
+        header = pd.read_csv(fpath, nrows=0).columns
+        if umi_col not in header:
+            raise ParserException(
+                "Column '{0}' not found in {1}. Check file.".format(umi_col, fpath)
+            )
+        usecols = [c for c in [umi_col, genes_col, cell_col, reads_col] if c in header]
+
+        histograms = dict()
+        for metric in ["umis", "genes"]:
+            for population in ["barcode", "cell"]:
+                histograms[(metric, population)] = LogHistogram(
+                    bins_per_decade=bins_per_decade
+                )
+
+        n_barcodes = 0
+        n_cells = 0
+        total_reads = 0
+        reads_in_cells = 0
+        reader = pd.read_csv(
+            fpath, usecols=usecols, chunksize=self.options.get("chunksize", 500000)
+        )
+        for chunk in reader:
+            if cell_col in chunk:
+                is_cell = chunk[cell_col].fillna(0).astype(bool).to_numpy()
+            else:
+                is_cell = None
+
+            n_barcodes += len(chunk)
+            n_cells += int(is_cell.sum()) if is_cell is not None else 0
+
+            columns = [("umis", umi_col)]
+            if genes_col in chunk:
+                columns.append(("genes", genes_col))
+            for metric, col in columns:
+                values = chunk[col].to_numpy(dtype="float64")
+                histograms[(metric, "barcode")].update(values)
+                if is_cell is not None:
+                    histograms[(metric, "cell")].update(values[is_cell])
+
+            if reads_col in chunk:
+                reads = chunk[reads_col].to_numpy(dtype="float64")
+                total_reads += float(reads.sum())
+                if is_cell is not None:
+                    reads_in_cells += float(reads[is_cell].sum())
+
+        stats = {
+            "n_barcodes": n_barcodes,
+            "n_cells": n_cells if cell_col in usecols else None,
+            "total_reads": total_reads if reads_col in usecols else None,
+            "fraction_reads_in_cells": reads_in_cells / total_reads
+            if total_reads and cell_col in usecols
+            else None,
+        }
+        return stats, histograms
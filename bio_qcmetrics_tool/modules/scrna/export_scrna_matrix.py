@@ -0,0 +1,330 @@
+"""QC Module for Exporting per-cell QC from 10x Matrix Market output
+
+The ``filtered_feature_bc_matrix`` coordinate triples are streamed in chunks
+and reduced into per-cell accumulators, so a dense (or even sparse) matrix
+is never built.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from bio_qcmetrics_tool.modules.base import ExportQcModule
+from bio_qcmetrics_tool.modules.exceptions import (
+    DuplicateInputException,
+    ParserException,
+)
+from bio_qcmetrics_tool.modules.scrna.distribution import LogHistogram
+from bio_qcmetrics_tool.modules.table import MetricTable
+from bio_qcmetrics_tool.utils.parse import get_read_func
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class ExportTenXMatrixMetrics(ExportQcModule):
+    """Extract per-cell QC from 10x filtered feature-barcode matrices"""
+
+    def __init__(self, options=dict()):
+        super().__init__(name="10x scrna matrix metrics", options=options)
+
+    @classmethod
+    def __add_arguments__(cls, subparser):
+        subparser.add_argument(
+            "-i",
+            "--inputs",
+            action="append",
+            required=True,
+            help="Input filtered_feature_bc_matrix directory containing "
+            "matrix.mtx[.gz], features.tsv[.gz] and barcodes.tsv[.gz]. "
+            "May be used one or more times",
+        )
+
+        subparser.add_argument(
+            "-j",
+            "--job_uuid",
+            type=str,
+            required=True,
+            help="The job uuid associated with the inputs.",
+        )
+
+        subparser.add_argument(
+            "-b",
+            "--bam",
+            type=str,
+            required=True,
+            help="The bam that the metrics were derived from.",
+        )
+
+        subparser.add_argument(
+            "--mito_prefix",
+            default="MT-",
+            help="Case-insensitive gene name prefix of mitochondrial genes.",
+        )
+
+        subparser.add_argument(
+            "--chunksize",
+            type=int,
+            default=1000000,
+            help="Number of matrix entries to read at a time.",
+        )
+
+        subparser.add_argument(
+            "--per_cell",
+            action="store_true",
+            help="Also write one row per cell barcode.",
+        )
+
+    @classmethod
+    def __get_description__(cls):
+        return "Extract per-cell QC from 10x Matrix Market output."
+
+    def do_work(self):
+        super().do_work()
+
+        self.logger.info(
+            "Processing {0} 10x matrix directories...".format(
+                len(self.options["inputs"])
+            )
+        )
+
+        for matrix_dir in self.options["inputs"]:
+            basename = os.path.basename(os.path.normpath(matrix_dir))
+            if basename in self.data:
+                raise DuplicateInputException(
+                    "Duplicate input files?? {0}".format(basename)
+                )
+            self.logger.info("Processing {0}".format(basename))
+            self.data[basename] = dict()
+            self.data[basename]["10x_scrna_cell_qc"] = {
+                "bam": os.path.basename(self.options["bam"]),
+                "job_uuid": self.options["job_uuid"],
+                "data": self._parse_matrix_dir(matrix_dir),
+            }
+            self.stream_rows(basename)
+
+        # Export data
+        self.export()
+
+    def metric_tables(self):
+        for source in sorted(self.data):
+            record = self.data[source]["10x_scrna_cell_qc"]
+            parsed = record["data"]
+            constants = {
+                "job_uuid": record["job_uuid"],
+                "bam": record["bam"],
+                "matrix_dir": source,
+            }
+            keys = sorted(parsed["stats"])
+            yield MetricTable(
+                "10x_scrna_cell_qc_stats",
+                constants=constants,
+                columns={
+                    "category": keys,
+                    "value": [parsed["stats"][k] for k in keys],
+                },
+            )
+
+            summary = MetricTable("10x_scrna_cell_qc_summary", constants=constants)
+            histograms = MetricTable(
+                "10x_scrna_cell_qc_histogram",
+                constants=constants,
+                columns={"metric": [], "bin_start": [], "bin_end": [], "n_cells": []},
+            )
+            for metric in ["total_umis", "n_genes", "pct_mito"]:
+                values = parsed["cells"][metric]
+                values = values[~np.isnan(values)]
+                if not values.size:
+                    continue
+                curr = {
+                    "metric": metric,
+                    "n": int(values.size),
+                    "mean": float(values.mean()),
+                    "min": float(values.min()),
+                    "max": float(values.max()),
+                }
+                for q, val in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                    curr["p{0:02d}".format(int(q * 100))] = float(val)
+                summary.append(curr)
+
+                bins = list(self._histogram(metric, values))
+                histograms.extend(
+                    {
+                        "metric": [metric] * len(bins),
+                        "bin_start": [i[0] for i in bins],
+                        "bin_end": [i[1] for i in bins],
+                        "n_cells": [i[2] for i in bins],
+                    }
+                )
+
+            yield summary
+            yield histograms
+
+            if self.options.get("per_cell"):
+                # The per-cell accumulators are used as columns as they are
+                yield MetricTable(
+                    "10x_scrna_cell_qc",
+                    constants=constants,
+                    columns={
+                        "barcode": parsed["barcodes"],
+                        "total_umis": parsed["cells"]["total_umis"],
+                        "n_genes": parsed["cells"]["n_genes"],
+                        "pct_mito": parsed["cells"]["pct_mito"],
+                    },
+                )
+
+    def _histogram(self, metric, values):
+        """
+        Log-spaced bins for counts, 1% bins for the mitochondrial percentage.
+        """
+        if metric == "pct_mito":
+            counts, edges = np.histogram(values, bins=100, range=(0.0, 100.0))
+            for i in np.flatnonzero(counts):
+                yield float(edges[i]), float(edges[i + 1]), int(counts[i])
+        else:
+            hist = LogHistogram()
+            hist.update(values)
+            for item in hist.nonempty_bins():
+                yield item
+
+    def _find_file(self, matrix_dir, names):
+        """
+        Returns the first existing file among the candidate names.
+        """
+        for name in names:
+            for fname in [name + ".gz", name]:
+                fpath = os.path.join(matrix_dir, fname)
+                if os.path.exists(fpath):
+                    return fpath
+        raise ParserException(
+            "Unable to find {0} in {1}".format(" or ".join(names), matrix_dir)
+        )
+
+    def _read_features(self, fpath):
+        """
+        Returns the boolean masks of gene expression features and mitochondrial
+        genes in matrix row order.
+        """
+        prefix = self.options.get("mito_prefix", "MT-").upper()
+        rfunc = get_read_func(fpath)
+        is_gex = []
+        is_mito = []
+        with rfunc(fpath, "rt") as fh:
+            for line in fh:
+                cols = line.rstrip("\r\n").split("\t")
+                name = cols[1] if len(cols) > 1 else cols[0]
+                ftype = cols[2] if len(cols) > 2 else "Gene Expression"
+                gex = ftype == "Gene Expression"
+                is_gex.append(gex)
+                is_mito.append(gex and name.upper().startswith(prefix))
+        return np.array(is_gex, dtype=bool), np.array(is_mito, dtype=bool)
+
+    def _read_barcodes(self, fpath, keep=True):
+        """
+        Returns the list of barcodes, or only their number if ``keep`` is
+        False so that large matrices don't hold millions of strings.
+        """
+        rfunc = get_read_func(fpath)
+        with rfunc(fpath, "rt") as fh:
+            if keep:
+                return [line.rstrip("\r\n") for line in fh]
+            return sum(1 for _ in fh)
+
+    def _read_matrix_header(self, fpath):
+        """
+        Returns the number of header lines and the (rows, cols, entries)
+        dimensions of a coordinate Matrix Market file.
+        """
+        rfunc = get_read_func(fpath)
+        with rfunc(fpath, "rt") as fh:
+            banner = fh.readline()
+            if not banner.startswith("%%MatrixMarket matrix coordinate"):
+                raise ParserException(
+                    "Not a coordinate Matrix Market file: {0}".format(fpath)
+                )
+            nlines = 1
+            for line in fh:
+                nlines += 1
+                if not line.startswith("%"):
+                    dims = [int(i) for i in line.split()]
+                    return nlines, dims
+        raise ParserException("Missing dimensions line in {0}".format(fpath))
+
+    def _parse_matrix_dir(self, matrix_dir):
+        """
+        Streams the matrix entries and accumulates per-cell total UMIs,
+        detected genes and mitochondrial UMIs.
+        """
+        matrix_file = self._find_file(matrix_dir, ["matrix.mtx"])
+        features_file = self._find_file(matrix_dir, ["features.tsv", "genes.tsv"])
+        barcodes_file = self._find_file(matrix_dir, ["barcodes.tsv"])
+
+        is_gex, is_mito = self._read_features(features_file)
+        nheader, (nrows, ncols, nentries) = self._read_matrix_header(matrix_file)
+        if nrows != len(is_gex):
+            raise ParserException(
+                "Matrix has {0} rows but {1} features were found".format(
+                    nrows, len(is_gex)
+                )
+            )
+
+        total_umis = np.zeros(ncols, dtype=np.float64)
+        n_genes = np.zeros(ncols, dtype=np.int64)
+        mito_umis = np.zeros(ncols, dtype=np.float64)
+        nread = 0
+        reader = pd.read_csv(
+            matrix_file,
+            sep=" ",
+            header=None,
+            skiprows=nheader,
+            names=["row", "col", "value"],
+            dtype={"row": np.int64, "col": np.int64, "value": np.float64},
+            chunksize=self.options.get("chunksize", 1000000),
+        )
+        for chunk in reader:
+            rows = chunk["row"].to_numpy() - 1
+            cols = chunk["col"].to_numpy() - 1
+            values = chunk["value"].to_numpy()
+            nread += len(rows)
+
+            gex = is_gex[rows]
+            cols = cols[gex]
+            values = values[gex]
+            total_umis += np.bincount(cols, weights=values, minlength=ncols)
+            n_genes += np.bincount(cols[values > 0], minlength=ncols)
+
+            mito = is_mito[rows[gex]]
+            mito_umis += np.bincount(cols[mito], weights=values[mito], minlength=ncols)
+
+        if nread != nentries:
+            raise ParserException(
+                "Expected {0} matrix entries but found {1}".format(nentries, nread)
+            )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct_mito = np.where(total_umis > 0, 100.0 * mito_umis / total_umis, np.nan)
+
+        barcodes = self._read_barcodes(
+            barcodes_file, keep=self.options.get("per_cell", False)
+        )
+        nbarcodes = barcodes if isinstance(barcodes, int) else len(barcodes)
+        if nbarcodes != ncols:
+            raise ParserException(
+                "Matrix has {0} columns but {1} barcodes were found".format(
+                    ncols, nbarcodes
+                )
+            )
+
+        return {
+            "stats": {
+                "n_cells": ncols,
+                "n_features": nrows,
+                "n_entries": nentries,
+                "n_mito_features": int(is_mito.sum()),
+            },
+            "barcodes": barcodes,
+            "cells": {
+                "total_umis": total_umis,
+                "n_genes": n_genes.astype(np.float64),
+                "pct_mito": pct_mito,
+            },
+        }
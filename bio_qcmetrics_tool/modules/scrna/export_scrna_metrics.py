@@ -3,20 +3,20 @@
 """
 import csv
 import os
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
 from bio_qcmetrics_tool.modules.exceptions import (
     DuplicateInputException,
     ParserException,
 )
+from bio_qcmetrics_tool.modules.table import MetricTable
 
 
 class ExportTenXScrnaMetrics(ExportQcModule):
     """Extract 10x scrna metrics"""
 
+    input_options = ["inputs"]
+
     def __init__(self, options=dict()):
         super().__init__(name="10x scrna metrics", options=options)
 
@@ -67,38 +67,29 @@ class ExportTenXScrnaMetrics(ExportQcModule):
                 )
             self.logger.info("Processing {0}".format(basename))
             self.data[basename] = dict()
-            with open(scrnametricsfile, 'r') as csvfile:
+            with self.open_input(scrnametricsfile, "rt") as csvfile:
                 self.data[basename]["10x_scrna_metrics"] = {
                     "bam": os.path.basename(self.options["bam"]),
                     "job_uuid": self.options["job_uuid"],
                     "data": self._parse_scrnametrics(csvfile),
                 }
+            self.stream_rows(basename)
         # Export data
         self.export()
 
-    def to_sqlite(self):
-        data = []
+    def metric_tables(self):
         for source in sorted(self.data):
             record = self.data[source]["10x_scrna_metrics"]
-            for section in sorted(record["data"]):
-                curr = {
+            yield MetricTable(
+                "10x_scrna_metrics",
+                constants={
                     "job_uuid": record["job_uuid"],
                     "bam": record["bam"],
                     "metrics_file": source,
-                    "category": section,
-                }
-                data.append(curr)
-
-        if data:
-            self.logger.info(
-                "Writing metrics to sqlite file {0}".format(self.options["output"])
+                },
+                columns={"category": sorted(record["data"])},
             )
 
-            with sqlite3.connect(self.options["output"]) as conn:
-                df = pd.DataFrame(data)
-                table_name = "10x_scrna_metrics"
-                df.to_sql(table_name, conn, if_exists="append")
-
     def _parse_scrnametrics(self, csvfile):
         """
         Parse the 10x metrics data from the loaded file data
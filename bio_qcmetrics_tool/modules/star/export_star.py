@@ -12,16 +12,29 @@ Some of the file-parsing logic is adapted from:
 """
 import os
 import re
-import sqlite3
-
-import pandas as pd
 
 from bio_qcmetrics_tool.modules.base import ExportQcModule
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+# Final log metrics copied to the sample_qc_summary table
+SUMMARY_FIELDS = [
+    "total_reads",
+    "uniquely_mapped",
+    "uniquely_mapped_percent",
+    "multimapped_percent",
+    "mismatch_rate",
+    "chimeric_percent",
+]
 
 
 class ExportStarStats(ExportQcModule):
     """Extract STAR logs/gene counts metrics"""
 
+    input_options = ["final_log_inputs", "gene_counts_inputs"]
+    parallel_options = ["bam"]
+    wide_tables = {"star_stats": ("category", {"value": "{0}"})}
+    cacheable = True
+
     def __init__(self, options=dict()):
         super().__init__(name="star", options=options)
 
@@ -86,8 +99,11 @@ class ExportStarStats(ExportQcModule):
                 )
                 self.logger.info("Processing {0}".format(source))
                 self.data[source] = dict()
-                self.data[source]["star_stats"] = self.parse_star_final_log(star_file)
+                self.data[source]["star_stats"] = self.cached_parse(
+                    star_file, self.parse_star_final_log, star_file
+                )
                 self.data[source]["star_stats"]["bam"] = os.path.basename(bam)
+                self.stream_rows(source)
 
         if self.options["gene_counts_inputs"]:
             for star_file, bam in zip(
@@ -99,10 +115,11 @@ class ExportStarStats(ExportQcModule):
                 )
                 self.logger.info("Processing {0}".format(source))
                 self.data[source] = dict()
-                self.data[source][
-                    "star_gene_counts"
-                ] = self.parse_star_genecount_report(star_file)
+                self.data[source]["star_gene_counts"] = self.cached_parse(
+                    star_file, self.parse_star_genecount_report, star_file
+                )
                 self.data[source]["star_gene_counts"]["bam"] = os.path.basename(bam)
+                self.stream_rows(source)
 
         # Export
         self.export()
@@ -136,7 +153,7 @@ class ExportStarStats(ExportQcModule):
             "chimeric_percent": r"% of chimeric reads \|\s+([\d\.]+)",
         }
 
-        with open(fil, "rt") as fh:
+        with self.open_input(fil, "rt") as fh:
             raw_data = fh.read()
 
         parsed_data = {}
@@ -208,7 +225,7 @@ class ExportStarStats(ExportQcModule):
         second_strand = {"N_genes": 0}
         num_errors = 0
         num_genes = 0
-        with open(f, "rt") as fh:
+        with self.open_input(f, "rt") as fh:
             for line in fh:
                 s = line.split("\t")
                 try:
@@ -238,52 +255,56 @@ class ExportStarStats(ExportQcModule):
         else:
             return None
 
-    def to_sqlite(self):
-        star_stats = []
-        star_genes = []
+    def sample_summary(self):
+        summary = dict()
+        for source in sorted(self.data):
+            if "star_stats" not in self.data[source]:
+                continue
+            stats = self.data[source]["star_stats"]
+            curr = summary.setdefault(stats["bam"], dict())
+            curr["star_job_uuid"] = self.options["job_uuid"]
+            for key in SUMMARY_FIELDS:
+                if key in stats:
+                    curr["star_{0}".format(key)] = stats[key]
+        return summary
+
+    def metric_tables(self):
         for source in sorted(self.data):
             if "star_stats" in self.data[source]:
-                bam = self.data[source]["star_stats"]["bam"]
-                for key in sorted(self.data[source]["star_stats"]):
-                    if key == "bam":
-                        continue
-                    row = {
-                        "category": key,
-                        "value": self.data[source]["star_stats"][key],
+                stats = self.data[source]["star_stats"]
+                keys = sorted(k for k in stats if k != "bam")
+                yield MetricTable(
+                    "star_stats",
+                    constants={
                         "star_file": source,
-                        "bam": bam,
+                        "bam": stats["bam"],
                         "job_uuid": self.options["job_uuid"],
-                    }
-                    star_stats.append(row)
+                    },
+                    columns={
+                        "category": keys,
+                        "value": [stats[k] for k in keys],
+                    },
+                )
 
             if "star_gene_counts" in self.data[source]:
-                bam = self.data[source]["star_gene_counts"]["bam"]
-                for strand in self.data[source]["star_gene_counts"]:
+                counts = self.data[source]["star_gene_counts"]
+                table = MetricTable(
+                    "star_gene_counts",
+                    constants={
+                        "star_file": source,
+                        "bam": counts["bam"],
+                        "job_uuid": self.options["job_uuid"],
+                    },
+                )
+                for strand in counts:
                     if strand == "bam":
                         continue
-                    for key in sorted(self.data[source]["star_gene_counts"][strand]):
-                        row = dict()
-                        row["category"] = key
-                        row["value"] = self.data[source]["star_gene_counts"][strand][
-                            key
-                        ]
-                        row["strand"] = strand
-                        row["star_file"] = source
-                        row["bam"] = bam
-                        row["job_uuid"] = self.options["job_uuid"]
-                        star_genes.append(row)
-
-        self.logger.info(
-            "Writing metrics to sqlite file {0}".format(self.options["output"])
-        )
-
-        with sqlite3.connect(self.options["output"]) as conn:
-            if star_stats:
-                df = pd.DataFrame(star_stats)
-                table_name = "star_stats"
-                df.to_sql(table_name, conn, if_exists="append")
-
-            if star_genes:
-                df = pd.DataFrame(star_genes)
-                table_name = "star_gene_counts"
-                df.to_sql(table_name, conn, if_exists="append")
+                    for key in sorted(counts[strand]):
+                        table.append(
+                            {
+                                "category": key,
+                                "value": counts[strand][key],
+                                "strand": strand,
+                            }
+                        )
+                yield table
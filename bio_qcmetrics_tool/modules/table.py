@@ -0,0 +1,139 @@
+"""Columnar intermediate representation of exported metrics"""
+import numpy as np
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.parse import parse_type
+
+
+class MetricTable:
+    """
+    Array-backed container for rows of one output table. Every column is a
+    single list (or numpy array) and columns holding the same value on every
+    row, like ``job_uuid``, ``bam`` or the source file, are stored once in
+    ``constants``. Optional ``dtypes`` map columns to numpy dtypes that are
+    applied when the table is converted to a DataFrame.
+    """
+
+    __slots__ = ("name", "constants", "columns", "dtypes", "nrows")
+
+    def __init__(self, name, constants=None, columns=None, dtypes=None):
+        """
+        :param name: the output table name
+        :param constants: dict of columns with a single value for all rows
+        :param columns: dict of column name to list or numpy array of values
+        :param dtypes: dict of column name to numpy dtype
+        """
+        self.name = name
+        self.constants = dict() if constants is None else dict(constants)
+        self.dtypes = dict() if dtypes is None else dict(dtypes)
+        self.columns = dict()
+        self.nrows = 0
+        if columns:
+            lengths = set(len(values) for values in columns.values())
+            if len(lengths) > 1:
+                raise ValueError(
+                    "Columns of table {0} have different lengths".format(name)
+                )
+            self.columns = dict(columns)
+            self.nrows = lengths.pop()
+
+    @classmethod
+    def from_rows(cls, name, colnames, rows, constants=None, dtypes=None):
+        """
+        Builds a table from a list of column names and row value lists.
+        """
+        columns = {col: [] for col in colnames}
+        for row in rows:
+            for col, value in zip(colnames, row):
+                columns[col].append(value)
+        table = cls(name, constants=constants, dtypes=dtypes)
+        table.columns = columns
+        table.nrows = len(rows)
+        return table
+
+    def __len__(self):
+        return self.nrows
+
+    def append(self, row):
+        """
+        Appends a row dict to a list-backed table. Columns missing from the
+        row are set to None and new columns are None for earlier rows.
+        """
+        for key in row:
+            if key not in self.columns:
+                self.columns[key] = [None] * self.nrows
+        for key, values in self.columns.items():
+            values.append(row.get(key))
+        self.nrows += 1
+
+    def extend(self, columns):
+        """
+        Appends several rows to a list-backed table given a dict of equally
+        long value lists for all of its columns.
+        """
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) != 1 or set(columns) != set(self.columns):
+            raise ValueError(
+                "Rows appended to table {0} must have all of its columns "
+                "with the same length".format(self.name)
+            )
+        for key, values in columns.items():
+            self.columns[key].extend(values)
+        self.nrows += lengths.pop()
+
+    def column_names(self):
+        """
+        Returns the names of all columns, constants last.
+        """
+        return list(self.columns) + [
+            key for key in self.constants if key not in self.columns
+        ]
+
+    def column(self, key):
+        """
+        Returns the values of a column converted to its dtype, if any.
+        """
+        values = self.columns[key]
+        dtype = self.dtypes.get(key)
+        return values if dtype is None else np.asarray(values, dtype=dtype)
+
+    def rows(self):
+        """
+        Yields each row as a dict.
+        """
+        names = list(self.columns)
+        values = [self.columns[key] for key in names]
+        for i in range(self.nrows):
+            row = dict(zip(names, [col[i] for col in values]))
+            row.update(self.constants)
+            yield row
+
+    def to_wide(self, name, category, values):
+        """
+        Returns a table with a single row keyed by the constants of this
+        table. Each row of this table becomes one column per ``values``
+        column, named by formatting the ``{column: format}`` dict with the
+        ``category`` value. Numbers held as strings are converted.
+        """
+        row = dict()
+        for i, key in enumerate(self.columns[category]):
+            for col, fmt in values.items():
+                value = self.columns[col][i]
+                row[fmt.format(key)] = (
+                    parse_type(value) if isinstance(value, str) else value
+                )
+        table = MetricTable(name, constants=self.constants)
+        table.append(row)
+        return table
+
+    def to_frame(self):
+        """
+        Returns the table as a DataFrame without building per-row objects.
+        """
+        df = pd.DataFrame(
+            {key: self.column(key) for key in self.columns},
+            index=pd.RangeIndex(self.nrows),
+        )
+        for key, value in self.constants.items():
+            df[key] = value
+        return df
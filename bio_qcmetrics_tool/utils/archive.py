@@ -0,0 +1,80 @@
+"""Reading inputs directly from tar archives.
+
+An input given as ``archive.tar.gz`` or ``archive.tar.gz::GLOB`` refers to the
+regular members of the archive, optionally only those whose path matches
+``GLOB`` (e.g., ``archive.tar.gz::*_fastqc.zip``). The archive is streamed
+once and the matching members are kept in memory, so nothing is extracted
+to disk. Each member is then addressed as ``archive.tar.gz::/path/in/tar``,
+whose basename is the basename of the member.
+"""
+import fnmatch
+import posixpath
+import tarfile
+
+from bio_qcmetrics_tool.utils.parse import open_file
+
+ARCHIVE_SEPARATOR = "::"
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_tar_name(path):
+    """
+    Whether a path has the file extension of a tar archive.
+    """
+    return path.lower().endswith(TAR_SUFFIXES)
+
+
+def split_archive_path(value):
+    """
+    Returns ``(archive, pattern)`` for an input referring to a tar archive,
+    with pattern None when all members are selected, or None for other
+    inputs, including single members (``archive::/member``).
+    """
+    archive, sep, pattern = value.partition(ARCHIVE_SEPARATOR)
+    if not is_tar_name(archive) or pattern.startswith("/"):
+        return None
+    if not sep:
+        return archive, None
+    return archive, normalize_member(pattern) or None
+
+
+def normalize_member(name):
+    """
+    Returns a member path without leading ``./`` or ``/``.
+    """
+    name = posixpath.normpath(name) if name else name
+    return name.lstrip("/") if name not in (".", "") else ""
+
+
+def member_path(archive, member):
+    """
+    Returns the input path of an archive member.
+    """
+    return "{0}{1}/{2}".format(archive, ARCHIVE_SEPARATOR, normalize_member(member))
+
+
+def match_member(name, pattern):
+    """
+    Whether a normalized member name matches a glob pattern. A None
+    pattern matches all members.
+    """
+    return pattern is None or fnmatch.fnmatchcase(name, pattern)
+
+
+def read_members(archive, patterns):
+    """
+    Streams a tar archive and returns a ``{member name: bytes}`` dict of its
+    regular members, in archive order, matching any of the glob patterns.
+    A None pattern matches all members.
+    """
+    members = dict()
+    with open_file(archive, "rb") as fh:
+        with tarfile.open(fileobj=fh, mode="r|*") as tar:
+            for info in tar:
+                if not info.isfile():
+                    continue
+                name = normalize_member(info.name)
+                if any(match_member(name, pattern) for pattern in patterns):
+                    members[name] = tar.extractfile(info).read()
+    return members
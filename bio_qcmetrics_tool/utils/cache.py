@@ -0,0 +1,197 @@
+"""Persistent on-disk cache of parser results.
+
+Entries are keyed on the input path, size and modification time, the tool
+version and any parser options, so a changed input or a new release never
+returns stale results. Values are serialized as JSON, never pickled, so that
+a shared cache directory can't be used to run code, and zlib-compressed into
+one file per entry. Reading an entry refreshes its mtime, and once the cache
+grows beyond its size limit the least recently used entries are removed.
+"""
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+
+from bio_qcmetrics_tool import __version__
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+_MISSING = object()
+
+# Keys of the JSON objects holding values that JSON has no type for
+_TUPLE = "__tuple__"
+_BYTES = "__bytes__"
+_ITEMS = "__items__"
+
+
+def _encode(value):
+    """
+    Converts a parser result into JSON-compatible values, tagging tuples,
+    bytes and dicts with non-string keys so that `_decode` restores them.
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_encode(i) for i in value]
+    if isinstance(value, tuple):
+        return {_TUPLE: [_encode(i) for i in value]}
+    if isinstance(value, bytes):
+        return {_BYTES: base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) and not k.startswith("__") for k in value):
+            return dict((k, _encode(v)) for k, v in value.items())
+        return {_ITEMS: [[_encode(k), _encode(v)] for k, v in value.items()]}
+    raise TypeError("Can't cache a value of type {0}".format(type(value).__name__))
+
+
+def _decode(obj):
+    if _TUPLE in obj:
+        return tuple(obj[_TUPLE])
+    if _BYTES in obj:
+        return base64.b64decode(obj[_BYTES])
+    if _ITEMS in obj:
+        return dict((_hashable(k), v) for k, v in obj[_ITEMS])
+    return obj
+
+
+def _hashable(key):
+    return tuple(_hashable(i) for i in key) if isinstance(key, list) else key
+
+
+def dumps(value):
+    """
+    Serializes a parser result of builtin types into compressed JSON.
+    """
+    return zlib.compress(json.dumps(_encode(value)).encode("utf-8"))
+
+
+def loads(data):
+    """
+    Reads a value serialized by `dumps`.
+    """
+    return json.loads(zlib.decompress(data).decode("utf-8"), object_hook=_decode)
+
+
+class ParseCache:
+    """
+    Directory of cached parser results with LRU eviction by total size.
+    """
+
+    SUFFIX = ".jsz"
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def key(self, namespace, fpath, extra=None):
+        """
+        Returns the key of a parser result for an input file.
+        """
+        st = os.stat(fpath)
+        ident = repr(
+            (
+                namespace,
+                os.path.abspath(fpath),
+                st.st_size,
+                st.st_mtime_ns,
+                __version__,
+                extra,
+            )
+        )
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value or ``default``. Unreadable entries are
+        removed and treated as missing.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = loads(fh.read())
+        except FileNotFoundError:
+            return default
+        except Exception:
+            self._remove(path)
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        """
+        Stores a value atomically and evicts old entries if needed.
+        """
+        data = dumps(value)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, self._path(key))
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def get_or_parse(self, namespace, fpath, func, extra=None):
+        """
+        Returns the cached result of ``func()`` for the input file, calling
+        it and caching its result on a miss.
+        """
+        key = self.key(namespace, fpath, extra=extra)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            self.set(key, value)
+        return value
+
+    def _entries(self):
+        """
+        Yields (path, size, mtime) of all entries.
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime_ns
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        ``max_size``.
+        """
+        entries = sorted(self._entries(), key=lambda i: i[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+        self._size = total
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        for path, _, _ in list(self._entries()):
+            self._remove(path)
+        self._size = 0
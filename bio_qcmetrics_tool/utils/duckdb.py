@@ -0,0 +1,203 @@
+"""Module containing utilities for exporting to DuckDB.
+
+DataFrames are registered as views and appended with a single
+``INSERT INTO ... BY NAME SELECT``, so DuckDB copies whole columns instead of
+inserting row by row. Tables get the same names and columns as in the sqlite
+export (without the pandas index). Requires `duckdb`, which is installed with
+the ``duckdb`` extra.
+"""
+from contextlib import contextmanager
+
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.jsonl import clean_value
+from bio_qcmetrics_tool.utils.sqlite import SAMPLE_SUMMARY_TABLE, quote, summary_columns
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover
+    duckdb = None
+
+# Name of the view of the DataFrame being appended
+FRAME_VIEW = "_qc_frame"
+
+INTEGER_TYPES = (
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+)
+
+
+def require_duckdb():
+    """
+    Raises an ImportError when `duckdb` is not installed.
+    """
+    if duckdb is None:
+        raise ImportError(
+            "The duckdb export format requires duckdb. Install it with "
+            "`pip install bio_qcmetrics_tool[duckdb]`"
+        )
+
+
+def value_type(value):
+    """
+    Returns the DuckDB type of a single python value.
+    """
+    value = clean_value(value)
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "BIGINT"
+    if isinstance(value, float):
+        return "DOUBLE"
+    return "VARCHAR"
+
+
+def get_table_columns(conn, table):
+    """
+    Returns a ``{column: type}`` dict of a table, which is empty if the table
+    does not exist.
+    """
+    res = conn.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = ? "
+        "ORDER BY ordinal_position",
+        [table],
+    )
+    return dict(res.fetchall())
+
+
+def is_fractional(typ):
+    """
+    Returns whether a DuckDB type holds fractional numbers.
+    """
+    return typ in ("FLOAT", "DOUBLE", "REAL") or typ.startswith("DECIMAL")
+
+
+def widen_columns(conn, table, existing, types):
+    """
+    Changes the integer columns of an existing table to DOUBLE where the
+    ``{column: type}`` dict of the incoming values has fractional numbers, so
+    that later floats are not truncated, and other columns to VARCHAR where
+    it has text. Adds the missing columns, as VARCHAR when the type is None.
+    """
+    for col, typ in types.items():
+        if col not in existing:
+            conn.execute(
+                "ALTER TABLE {0} ADD COLUMN {1} {2}".format(
+                    quote(table), quote(col), typ or "VARCHAR"
+                )
+            )
+        elif existing[col] in INTEGER_TYPES and is_fractional(typ or ""):
+            conn.execute(
+                "ALTER TABLE {0} ALTER COLUMN {1} TYPE DOUBLE".format(
+                    quote(table), quote(col)
+                )
+            )
+        elif typ == "VARCHAR" and existing[col] != "VARCHAR":
+            conn.execute(
+                "ALTER TABLE {0} ALTER COLUMN {1} TYPE VARCHAR USING {1}::VARCHAR".format(
+                    quote(table), quote(col)
+                )
+            )
+
+
+def _mixed_to_str(df):
+    """
+    Converts in place the values of object columns holding both strings and
+    other values to strings, which DuckDB can't scan as a single type.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        is_str = df[col].dropna().map(lambda v: isinstance(v, str))
+        if is_str.any() and not is_str.all():
+            df[col] = df[col].map(lambda v: None if pd.isna(v) else str(v))
+    return df
+
+
+def append_frame(conn, table, df):
+    """
+    Appends a DataFrame to a table, creating the table or its missing
+    columns first and widening integer columns that get fractional values.
+    """
+    df = _mixed_to_str(df.reset_index(drop=True))
+    conn.register(FRAME_VIEW, df)
+    try:
+        existing = get_table_columns(conn, table)
+        if not existing:
+            conn.execute(
+                "CREATE TABLE {0} AS SELECT * FROM {1}".format(quote(table), FRAME_VIEW)
+            )
+            return
+
+        frame_types = dict(
+            (row[0], row[1])
+            for row in conn.execute("DESCRIBE {0}".format(FRAME_VIEW)).fetchall()
+        )
+        widen_columns(conn, table, existing, frame_types)
+        conn.execute(
+            "INSERT INTO {0} BY NAME SELECT * FROM {1}".format(quote(table), FRAME_VIEW)
+        )
+    finally:
+        conn.unregister(FRAME_VIEW)
+
+
+def upsert_sample_summary(conn, summary, job_uuid):
+    """
+    Creates or updates the `sample_qc_summary` row of the job of each bam
+    given a ``{bam: {column: value}}`` dict, like
+    `bio_qcmetrics_tool.utils.sqlite.upsert_sample_summary`.
+    """
+    table = quote(SAMPLE_SUMMARY_TABLE)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {0} (job_uuid VARCHAR, bam VARCHAR, "
+        "PRIMARY KEY (job_uuid, bam))".format(table)
+    )
+    widen_columns(
+        conn,
+        SAMPLE_SUMMARY_TABLE,
+        get_table_columns(conn, SAMPLE_SUMMARY_TABLE),
+        summary_columns(summary, value_type, "VARCHAR"),
+    )
+
+    for bam in sorted(summary):
+        cols = sorted(summary[bam])
+        if not cols:
+            continue
+        conn.execute(
+            "INSERT INTO {0} (job_uuid, bam, {1}) VALUES (?, ?, {2}) "
+            "ON CONFLICT (job_uuid, bam) DO UPDATE SET {3}".format(
+                table,
+                ", ".join(quote(c) for c in cols),
+                ", ".join("?" for _ in cols),
+                ", ".join("{0} = EXCLUDED.{0}".format(quote(c)) for c in cols),
+            ),
+            [job_uuid, bam] + [clean_value(summary[bam][c]) for c in cols],
+        )
+
+
+@contextmanager
+def connect(path):
+    """
+    Opens a connection and a transaction, commits on success or rolls back
+    on error, and always closes it.
+    """
+    require_duckdb()
+    conn = duckdb.connect(path)
+    try:
+        conn.begin()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,89 @@
+"""Journal and quarantine tables of resumable exports.
+
+A journaled export (``--journal``) writes each input in its own transaction
+together with a row of the `qc_journal` table, so an input is either fully
+exported and journaled or not at all. Inputs that fail are rolled back and
+recorded with their error in the `qc_quarantine` table instead of stopping
+the run. ``--resume`` skips the inputs found in either table. To retry a
+quarantined input, delete its `qc_quarantine` row.
+"""
+import datetime
+import traceback
+
+from bio_qcmetrics_tool.utils.sqlite import quote
+
+JOURNAL_TABLE = "qc_journal"
+QUARANTINE_TABLE = "qc_quarantine"
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def create_tables(conn):
+    """
+    Creates the journal and quarantine tables if they don't exist.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {0} (tool TEXT, job_uuid TEXT, input TEXT, "
+        "finished_at TEXT, PRIMARY KEY (tool, job_uuid, input))".format(
+            quote(JOURNAL_TABLE)
+        )
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {0} (tool TEXT, job_uuid TEXT, input TEXT, "
+        "error_type TEXT, error TEXT, traceback TEXT, failed_at TEXT, "
+        "PRIMARY KEY (tool, job_uuid, input))".format(quote(QUARANTINE_TABLE))
+    )
+
+
+def get_inputs(conn, table, tool, job_uuid):
+    """
+    Returns the set of inputs of a tool and job in the journal or quarantine
+    table.
+    """
+    res = conn.execute(
+        "SELECT input FROM {0} WHERE tool = ? AND job_uuid IS ?".format(quote(table)),
+        (tool, job_uuid),
+    )
+    return set(row[0] for row in res.fetchall())
+
+
+def record_done(conn, tool, job_uuid, path):
+    """
+    Journals an exported input and clears any earlier quarantine entry.
+    """
+    conn.execute(
+        "INSERT OR REPLACE INTO {0} (tool, job_uuid, input, finished_at) "
+        "VALUES (?, ?, ?, ?)".format(quote(JOURNAL_TABLE)),
+        (tool, job_uuid, path, _now()),
+    )
+    conn.execute(
+        "DELETE FROM {0} WHERE tool = ? AND job_uuid IS ? AND input = ?".format(
+            quote(QUARANTINE_TABLE)
+        ),
+        (tool, job_uuid, path),
+    )
+
+
+def record_failure(conn, tool, job_uuid, path, error):
+    """
+    Quarantines an input with the exception it raised.
+    """
+    conn.execute(
+        "INSERT OR REPLACE INTO {0} (tool, job_uuid, input, error_type, error, "
+        "traceback, failed_at) VALUES (?, ?, ?, ?, ?, ?, ?)".format(
+            quote(QUARANTINE_TABLE)
+        ),
+        (
+            tool,
+            job_uuid,
+            path,
+            type(error).__name__,
+            str(error),
+            "".join(
+                traceback.format_exception(type(error), error, error.__traceback__)
+            ),
+            _now(),
+        ),
+    )
@@ -0,0 +1,66 @@
+"""Module containing a streaming JSON Lines writer"""
+import json
+import math
+import sys
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def clean_value(value):
+    """
+    Converts numpy scalars to python types and NaN/infinite floats to None,
+    which strict JSON parsers cannot read otherwise.
+    """
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def json_dumps(obj):
+    """
+    Serializes to a compact JSON string using `orjson` when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
+
+class JsonlWriter:
+    """
+    Writes one ``{"table": ..., "row": {...}}`` JSON object per line to a
+    file (appending) or to stdout when the path is ``-``. Rows are written
+    as they arrive and flushed after the first one and then every
+    ``flush_every`` rows, so readers downstream see data immediately.
+    """
+
+    def __init__(self, path, flush_every=1000):
+        self.path = path
+        self.flush_every = flush_every
+        self.count = 0
+        self.fh = None
+
+    def __enter__(self):
+        if self.path == "-":
+            self.fh = sys.stdout
+        else:
+            self.fh = open(self.path, "at")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fh.flush()
+        if self.fh is not sys.stdout:
+            self.fh.close()
+        self.fh = None
+        return False
+
+    def write(self, table, row):
+        record = {"table": table, "row": {k: clean_value(v) for k, v in row.items()}}
+        self.fh.write(json_dumps(record) + "\n")
+        self.count += 1
+        if self.count == 1 or self.count % self.flush_every == 0:
+            self.fh.flush()
@@ -1,5 +1,21 @@
 """Module containing general utilities for parsing"""
-import gzip
+import io
+import json
+
+from bio_qcmetrics_tool.utils.compression import (
+    GZIP_MAGIC,
+    open_gzip,
+    open_gzip_fileobj,
+)
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:  # pragma: no cover
+    json_loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
 
 
 def parse_type(item, na=None):
@@ -23,16 +39,63 @@ def parse_type(item, na=None):
 
 def get_read_func(fpath):
     """
-    Returns either the open or gzip.open function
+    Returns either the open or a gzip open function
     for a provided file path. This is only for reading, so the file
     has to exist.
     """
     func = open
 
     # Open file and check for gzip header
-    gzip_magic = b"\037\213"
     with open(fpath, "rb") as fh:
         magic = fh.read(2)
-        if magic == gzip_magic:
-            func = gzip.open
+        if magic == GZIP_MAGIC:
+            func = open_gzip
     return func
+
+
+def open_file(fpath, mode="rt"):
+    """
+    Opens a file for reading, gzipped or not, with a single open. The
+    handle used to check for the gzip header is the one decompressed.
+    """
+    fh = open(fpath, "rb")
+    try:
+        header = fh.peek(18)[:18]
+        if header[:2] == GZIP_MAGIC:
+            return open_gzip_fileobj(fh, mode, header=header)
+    except BaseException:
+        fh.close()
+        raise
+    if "b" in mode:
+        return fh
+    return io.TextIOWrapper(fh)
+
+
+def open_buffer(data, mode="rt"):
+    """
+    Opens the contents of a file already read into memory like
+    ``open_file(fpath, mode)`` would open the file itself,
+    decompressing gzipped data.
+    """
+    fh = io.BytesIO(data)
+    if data[:2] == GZIP_MAGIC:
+        return open_gzip_fileobj(fh, mode, header=data[:18])
+    if "b" in mode:
+        return fh
+    return io.TextIOWrapper(fh)
+
+
+def parse_json_records(raw):
+    """
+    Parses a JSON object, a JSON array of objects or newline-delimited
+    JSON (NDJSON) into a list of objects. Uses the `orjson` decoder
+    when it is installed.
+    """
+    try:
+        data = json_loads(raw)
+    except JSONDecodeError:
+        data = [json_loads(line) for line in raw.splitlines() if line.strip()]
+
+    if isinstance(data, dict):
+        data = [data]
+    return data
@@ -0,0 +1,327 @@
+"""Module containing utilities for exporting to PostgreSQL.
+
+Rows are loaded with ``COPY ... FROM STDIN`` in CSV or binary mode, which is
+much faster than row-by-row inserts. Tables get the same names and columns
+as in the sqlite export (without the pandas index) and are created on first
+use, with columns added as new metrics appear. Requires `psycopg` (version 3),
+which is installed with the ``postgres`` extra.
+"""
+import csv
+import io
+import queue
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.jsonl import clean_value
+from bio_qcmetrics_tool.utils.sqlite import (
+    SAMPLE_SUMMARY_TABLE,
+    common_type,
+    get_table_indexes,
+    quote,
+    summary_columns,
+)
+
+try:
+    import psycopg
+except ImportError:  # pragma: no cover
+    psycopg = None
+
+COPY_FORMATS = ("csv", "binary")
+
+# NULL marker of the CSV copy, so that empty strings are kept as such
+CSV_NULL = "\\N"
+
+# Number of rows rendered per write to the COPY stream
+COPY_CHUNK_ROWS = 1000
+
+DEFAULT_MAX_CONNECTIONS = 4
+
+INTEGER_TYPES = ("smallint", "integer", "bigint")
+
+
+def require_psycopg():
+    """
+    Raises an ImportError when `psycopg` is not installed.
+    """
+    if psycopg is None:
+        raise ImportError(
+            "The postgres export format requires psycopg. Install it with "
+            "`pip install bio_qcmetrics_tool[postgres]`"
+        )
+
+
+def column_type(dtype):
+    """
+    Returns the PostgreSQL type of a column given its pandas dtype.
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "bigint"
+    if pd.api.types.is_float_dtype(dtype):
+        return "double precision"
+    return "text"
+
+
+def value_type(value):
+    """
+    Returns the PostgreSQL type of a single python value.
+    """
+    value = clean_value(value)
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "bigint"
+    if isinstance(value, float):
+        return "double precision"
+    return "text"
+
+
+def frame_types(df):
+    """
+    Returns the ``{column: type}`` dict of a DataFrame. Object columns, which
+    hold mixed or only missing values, get the `common_type` of their values:
+    text when they differ and None when all are missing.
+    """
+    types = dict()
+    for col in df.columns:
+        if df[col].dtype == object:
+            types[col] = common_type(df[col], value_type, "text")
+        else:
+            types[col] = column_type(df[col].dtype)
+    return types
+
+
+def widened_type(current, typ):
+    """
+    Returns the type that a column of type ``current`` must be changed to so
+    that it can hold values of type ``typ``, or None if it already can.
+    Integer columns are widened to double precision for fractional values
+    and any column to text for text values.
+    """
+    if current in INTEGER_TYPES and typ == "double precision":
+        return typ
+    if typ == "text" and current != "text":
+        return typ
+    return None
+
+
+def get_table_columns(conn, table):
+    """
+    Returns a ``{column: type}`` dict of a table in the current schema, which
+    is empty if the table does not exist.
+    """
+    res = conn.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s "
+        "ORDER BY ordinal_position",
+        (table,),
+    )
+    return dict(res.fetchall())
+
+
+def ensure_table(conn, table, columns):
+    """
+    Creates a table with the given ``{column: type}`` dict, or adds the
+    columns that are missing from an existing table and changes the type of
+    the columns that can't hold the new values (see `widened_type`). A None
+    type, i.e., only missing values, is text for new columns and keeps the
+    type of existing ones. Returns the types of all columns of the table.
+    """
+    existing = get_table_columns(conn, table)
+    if not existing:
+        columns = dict((col, typ or "text") for col, typ in columns.items())
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS {0} ({1})".format(
+                quote(table),
+                ", ".join("{0} {1}".format(quote(c), t) for c, t in columns.items()),
+            )
+        )
+        return columns
+
+    for col, typ in columns.items():
+        if col not in existing:
+            conn.execute(
+                "ALTER TABLE {0} ADD COLUMN IF NOT EXISTS {1} {2}".format(
+                    quote(table), quote(col), typ or "text"
+                )
+            )
+            existing[col] = typ or "text"
+            continue
+        widened = widened_type(existing[col], typ)
+        if widened is not None:
+            conn.execute(
+                "ALTER TABLE {0} ALTER COLUMN {1} TYPE {2} USING {1}::{2}".format(
+                    quote(table), quote(col), widened
+                )
+            )
+            existing[col] = widened
+    return existing
+
+
+def _to_text(value, typ):
+    value = clean_value(value)
+    if value is None or pd.isna(value):
+        return None
+    if typ == "text" and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def iter_rows(df, types):
+    """
+    Yields the rows of a DataFrame as tuples of python values, with None
+    for missing values and text for the values of text columns.
+    """
+    col_types = [types[col] for col in df.columns]
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(_to_text(v, t) for v, t in zip(row, col_types))
+
+
+def csv_chunks(rows, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Renders rows as CSV text in chunks of ``chunk_rows`` rows, with
+    `CSV_NULL` for None.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    count = 0
+    for row in rows:
+        writer.writerow([CSV_NULL if v is None else v for v in row])
+        count += 1
+        if count == chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            count = 0
+    if count:
+        yield buf.getvalue()
+
+
+def copy_frame(conn, table, df, copy_format="csv"):
+    """
+    Appends a DataFrame to a table with ``COPY FROM STDIN``, creating the
+    table or its missing columns first.
+    """
+    if copy_format not in COPY_FORMATS:
+        raise ValueError("Unknown COPY format {0}".format(copy_format))
+    types = ensure_table(conn, table, frame_types(df))
+    cols = ", ".join(quote(c) for c in df.columns)
+    rows = iter_rows(df, types)
+    with conn.cursor() as cur:
+        if copy_format == "binary":
+            sql = "COPY {0} ({1}) FROM STDIN (FORMAT BINARY)".format(quote(table), cols)
+            with cur.copy(sql) as copy:
+                copy.set_types([types[col] for col in df.columns])
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            sql = "COPY {0} ({1}) FROM STDIN (FORMAT CSV, NULL '{2}')".format(
+                quote(table), cols, CSV_NULL
+            )
+            with cur.copy(sql) as copy:
+                for chunk in csv_chunks(rows):
+                    copy.write(chunk)
+
+
+def ensure_indexes(conn, tables):
+    """
+    Creates the natural key and lookup indexes of the given tables if they
+    don't exist yet.
+    """
+    for table in tables:
+        columns = list(get_table_columns(conn, table))
+        for name, cols in get_table_indexes(table, columns):
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})".format(
+                    quote(name), quote(table), ", ".join(quote(c) for c in cols)
+                )
+            )
+
+
+def upsert_sample_summary(conn, summary, job_uuid):
+    """
+    Creates or updates the `sample_qc_summary` row of the job of each bam
+    given a ``{bam: {column: value}}`` dict, like
+    `bio_qcmetrics_tool.utils.sqlite.upsert_sample_summary`.
+    """
+    table = quote(SAMPLE_SUMMARY_TABLE)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {0} (job_uuid TEXT, bam TEXT, "
+        "PRIMARY KEY (job_uuid, bam))".format(table)
+    )
+    ensure_table(
+        conn, SAMPLE_SUMMARY_TABLE, summary_columns(summary, value_type, "text")
+    )
+
+    for bam in sorted(summary):
+        cols = sorted(summary[bam])
+        if not cols:
+            continue
+        conn.execute(
+            "INSERT INTO {0} (job_uuid, bam, {1}) VALUES (%s, %s, {2}) "
+            "ON CONFLICT (job_uuid, bam) DO UPDATE SET {3}".format(
+                table,
+                ", ".join(quote(c) for c in cols),
+                ", ".join("%s" for _ in cols),
+                ", ".join("{0} = EXCLUDED.{0}".format(quote(c)) for c in cols),
+            ),
+            [job_uuid, bam] + [clean_value(summary[bam][c]) for c in cols],
+        )
+
+
+class PostgresConnectionPool:
+    """
+    Keeps idle connections per DSN so that repeated exports don't pay for
+    reconnecting. Each checked out connection runs a single transaction.
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._pools = dict()
+
+    def _pool(self, dsn):
+        with self._lock:
+            return self._pools.setdefault(dsn, queue.LifoQueue())
+
+    @contextmanager
+    def connection(self, dsn):
+        """
+        Yields a pooled connection to ``dsn`` within a transaction that is
+        committed on success or rolled back on error.
+        """
+        require_psycopg()
+        pool = self._pool(dsn)
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = psycopg.connect(dsn)
+
+        try:
+            with conn.transaction():
+                yield conn
+        except BaseException:
+            if conn.broken or conn.closed:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if pool.qsize() < self.max_connections and not conn.closed:
+                    pool.put(conn)
+                else:
+                    conn.close()
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                while not pool.empty():
+                    pool.get_nowait().close()
+            self._pools = dict()
+
+
+# Pool shared by all exports of the process
+DEFAULT_POOL = PostgresConnectionPool()
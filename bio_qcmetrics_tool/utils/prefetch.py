@@ -0,0 +1,88 @@
+"""Concurrent prefetching of input files.
+
+On network filesystems such as Lustre or NFS every open and read of a small
+metrics file costs a round trip, so reading the inputs one after the other
+is bound by latency. These helpers read many files at once through a
+bounded thread pool driven by asyncio and hand the buffers to the exporters,
+whose parsers then read from memory (see ``ExportQcModule.open_input``).
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from bio_qcmetrics_tool.utils import s3
+
+DEFAULT_WORKERS = 16
+
+# Larger files are left on disk and streamed by the parsers
+MAX_PREFETCH_SIZE = 64 * 1024 * 1024
+
+
+def read_file(path, max_size=MAX_PREFETCH_SIZE):
+    """
+    Returns the contents of a file or S3 object or None if it is larger
+    than ``max_size``, not a regular file or can't be read, e.g., it was
+    removed. The exporter then opens such files itself and reports the error.
+    """
+    if s3.is_s3_url(path):
+        client = s3.get_client()
+        if client.head(path) > max_size:
+            return None
+        return client.get(path)
+    try:
+        with open(path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size > max_size:
+                return None
+            return fh.read()
+    except OSError:
+        return None
+
+
+async def prefetch_files(paths, workers=DEFAULT_WORKERS, max_size=MAX_PREFETCH_SIZE):
+    """
+    Reads the files concurrently with at most ``workers`` threads and returns
+    a ``{path: bytes}`` dict of the ones that were read.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return dict()
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        buffers = await asyncio.gather(
+            *[loop.run_in_executor(executor, read_file, p, max_size) for p in paths]
+        )
+    return {p: data for p, data in zip(paths, buffers) if data is not None}
+
+
+async def export_async(exporter, workers=DEFAULT_WORKERS):
+    """
+    Prefetches the inputs of an exporter and runs it in a worker thread.
+    """
+    await export_many_async([exporter], workers=workers)
+    return exporter
+
+
+async def export_many_async(exporters, workers=DEFAULT_WORKERS):
+    """
+    Prefetches the inputs of all exporters at once and then runs them one at
+    a time in a worker thread, since sqlite allows a single writer per db.
+    """
+    paths = [p for exporter in exporters for p in exporter.input_paths()]
+    buffers = await prefetch_files(paths, workers=workers)
+    for exporter in exporters:
+        exporter.prefetched.update(
+            {p: buffers[p] for p in exporter.input_paths() if p in buffers}
+        )
+
+    loop = asyncio.get_running_loop()
+    for exporter in exporters:
+        await loop.run_in_executor(None, exporter.run)
+    return exporters
+
+
+def prefetch(paths, workers=DEFAULT_WORKERS):
+    """
+    Synchronous wrapper of `prefetch_files`.
+    """
+    return asyncio.run(prefetch_files(paths, workers=workers))
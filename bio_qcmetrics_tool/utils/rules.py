@@ -0,0 +1,181 @@
+"""QC gating rules evaluated on the exported tables.
+
+Rules are read from a TOML file with one ``[[rules]]`` entry per rule::
+
+    [[rules]]
+    name = "star_unique_mapping"
+    table = "star_stats"
+    where = "category == 'uniquely_mapped_percent'"
+    check = "value >= 70"
+
+    [[rules]]
+    name = "flagstat_mapped"
+    table = "samtools_flagstat_wide"
+    check = "mapped_passed / total_passed >= 0.9"
+    value = "mapped_passed / total_passed"
+    severity = "warn"
+
+``where`` (optional) selects the rows of the table the rule applies to,
+``check`` must be true for a row to pass and ``value`` (optional) is recorded
+with the result. All three are pandas expressions (see `DataFrame.eval`)
+evaluated on whole columns at once; column names with spaces are quoted with
+backticks. Missing values fail the check. Rules on tables that no exporter
+writes are rejected when the file is loaded, and rules on tables that are not
+part of an export are skipped with a warning.
+"""
+import fnmatch
+import tomllib
+
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.sqlite import NATURAL_KEY_COLUMNS, SOURCE_COLUMNS
+
+FLAGS_TABLE = "qc_flags"
+
+# Globs of the names of the tables written by the exporters
+TABLE_PATTERNS = [
+    pattern for pattern, _ in NATURAL_KEY_COLUMNS if pattern != FLAGS_TABLE
+] + [
+    "samtools_stats",
+    "samtools_flagstat_wide",
+    "star_stats_wide",
+    "readgroups_wide",
+    "10x_scrna_barcode_knee",
+]
+
+SEVERITIES = ("fail", "warn")
+
+FLAG_COLUMNS = [
+    "rule",
+    "severity",
+    "table_name",
+    "job_uuid",
+    "bam",
+    "source_file",
+    "passed",
+    "value",
+]
+
+
+class RuleError(ValueError):
+    """Invalid rule or rule that can't be evaluated"""
+
+
+class Rule:
+    """A single QC gating rule"""
+
+    __slots__ = ("name", "table", "where", "check", "value", "severity")
+
+    def __init__(self, name, table, check, where=None, value=None, severity="fail"):
+        if severity not in SEVERITIES:
+            raise RuleError(
+                "Rule {0} has an invalid severity {1}, choose from {2}".format(
+                    name, severity, ", ".join(SEVERITIES)
+                )
+            )
+        self.name = name
+        self.table = table
+        self.check = check
+        self.where = where
+        self.value = value
+        self.severity = severity
+
+    def evaluate(self, df):
+        """
+        Returns a DataFrame with the `FLAG_COLUMNS` of every row of ``df``
+        selected by the rule.
+        """
+        try:
+            if self.where:
+                df = df[self._eval(df, self.where).fillna(False).astype(bool)]
+            passed = self._eval(df, self.check).fillna(False).astype(bool)
+            value = self._eval(df, self.value) if self.value else None
+        except Exception as e:
+            raise RuleError("Can't evaluate rule {0}: {1}".format(self.name, e))
+
+        source = next((col for col in SOURCE_COLUMNS if col in df.columns), None)
+        flags = pd.DataFrame(
+            {
+                "rule": self.name,
+                "severity": self.severity,
+                "table_name": self.table,
+                "job_uuid": df["job_uuid"] if "job_uuid" in df else None,
+                "bam": df["bam"] if "bam" in df else None,
+                "source_file": df[source] if source else None,
+                "passed": passed,
+                "value": value,
+            },
+            index=df.index,
+            columns=FLAG_COLUMNS,
+        )
+        return flags.reset_index(drop=True)
+
+    @staticmethod
+    def _eval(df, expr):
+        result = df.eval(expr)
+        if not isinstance(result, pd.Series):
+            result = pd.Series(result, index=df.index)
+        return result
+
+
+def is_known_table(name):
+    """
+    Returns whether an exporter writes a table with this name.
+    """
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in TABLE_PATTERNS)
+
+
+def load_rules(path):
+    """
+    Reads the rules of a TOML rules file.
+    """
+    with open(path, "rb") as fh:
+        try:
+            config = tomllib.load(fh)
+        except tomllib.TOMLDecodeError as e:
+            raise RuleError("Invalid rules file {0}: {1}".format(path, e))
+
+    rules = []
+    names = set()
+    for i, item in enumerate(config.get("rules", [])):
+        missing = [key for key in ("name", "table", "check") if key not in item]
+        unknown = set(item) - set(Rule.__slots__)
+        if missing or unknown:
+            raise RuleError(
+                "Rule {0} of {1} is missing {2} or has unknown keys {3}".format(
+                    item.get("name", i + 1), path, missing, sorted(unknown)
+                )
+            )
+        if not is_known_table(item["table"]):
+            raise RuleError(
+                "Rule {0} of {1} is on table {2}, which no exporter writes".format(
+                    item["name"], path, item["table"]
+                )
+            )
+        if item["name"] in names:
+            raise RuleError("Duplicate rule {0} in {1}".format(item["name"], path))
+        names.add(item["name"])
+        rules.append(Rule(**item))
+    return rules
+
+
+def skipped_rules(rules, frames):
+    """
+    Returns the rules whose table is not in a ``{table name: DataFrame}``
+    dict.
+    """
+    return [rule for rule in rules if rule.table not in frames]
+
+
+def evaluate_rules(rules, frames):
+    """
+    Evaluates the rules on a ``{table name: DataFrame}`` dict and returns
+    the DataFrame of the `qc_flags` table.
+    """
+    results = [
+        rule.evaluate(frames[rule.table]) for rule in rules if rule.table in frames
+    ]
+    results = [df for df in results if len(df)]
+    if not results:
+        return pd.DataFrame(columns=FLAG_COLUMNS)
+    return pd.concat(results, ignore_index=True)
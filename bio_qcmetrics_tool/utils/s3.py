@@ -0,0 +1,380 @@
+"""Reading inputs from S3-compatible object storage.
+
+Inputs given as ``s3://bucket/key`` URLs are read with a minimal S3 client
+that signs requests with AWS Signature Version 4 and keeps a pool of
+keep-alive connections per endpoint. Small text metrics are fetched with a
+single GET, while zip files are opened as `S3File` objects that only
+download the byte ranges that are read, so only the central directory and
+the needed members of a FastQC zip are transferred.
+
+The client is configured from the usual environment variables:
+``AWS_ENDPOINT_URL_S3`` or ``AWS_ENDPOINT_URL`` (e.g., a local MinIO server),
+``AWS_ACCESS_KEY_ID``, ``AWS_SECRET_ACCESS_KEY``, ``AWS_SESSION_TOKEN`` and
+``AWS_REGION`` or ``AWS_DEFAULT_REGION``. Requests are unsigned when no
+credentials are set.
+"""
+import datetime
+import functools
+import hashlib
+import hmac
+import http.client
+import io
+import os
+import queue
+import struct
+from urllib.parse import quote, urlsplit
+
+from bio_qcmetrics_tool.utils.parse import open_buffer
+
+S3_SCHEME = "s3://"
+
+DEFAULT_REGION = "us-east-1"
+
+DEFAULT_MAX_CONNECTIONS = 16
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+ZIP_END_RECORD_SIZE = 22
+ZIP_MAX_COMMENT = 65535
+
+
+class S3Error(OSError):
+    """Error response of an S3 request"""
+
+    def __init__(self, status, reason, url):
+        super().__init__("{0} {1}: {2}".format(status, reason, url))
+        self.status = status
+
+
+def is_s3_url(path):
+    """
+    Whether an input path is an ``s3://`` URL.
+    """
+    return isinstance(path, str) and path.startswith(S3_SCHEME)
+
+
+def split_url(url):
+    """
+    Returns the (bucket, key) of an ``s3://`` URL.
+    """
+    bucket, _, key = url[len(S3_SCHEME) :].partition("/")
+    if not bucket or not key:
+        raise ValueError("Invalid S3 URL {0}".format(url))
+    return bucket, key
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3Client:
+    """
+    Minimal S3 client for GET and HEAD requests.
+    """
+
+    def __init__(
+        self,
+        endpoint_url=None,
+        region=None,
+        access_key=None,
+        secret_key=None,
+        session_token=None,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/") if endpoint_url else None
+        self.region = region or DEFAULT_REGION
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self.max_connections = max_connections
+        self._pools = dict()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns a client configured from the AWS environment variables.
+        """
+        env = os.environ
+        return cls(
+            endpoint_url=env.get("AWS_ENDPOINT_URL_S3") or env.get("AWS_ENDPOINT_URL"),
+            region=env.get("AWS_REGION") or env.get("AWS_DEFAULT_REGION"),
+            access_key=env.get("AWS_ACCESS_KEY_ID"),
+            secret_key=env.get("AWS_SECRET_ACCESS_KEY"),
+            session_token=env.get("AWS_SESSION_TOKEN"),
+        )
+
+    def _target(self, url):
+        """
+        Returns the (scheme, host, path) of an object. Custom endpoints use
+        path-style and AWS virtual-hosted-style addressing.
+        """
+        bucket, key = split_url(url)
+        if self.endpoint_url:
+            parts = urlsplit(self.endpoint_url)
+            path = "{0}/{1}/{2}".format(parts.path.rstrip("/"), bucket, key)
+            return parts.scheme, parts.netloc, quote(path, safe="/~")
+        host = "{0}.s3.{1}.amazonaws.com".format(bucket, self.region)
+        return "https", host, quote("/" + key, safe="/~")
+
+    def sign(self, method, host, path, headers, now=None):
+        """
+        Adds the AWS Signature Version 4 headers of a request without a body
+        or query string.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = EMPTY_SHA256
+        if self.session_token:
+            headers["x-amz-security-token"] = self.session_token
+
+        signed = dict((k.lower(), str(v).strip()) for k, v in headers.items())
+        signed["host"] = host
+        names = sorted(signed)
+        canonical_request = "\n".join(
+            [
+                method,
+                path,
+                "",
+                "".join("{0}:{1}\n".format(k, signed[k]) for k in names),
+                ";".join(names),
+                EMPTY_SHA256,
+            ]
+        )
+        scope = "{0}/{1}/s3/aws4_request".format(date, self.region)
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        key = ("AWS4" + self.secret_key).encode("utf-8")
+        for part in (date, self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        signature = hmac.new(
+            key, string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        headers["Authorization"] = (
+            "AWS4-HMAC-SHA256 Credential={0}/{1}, SignedHeaders={2}, "
+            "Signature={3}".format(self.access_key, scope, ";".join(names), signature)
+        )
+        return headers
+
+    def _pool(self, scheme, host):
+        key = (scheme, host)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools.setdefault(key, queue.LifoQueue())
+        return pool
+
+    def _connection(self, scheme, host):
+        try:
+            return self._pool(scheme, host).get_nowait()
+        except queue.Empty:
+            if scheme == "https":
+                return http.client.HTTPSConnection(host)
+            return http.client.HTTPConnection(host)
+
+    def _release(self, scheme, host, conn):
+        pool = self._pool(scheme, host)
+        if pool.qsize() < self.max_connections:
+            pool.put(conn)
+        else:
+            conn.close()
+
+    def request(self, method, url, headers=None):
+        """
+        Sends a request on a pooled keep-alive connection and returns the
+        response status, headers and body. Retries once on a connection
+        that was closed by the server.
+        """
+        scheme, host, path = self._target(url)
+        headers = dict(headers or {})
+        if self.access_key and self.secret_key:
+            self.sign(method, host, path, headers)
+
+        for attempt in range(2):
+            conn = self._connection(scheme, host)
+            try:
+                conn.request(method, path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(scheme, host, conn)
+            break
+
+        if resp.status == 404:
+            raise FileNotFoundError("No such object: {0}".format(url))
+        if resp.status >= 300:
+            raise S3Error(resp.status, resp.reason, url)
+        return resp.status, resp.headers, body
+
+    def head(self, url):
+        """
+        Returns the size of an object.
+        """
+        _, headers, _ = self.request("HEAD", url)
+        return int(headers["Content-Length"])
+
+    def get(self, url, start=None, end=None):
+        """
+        Returns an object, or its bytes from ``start`` up to ``end``
+        (exclusive).
+        """
+        headers = dict()
+        if start is not None:
+            headers["Range"] = "bytes={0}-{1}".format(
+                start, "" if end is None else end - 1
+            )
+        _, _, body = self.request("GET", url, headers=headers)
+        return body
+
+    def open(self, url, size=None):
+        """
+        Returns a seekable `S3File` of an object.
+        """
+        return S3File(self, url, size=size)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """
+    Returns the shared client configured from the environment.
+    """
+    return S3Client.from_env()
+
+
+class S3File(io.RawIOBase):
+    """
+    Seekable read-only file of an S3 object that downloads only the byte
+    ranges that are read. Fetched ranges are kept, so later reads within
+    them are served from memory.
+    """
+
+    def __init__(self, client, url, size=None):
+        self.client = client
+        self.url = url
+        self.size = client.head(url) if size is None else size
+        self.pos = 0
+        self.ranges = []
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position {0}".format(offset))
+        self.pos = offset
+        return self.pos
+
+    def fetch(self, start, end):
+        """
+        Downloads the bytes from ``start`` up to ``end`` and keeps them.
+        """
+        start, end = max(0, start), min(end, self.size)
+        if start >= end:
+            return b""
+        data = self.client.get(self.url, start, end)
+        self.ranges.append((start, data))
+        return data
+
+    def _cached(self, start, end):
+        for offset, data in self.ranges:
+            if offset <= start and end <= offset + len(data):
+                return data[start - offset : end - offset]
+        return None
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self.pos)
+        if n <= 0:
+            return 0
+        data = self._cached(self.pos, self.pos + n)
+        if data is None:
+            data = self.fetch(self.pos, self.pos + n)
+        b[:n] = data
+        self.pos += n
+        return n
+
+    def readall(self):
+        return self.read(max(0, self.size - self.pos))
+
+    def close(self):
+        self.ranges = []
+        super().close()
+
+    def fetch_zip_directory(self):
+        """
+        Downloads the end record and central directory of a zip file.
+        """
+        tail = self.fetch(self.size - ZIP_END_RECORD_SIZE, self.size)
+        if not tail.startswith(b"PK\005\006"):
+            # The end record is followed by a comment
+            tail = self.fetch(
+                self.size - ZIP_END_RECORD_SIZE - ZIP_MAX_COMMENT, self.size
+            )
+            index = tail.rfind(b"PK\005\006")
+            if index < 0:
+                raise OSError("Not a zip file: {0}".format(self.url))
+            tail = tail[index:]
+        size, offset = struct.unpack("<LL", tail[12:20])
+        self.fetch(offset, offset + size)
+
+    def fetch_zip_members(self, zip_object, names):
+        """
+        Downloads the local records of zip members, each with a single
+        ranged GET.
+        """
+        offsets = sorted(info.header_offset for info in zip_object.infolist())
+        offsets.append(zip_object.start_dir)
+        for name in names:
+            start = zip_object.getinfo(name).header_offset
+            end = min(offset for offset in offsets if offset > start)
+            if self._cached(start, end) is None:
+                self.fetch(start, end)
+
+
+def open_url(url, mode="rt"):
+    """
+    Opens an S3 object for reading. Binary mode returns a seekable
+    `S3File`, text mode reads the whole object with one GET.
+    """
+    client = get_client()
+    if "b" in mode:
+        return client.open(url)
+    return open_buffer(client.get(url), mode)
+
+
+def prefetch_zip_directory(fileobj):
+    """
+    Downloads the zip directory of an `S3File`. Other files are ignored.
+    """
+    if isinstance(fileobj, S3File):
+        fileobj.fetch_zip_directory()
+
+
+def prefetch_zip_members(fileobj, zip_object, names):
+    """
+    Downloads zip members of an `S3File`. Other files are ignored.
+    """
+    if isinstance(fileobj, S3File):
+        fileobj.fetch_zip_members(zip_object, names)
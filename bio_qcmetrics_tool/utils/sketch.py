@@ -0,0 +1,397 @@
+"""Mergeable cohort statistics of the headline metrics.
+
+Every numeric `sample_qc_summary` metric has a `MetricSketch` holding its
+count, mean and variance (Welford's algorithm, merged with Chan et al.'s
+parallel formula) and a t-digest of its distribution. Sketches are stored in
+the `qc_metric_sketches` table keyed by metric and updated by each export,
+so the z-score or percentile of a sample is a single primary key lookup
+instead of a scan of all samples. Only the values of `sample_qc_summary`
+columns not yet set for a (job_uuid, bam) are added, so re-exported inputs
+and dbs merged twice are not counted twice. A value that an export changes
+stays counted with its earlier value.
+"""
+import datetime
+import json
+import math
+
+import numpy as np
+
+from bio_qcmetrics_tool.utils.sqlite import (
+    SAMPLE_SUMMARY_TABLE,
+    get_table_columns,
+    quote,
+)
+
+SKETCH_TABLE = "qc_metric_sketches"
+
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning and Ertl) with the k1 scale function. Holds at
+    most about ``compression`` centroids, which are finer at the tails so
+    that extreme quantiles stay accurate.
+    """
+
+    def __init__(
+        self,
+        compression=DEFAULT_COMPRESSION,
+        means=(),
+        weights=(),
+        vmin=None,
+        vmax=None,
+    ):
+        self.compression = compression
+        self.means = np.asarray(means, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.min = vmin
+        self.max = vmax
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k):
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def _merge(self, means, weights):
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        out_means, out_weights = [means[0]], [weights[0]]
+        done = 0.0
+        q_limit = self._k_inv(self._k(0.0) + 1)
+        for mean, weight in zip(means[1:], weights[1:]):
+            proposed = out_weights[-1] + weight
+            if (done + proposed) / total <= q_limit:
+                out_means[-1] += (mean - out_means[-1]) * weight / proposed
+                out_weights[-1] = proposed
+            else:
+                done += out_weights[-1]
+                q_limit = self._k_inv(self._k(done / total) + 1)
+                out_means.append(mean)
+                out_weights.append(weight)
+        self.means = np.asarray(out_means)
+        self.weights = np.asarray(out_weights)
+
+    def update(self, values):
+        """
+        Adds an array of values.
+        """
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        self._bounds(values.min(), values.max())
+        self._merge(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other):
+        """
+        Adds the values of another digest.
+        """
+        if not len(other.means):
+            return
+        self._bounds(other.min, other.max)
+        self._merge(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _bounds(self, vmin, vmax):
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+
+    def _centers(self):
+        """
+        Returns the (cumulative weight, value) points interpolated between,
+        from the minimum through the centroids to the maximum.
+        """
+        cum = np.cumsum(self.weights) - self.weights / 2
+        return (
+            np.concatenate([[0.0], cum, [self.count]]),
+            np.concatenate([[self.min], self.means, [self.max]]),
+        )
+
+    def quantile(self, q):
+        """
+        Returns the estimated value at quantile ``q`` (0 to 1).
+        """
+        if not len(self.means):
+            return None
+        weights, values = self._centers()
+        return float(np.interp(q * self.count, weights, values))
+
+    def cdf(self, value):
+        """
+        Returns the estimated fraction of values below ``value``.
+        """
+        if not len(self.means):
+            return None
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        weights, values = self._centers()
+        return float(np.interp(value, values, weights) / self.count)
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "compression": self.compression,
+                "means": self.means.tolist(),
+                "weights": self.weights.tolist(),
+                "min": self.min,
+                "max": self.max,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data):
+        obj = json.loads(data)
+        return cls(
+            obj["compression"], obj["means"], obj["weights"], obj["min"], obj["max"]
+        )
+
+
+class MetricSketch:
+    """
+    Count, mean, variance and t-digest of a metric.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, digest=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.digest = TDigest() if digest is None else digest
+
+    @property
+    def variance(self):
+        """
+        The sample variance, or None with fewer than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return None if variance is None else math.sqrt(variance)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, values):
+        """
+        Adds an array of values.
+        """
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        mean = float(values.mean())
+        self._combine(len(values), mean, float(((values - mean) ** 2).sum()))
+        self.digest.update(values)
+
+    def merge(self, other):
+        """
+        Adds the values of another sketch.
+        """
+        if not other.count:
+            return
+        self._combine(other.count, other.mean, other.m2)
+        self.digest.merge(other.digest)
+
+    def zscore(self, value):
+        stddev = self.stddev
+        if not stddev:
+            return None
+        return (value - self.mean) / stddev
+
+    def percentile(self, value):
+        cdf = self.digest.cdf(value)
+        return None if cdf is None else 100 * cdf
+
+
+def _is_number(value):
+    if hasattr(value, "item"):
+        value = value.item()
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def summary_values(summary):
+    """
+    Returns the numeric values of a ``{bam: {column: value}}`` sample summary
+    as ``{column: [values]}``.
+    """
+    values = dict()
+    for metrics in summary.values():
+        for col, value in metrics.items():
+            if _is_number(value):
+                values.setdefault(col, []).append(float(value))
+    return values
+
+
+def new_summary_values(conn, rows):
+    """
+    Returns the `summary_values` of ``(job_uuid, bam, {column: value})`` rows,
+    leaving out the columns already set in the `sample_qc_summary` row of the
+    same job and bam. Must be called before the rows are upserted.
+    """
+    columns = get_table_columns(conn, SAMPLE_SUMMARY_TABLE)
+    new = dict()
+    for job_uuid, bam, metrics in rows:
+        stored = dict()
+        if columns:
+            row = conn.execute(
+                "SELECT * FROM main.{0} WHERE job_uuid = ? AND bam = ?".format(
+                    quote(SAMPLE_SUMMARY_TABLE)
+                ),
+                (job_uuid, bam),
+            ).fetchone()
+            stored = dict(zip(columns, row or ()))
+        new[(job_uuid, bam)] = dict(
+            (col, value) for col, value in metrics.items() if stored.get(col) is None
+        )
+    return summary_values(new)
+
+
+def attached_summary_rows(conn, schema):
+    """
+    Returns the `sample_qc_summary` rows of an attached database as
+    ``(job_uuid, bam, {column: value})`` tuples.
+    """
+    columns = get_table_columns(conn, SAMPLE_SUMMARY_TABLE, schema=schema)
+    if not columns:
+        return []
+    res = conn.execute(
+        "SELECT * FROM {0}.{1}".format(quote(schema), quote(SAMPLE_SUMMARY_TABLE))
+    )
+    rows = []
+    for row in res.fetchall():
+        metrics = dict(zip(columns, row))
+        rows.append((metrics.pop("job_uuid"), metrics.pop("bam"), metrics))
+    return rows
+
+
+def create_table(conn):
+    """
+    Creates the sketch table if it doesn't exist.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS main.{0} (metric TEXT PRIMARY KEY, count INTEGER, "
+        "mean REAL, m2 REAL, stddev REAL, min REAL, max REAL, digest TEXT, "
+        "updated_at TEXT)".format(quote(SKETCH_TABLE))
+    )
+
+
+def get_sketch(conn, metric):
+    """
+    Returns the stored sketch of a metric, or None.
+    """
+    if not get_table_columns(conn, SKETCH_TABLE):
+        return None
+    row = conn.execute(
+        "SELECT count, mean, m2, digest FROM {0} WHERE metric = ?".format(
+            quote(SKETCH_TABLE)
+        ),
+        (metric,),
+    ).fetchone()
+    if row is None:
+        return None
+    return MetricSketch(row[0], row[1], row[2], TDigest.from_json(row[3]))
+
+
+def get_sketches(conn, schema="main"):
+    """
+    Returns all stored sketches of a database as a ``{metric: sketch}`` dict.
+    """
+    if not get_table_columns(conn, SKETCH_TABLE, schema=schema):
+        return dict()
+    res = conn.execute(
+        "SELECT metric, count, mean, m2, digest FROM {0}.{1}".format(
+            quote(schema), quote(SKETCH_TABLE)
+        )
+    )
+    return dict(
+        (row[0], MetricSketch(row[1], row[2], row[3], TDigest.from_json(row[4])))
+        for row in res.fetchall()
+    )
+
+
+def _write_sketch(conn, metric, sketch, now):
+    conn.execute(
+        "INSERT OR REPLACE INTO main.{0} (metric, count, mean, m2, stddev, min, "
+        "max, digest, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)".format(
+            quote(SKETCH_TABLE)
+        ),
+        (
+            metric,
+            sketch.count,
+            sketch.mean,
+            sketch.m2,
+            sketch.stddev,
+            sketch.digest.min,
+            sketch.digest.max,
+            sketch.digest.to_json(),
+            now,
+        ),
+    )
+
+
+def update_sketches(conn, values):
+    """
+    Adds ``{metric: [values]}`` to the stored sketches of the metrics.
+    """
+    create_table(conn)
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    for metric in sorted(values):
+        sketch = get_sketch(conn, metric) or MetricSketch()
+        sketch.update(values[metric])
+        _write_sketch(conn, metric, sketch, now)
+
+
+def merge_sketches(conn, schema):
+    """
+    Merges the sketches of an attached database into those of the main
+    database. Used for databases without a `sample_qc_summary`, whose
+    values can't be told apart from those already merged.
+    """
+    create_table(conn)
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    existing = get_sketches(conn)
+    for metric, other in sorted(get_sketches(conn, schema).items()):
+        sketch = existing.get(metric) or MetricSketch()
+        sketch.merge(other)
+        _write_sketch(conn, metric, sketch, now)
+
+
+def describe_value(conn, metric, value):
+    """
+    Returns how a value of a metric compares to the cohort as a dict with
+    the cohort count, mean and stddev and the value's zscore and percentile,
+    or None when the metric has no sketch.
+    """
+    sketch = get_sketch(conn, metric)
+    if sketch is None:
+        return None
+    return {
+        "count": sketch.count,
+        "mean": sketch.mean,
+        "stddev": sketch.stddev,
+        "zscore": sketch.zscore(value),
+        "percentile": sketch.percentile(value),
+    }
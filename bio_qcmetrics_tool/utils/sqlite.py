@@ -0,0 +1,404 @@
+"""Module containing general utilities for writing sqlite dbs"""
+import fnmatch
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+from pandas.io.sql import SQLiteDatabase
+
+# Columns holding the name of the input metrics file, in order of preference.
+# Together with `job_uuid` they identify the rows of a single export.
+SOURCE_COLUMNS = [
+    "fastqc_zip",
+    "picard_metrics",
+    "star_file",
+    "flagstat_file",
+    "idxstat_file",
+    "samtools_stats_file",
+    "metrics_file",
+    "matrix_dir",
+    "readgroup_file",
+    "bam",
+]
+
+
+def get_source_key(columns):
+    """
+    Returns the (job_uuid, source column) that identify the rows written by
+    one export to a table with the given columns, or None.
+    """
+    if "job_uuid" not in columns:
+        return None
+    for col in SOURCE_COLUMNS:
+        if col in columns:
+            return ("job_uuid", col)
+    return None
+
+
+# Columns that, after (job_uuid, source), make up the natural key of each
+# table. Patterns are matched in order and the first match wins.
+NATURAL_KEY_COLUMNS = [
+    ("fastqc_summary", []),
+    ("fastqc_data_Basic_Statistics", ["Measure"]),
+    ("fastqc_data_*", []),
+    ("picard_*_histogram", ["colname"]),
+    ("picard_*", []),
+    ("star_stats", ["category"]),
+    ("star_gene_counts", ["strand", "category"]),
+    ("samtools_flagstat", ["category"]),
+    ("samtools_idxstat", ["NAME"]),
+    ("readgroups", ["ID", "key"]),
+    ("10x_scrna_metrics", ["category"]),
+    ("10x_scrna_*_stats", ["category"]),
+    ("10x_scrna_*_summary", ["metric", "population"]),
+    ("10x_scrna_*_histogram", ["metric", "population", "bin_start"]),
+    ("10x_scrna_cell_qc", ["barcode"]),
+    ("qc_flags", ["source_file", "rule"]),
+]
+
+# Columns that get their own index for lookups without a job_uuid.
+LOOKUP_COLUMNS = ["bam", "fastq", "picard_metrics"]
+
+# Materialized table with one row per (job_uuid, bam) holding the headline
+# metrics of every tool. It is keyed by that primary key, so jobs with the same
+# bam name keep their own rows, and updated by each export.
+SAMPLE_SUMMARY_TABLE = "sample_qc_summary"
+
+
+def get_natural_key(table, columns):
+    """
+    Returns the natural key columns of a table given its columns, or None
+    when the table has no job_uuid/source columns.
+    """
+    key = get_source_key(columns)
+    if key is None:
+        return None
+    key = list(key)
+    for pattern, extra in NATURAL_KEY_COLUMNS:
+        if fnmatch.fnmatchcase(table, pattern):
+            key.extend(c for c in extra if c in columns and c not in key)
+            break
+    return key
+
+
+def get_table_indexes(table, columns):
+    """
+    Returns a list of (index name, columns) to create for a table.
+    """
+    if table == SAMPLE_SUMMARY_TABLE:
+        return []
+    indexes = []
+    key = get_natural_key(table, columns)
+    if key:
+        indexes.append(("{0}_key".format(table), key))
+    for col in LOOKUP_COLUMNS:
+        if col in columns and (not key or key[0] != col):
+            indexes.append(("{0}_{1}".format(table, col), [col]))
+    return indexes
+
+
+def ensure_indexes(conn, tables=None, unique=False):
+    """
+    Creates the natural key and lookup indexes of the given tables (or all
+    tables) if they don't exist yet. With ``unique`` the natural key index is
+    created as a UNIQUE index, which fails if duplicate rows were loaded.
+    """
+    if tables is None:
+        tables = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM main.sqlite_master "
+                "WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+
+    created = []
+    for table in tables:
+        columns = get_table_columns(conn, table)
+        for name, cols in get_table_indexes(table, columns):
+            is_unique = unique and name.endswith("_key")
+            kind = "UNIQUE INDEX" if is_unique else "INDEX"
+            cur = conn.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type='index' AND name=?",
+                (name,),
+            )
+            existing = cur.fetchone()
+            if existing:
+                if not is_unique or existing[0].upper().startswith("CREATE UNIQUE"):
+                    continue
+                conn.execute("DROP INDEX {0}".format(quote(name)))
+            conn.execute(
+                "CREATE {0} {1} ON {2} ({3})".format(
+                    kind, quote(name), quote(table), ", ".join(quote(c) for c in cols)
+                )
+            )
+            created.append(name)
+    return created
+
+
+def quote(name):
+    """
+    Quotes an sqlite identifier.
+    """
+    return '"{0}"'.format(str(name).replace('"', '""'))
+
+
+def get_table_columns(conn, table, schema="main"):
+    """
+    Returns the list of column names for a table or an empty list
+    if the table does not exist.
+    """
+    res = conn.execute("PRAGMA {0}.table_info({1})".format(quote(schema), quote(table)))
+    return [row[1] for row in res.fetchall()]
+
+
+def get_frame_types(df):
+    """
+    Returns the sqlite column type of each column of a DataFrame.
+    """
+    types = dict()
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            types[col] = "INTEGER"
+        elif pd.api.types.is_float_dtype(dtype):
+            types[col] = "REAL"
+        else:
+            types[col] = "TEXT"
+    return types
+
+
+def add_missing_columns(conn, table, columns, types=None):
+    """
+    Adds any of the provided columns that are not yet present in an existing
+    table so that rows with new keys can be appended. Does nothing if the
+    table does not exist yet. ``types`` optionally maps columns to their
+    sqlite type.
+    """
+    existing = get_table_columns(conn, table)
+    if not existing:
+        return []
+
+    added = []
+    for col in columns:
+        if col not in existing:
+            conn.execute(
+                "ALTER TABLE {0} ADD COLUMN {1} {2}".format(
+                    quote(table), quote(col), (types or dict()).get(col, "")
+                ).rstrip()
+            )
+            existing.append(col)
+            added.append(col)
+    return added
+
+
+def common_type(values, value_type, mixed):
+    """
+    Returns the ``value_type`` shared by the values that are not missing,
+    ``mixed`` when they differ, or None when all are missing.
+    """
+    found = set(value_type(v) for v in values if not pd.isna(v))
+    if len(found) > 1:
+        return mixed
+    return found.pop() if found else None
+
+
+def summary_columns(summary, value_type=None, mixed=None):
+    """
+    Returns the ``{column: type}`` dict, sorted by column, of the
+    `sample_qc_summary` columns of a ``{bam: {column: value}}`` dict. The
+    types are given by `common_type`, or are all None without ``value_type``.
+    """
+    columns = dict()
+    for values in summary.values():
+        for col, value in values.items():
+            columns.setdefault(col, []).append(value)
+    return dict(
+        (col, common_type(columns[col], value_type, mixed) if value_type else None)
+        for col in sorted(columns)
+    )
+
+
+def upsert_sample_summary(conn, summary, job_uuid):
+    """
+    Creates or updates the `sample_qc_summary` row of the job of each bam
+    given a ``{bam: {column: value}}`` dict. Only the given columns are
+    overwritten, so the metrics written by other tools for the same bam are
+    kept.
+    """
+    table = quote(SAMPLE_SUMMARY_TABLE)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {0} (job_uuid TEXT NOT NULL, bam TEXT NOT NULL, "
+        "PRIMARY KEY (job_uuid, bam))".format(table)
+    )
+    add_missing_columns(conn, SAMPLE_SUMMARY_TABLE, list(summary_columns(summary)))
+
+    for bam in sorted(summary):
+        cols = sorted(summary[bam])
+        if not cols:
+            continue
+        conn.execute(
+            "INSERT INTO {0} (job_uuid, bam, {1}) VALUES (?, ?, {2}) "
+            "ON CONFLICT(job_uuid, bam) DO UPDATE SET {3}".format(
+                table,
+                ", ".join(quote(c) for c in cols),
+                ", ".join("?" for _ in cols),
+                ", ".join("{0} = excluded.{0}".format(quote(c)) for c in cols),
+            ),
+            [job_uuid, bam] + [summary[bam][c] for c in cols],
+        )
+
+
+@contextmanager
+def connect(path):
+    """
+    Opens a connection, commits on success or rolls back on error, and
+    always closes it.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+class SqliteConnectionPool:
+    """
+    Keeps one open connection per sqlite db path so that repeated exports to
+    the same output don't pay for reconnecting. SQLite allows a single writer
+    per db, so each connection is guarded by a lock and handed to one
+    exporter at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = dict()
+
+    def _get(self, path):
+        with self._lock:
+            if path not in self._connections:
+                conn = sqlite3.connect(path, check_same_thread=False)
+                self._connections[path] = (conn, threading.RLock())
+            return self._connections[path]
+
+    @contextmanager
+    def connection(self, path):
+        """
+        Yields the pooled connection for ``path`` and commits on success or
+        rolls back on error.
+        """
+        conn, lock = self._get(path)
+        with lock:
+            with conn:
+                yield conn
+
+    def close(self):
+        with self._lock:
+            for conn, lock in self._connections.values():
+                with lock:
+                    conn.close()
+            self._connections = dict()
+
+
+class _UncommittedDatabase(SQLiteDatabase):
+    """
+    pandas' sqlite writer without the commit or rollback after each table.
+    """
+
+    @contextmanager
+    def run_transaction(self):
+        cur = self.con.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+def append_frame(conn, table, df):
+    """
+    Appends a DataFrame to a table like ``DataFrame.to_sql``, creating it if
+    needed, but leaves the write in the open transaction of the connection.
+    """
+    _UncommittedDatabase(conn).to_sql(df, table, if_exists="append")
+
+
+@contextmanager
+def savepoint(conn, name="export"):
+    """
+    Runs the enclosed writes in a savepoint that is rolled back on error.
+    A transaction is opened first if none is, since releasing the outermost
+    savepoint would otherwise commit: committing is left to the caller.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute("SAVEPOINT {0}".format(name))
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK TO {0}".format(name))
+        conn.execute("RELEASE {0}".format(name))
+        raise
+    else:
+        conn.execute("RELEASE {0}".format(name))
+
+
+class DeferredCommitConnection(sqlite3.Connection):
+    """
+    Connection whose ``commit()`` and ``rollback()`` are ignored while
+    ``deferred`` is set. Writers such as pandas ``to_sql`` commit after every
+    table, which would otherwise end an enclosing batch transaction.
+    """
+
+    deferred = False
+
+    def commit(self):
+        if not self.deferred:
+            super().commit()
+
+    def rollback(self):
+        if not self.deferred:
+            super().rollback()
+
+
+class SharedTransaction:
+    """
+    Connection provider (see ``ExportQcModule.connection_pool``) that writes
+    several exports into one transaction on a single db. Each export runs in
+    its own savepoint, so a failed export is rolled back without losing the
+    others. Everything is committed when the context exits cleanly.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self._count = 0
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.path, factory=DeferredCommitConnection)
+        self.conn.execute("BEGIN")
+        self.conn.deferred = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.deferred = False
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+            self.conn = None
+        return False
+
+    @contextmanager
+    def connection(self, path=None):
+        """
+        Yields the shared connection inside a savepoint.
+        """
+        name = "export_{0}".format(self._count)
+        self._count += 1
+        with savepoint(self.conn, name):
+            yield self.conn
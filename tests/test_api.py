@@ -0,0 +1,142 @@
+"""Tests for `bio_qcmetrics_tool.api`"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool import api
+from bio_qcmetrics_tool.modules.picard import ExportPicardMetrics
+from bio_qcmetrics_tool.modules.table import MetricTable
+from tests.utils import get_test_data_path
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.picard = get_test_data_path("CTC-1-AA-B2.star.bam.rnaseqmetrics.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_exporters(self):
+        found = api.exporters()
+        self.assertIs(found["picardmetrics"], ExportPicardMetrics)
+        self.assertIn("samtoolsflagstats", found)
+
+    def test_tables(self):
+        tables = api.export_picard(
+            inputs=[self.picard], job_uuid="job", derived_from_file="x.bam"
+        )
+        self.assertTrue(all(isinstance(i, MetricTable) for i in tables))
+        self.assertEqual(
+            set(i.name for i in tables),
+            set(["picard_RnaSeqMetrics", "picard_RnaSeqMetrics_histogram"]),
+        )
+        df = tables[0].to_frame()
+        self.assertEqual(set(df["job_uuid"]), set(["job"]))
+        self.assertFalse(os.listdir(self.tmpdir))
+
+    def test_connection_sink(self):
+        conn = sqlite3.connect(":memory:")
+        api.export_samtools_flagstat(
+            inputs=[get_test_data_path("samtools.flagstat.log.txt")],
+            job_uuid="job",
+            bam="x.bam",
+            sink=conn,
+        )
+        res = conn.execute(
+            "SELECT flagstat_job_uuid FROM sample_qc_summary WHERE bam = 'x.bam'"
+        ).fetchone()
+        self.assertEqual(res, ("job",))
+        conn.close()
+
+    def test_connection_sink_rollback(self):
+        output = os.path.join(self.tmpdir, "out.db")
+        conn = sqlite3.connect(output)
+        conn.execute("CREATE TABLE existing (x INTEGER)")
+        conn.commit()
+        api.export_picard(
+            inputs=[self.picard], job_uuid="job", derived_from_file="x.bam", sink=conn
+        )
+        self.assertTrue(conn.in_transaction)
+        conn.rollback()
+
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        self.assertEqual(tables.fetchall(), [("existing",)])
+        conn.close()
+
+    def test_path_sink(self):
+        output = os.path.join(self.tmpdir, "out.db")
+        api.export_samtools_stats(
+            input=get_test_data_path(
+                "SRR1067503_1.fastq.gz_bowtie_srtd.bam_dedup.bam_samtools_stats.txt"
+            ),
+            job_uuid="job",
+            bam="x.bam",
+            sink=output,
+        )
+        with sqlite3.connect(output) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM samtools_stats").fetchone()
+        conn.close()
+        self.assertGreater(res[0], 0)
+
+    def test_single_values(self):
+        tables = api.export_star(
+            job_uuid="job",
+            bam="x.bam",
+            final_log_inputs=get_test_data_path("star.log.final.out"),
+        )
+        df = tables[0].to_frame()
+        self.assertEqual(set(df["bam"]), set(["x.bam"]))
+        tables = api.export_samtools_flagstat(
+            inputs=get_test_data_path("samtools.flagstat.log.txt"),
+            job_uuid="job",
+            bam="x.bam",
+        )
+        self.assertEqual(tables[0].name, "samtools_flagstat")
+
+    def test_rules(self):
+        rules = os.path.join(self.tmpdir, "rules.toml")
+        with open(rules, "wt") as fh:
+            fh.write(
+                '[[rules]]\nname = "mapped"\ntable = "samtools_flagstat"\n'
+                "check = \"category == 'mapped'\"\n"
+            )
+        opts = dict(
+            inputs=[get_test_data_path("samtools.flagstat.log.txt")],
+            job_uuid="job",
+            bam="x.bam",
+            rules=rules,
+        )
+        tables = api.export_samtools_flagstat(**opts)
+        self.assertEqual(tables[-1].name, "qc_flags")
+        self.assertEqual(len(tables[-1]), len(tables[0]))
+
+        conn = sqlite3.connect(":memory:")
+        api.export_samtools_flagstat(sink=conn, **opts)
+        res = conn.execute("SELECT SUM(passed) FROM qc_flags").fetchone()
+        conn.close()
+        self.assertEqual(res, (1,))
+
+    def test_journal(self):
+        output = os.path.join(self.tmpdir, "out.db")
+        opts = dict(
+            inputs=[get_test_data_path("samtools.flagstat.log.txt")],
+            job_uuid="job",
+            bam="x.bam",
+            journal=True,
+        )
+        api.export_samtools_flagstat(sink=output, **opts)
+        with sqlite3.connect(output) as conn:
+            res = conn.execute("SELECT tool, job_uuid FROM qc_journal").fetchall()
+        conn.close()
+        self.assertEqual(res, [("samtoolsflagstats", "job")])
+        with self.assertRaises(ValueError):
+            api.export_samtools_flagstat(**opts)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            api.export("nope")
+        with self.assertRaises(TypeError):
+            api.export_picard(inputs=[self.picard], job_uuid="job", bad_option=1)
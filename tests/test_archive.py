@@ -0,0 +1,90 @@
+"""Tests for reading inputs from tar archives"""
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.modules.exceptions import (
+    ArchiveMemberNotFoundException,
+    ParserException,
+)
+from bio_qcmetrics_tool.modules.fastqc import ExportFastqc
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsStats
+from bio_qcmetrics_tool.utils.archive import member_path, split_archive_path
+from tests.utils import captured_output, get_test_data_path
+
+STATS = "SRR1067503_1.fastq.gz_bowtie_srtd.bam_dedup.bam_samtools_stats.txt"
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.db")
+        self.archive = os.path.join(self.tmpdir, "job.tar.gz")
+        with tarfile.open(self.archive, "w:gz") as tar:
+            tar.add(
+                get_test_data_path("SRR1067505_1_fastqc.zip"),
+                arcname="./job/fastqc/SRR1067505_1_fastqc.zip",
+            )
+            tar.add(get_test_data_path(STATS), arcname="job/" + STATS)
+            tar.add(
+                get_test_data_path("samtools.flagstat.log.txt"),
+                arcname="job/x.stats.txt",
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_split_archive_path(self):
+        self.assertEqual(split_archive_path("a.tar.gz"), ("a.tar.gz", None))
+        self.assertEqual(
+            split_archive_path("a.tgz::./job/*.zip"), ("a.tgz", "job/*.zip")
+        )
+        self.assertIsNone(split_archive_path("a_fastqc.zip"))
+        self.assertIsNone(split_archive_path("a.tar::/job/x.zip"))
+        self.assertEqual(os.path.basename(member_path("a.tar", "./x.zip")), "x.zip")
+
+    def test_fastqc_members(self):
+        opts = {
+            "inputs": [self.archive + "::*_fastqc.zip"],
+            "job_uuid": "job",
+            "output": self.output,
+            "export_format": "sqlite",
+        }
+        obj = ExportFastqc(options=opts)
+        with captured_output() as (_, _):
+            obj.do_work()
+        self.assertEqual(
+            obj.options["inputs"],
+            [self.archive + "::/job/fastqc/SRR1067505_1_fastqc.zip"],
+        )
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(
+                "SELECT DISTINCT fastqc_zip FROM fastqc_summary"
+            ).fetchall()
+        conn.close()
+        self.assertEqual(res, [("SRR1067505_1_fastqc.zip",)])
+
+    def test_single_input(self):
+        opts = {
+            "input": self.archive + "::job/SRR*",
+            "job_uuid": "job",
+            "bam": "x.bam",
+            "output": self.output,
+            "export_format": "sqlite",
+        }
+        ExportSamtoolsStats(options=opts).do_work()
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM samtools_stats").fetchone()
+        conn.close()
+        self.assertGreater(res[0], 0)
+
+        opts["input"] = self.archive + "::job/*stats.txt"
+        with self.assertRaises(ParserException):
+            ExportSamtoolsStats(options=opts).do_work()
+
+        opts["input"] = self.archive + "::missing*"
+        with self.assertRaises(ArchiveMemberNotFoundException):
+            ExportSamtoolsStats(options=opts).do_work()
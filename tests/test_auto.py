@@ -0,0 +1,137 @@
+"""Tests for the `export auto` subcommand"""
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.modules.auto import ExportAuto
+from bio_qcmetrics_tool.modules.auto.sniff import classify, read_head
+from bio_qcmetrics_tool.modules.exceptions import ParserException
+from bio_qcmetrics_tool.utils.prefetch import export_many_async
+from tests.utils import captured_output, get_table_list, get_test_data_path
+
+STATS = "SRR1067503_1.fastq.gz_bowtie_srtd.bam_dedup.bam_samtools_stats.txt"
+
+KINDS = {
+    "SRR1067505_1_fastqc.zip": "fastqc",
+    "CTC-1-AA-B2.star.bam.rnaseqmetrics.txt": "picard",
+    "star.log.final.out": "star_log",
+    "test_star_counts.txt": "star_gene_counts",
+    "samtools.flagstat.log.txt": "flagstat",
+    "samtools.idxstats.log.txt": "idxstats",
+    STATS: "samtools_stats",
+    "readgroups.json": None,
+    "README.md": None,
+}
+
+
+class TestAuto(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_classify(self):
+        for name, kind in KINDS.items():
+            self.assertEqual(classify(read_head(get_test_data_path(name))), kind, name)
+
+        gz = os.path.join(self.tmpdir, "x.flagstat.gz")
+        with open(get_test_data_path("samtools.flagstat.log.txt"), "rb") as fh:
+            with gzip.open(gz, "wb") as out:
+                out.write(fh.read())
+        self.assertEqual(classify(read_head(gz)), "flagstat")
+        self.assertIsNone(classify(b""))
+
+    def test_do_work(self):
+        tree = os.path.join(self.tmpdir, "tree")
+        os.makedirs(os.path.join(tree, "a", "b"))
+        for name in ["SRR1067505_1_fastqc.zip", STATS, "readgroups.json"]:
+            shutil.copy(get_test_data_path(name), os.path.join(tree, "a", name))
+        shutil.copy(
+            get_test_data_path("star.log.final.out"),
+            os.path.join(tree, "a", "b", "Log.final.out"),
+        )
+        archive = os.path.join(self.tmpdir, "job.tar.gz")
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(
+                get_test_data_path("samtools.flagstat.log.txt"), arcname="x.flagstat"
+            )
+            tar.add(get_test_data_path("README.md"), arcname="README.md")
+
+        opts = {
+            "inputs": [tree, archive],
+            "job_uuid": "job",
+            "bam": "x.bam",
+            "output": self.output,
+            "export_format": "sqlite",
+        }
+        obj = ExportAuto(options=opts)
+        with captured_output() as (_, _):
+            obj.do_work()
+        self.assertEqual(
+            sorted(type(i).__name__ for i in obj.exporters),
+            [
+                "ExportFastqc",
+                "ExportSamtoolsFlagstats",
+                "ExportSamtoolsStats",
+                "ExportStarStats",
+            ],
+        )
+        with sqlite3.connect(self.output) as conn:
+            tables = set(get_table_list(conn.cursor()))
+            summary = conn.execute(
+                "SELECT bam, flagstat_job_uuid, star_job_uuid, samtools_stats_job_uuid "
+                "FROM sample_qc_summary"
+            ).fetchall()
+        conn.close()
+        for table in [
+            "fastqc_summary",
+            "samtools_flagstat",
+            "samtools_stats",
+            "star_stats",
+        ]:
+            self.assertIn(table, tables)
+        self.assertEqual(summary, [("x.bam", "job", "job", "job")])
+
+    def test_export_many_async_archive(self):
+        archive = os.path.join(self.tmpdir, "job.tar.gz")
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(
+                get_test_data_path("samtools.flagstat.log.txt"), arcname="x.flagstat"
+            )
+            tar.add(get_test_data_path(STATS), arcname="x.stats")
+        opts = {
+            "inputs": [archive + "::x.*"],
+            "job_uuid": "job",
+            "bam": "x.bam",
+            "output": self.output,
+            "export_format": "sqlite",
+        }
+        obj = ExportAuto(options=opts)
+        with captured_output() as (_, _):
+            asyncio.run(export_many_async([obj]))
+        self.assertEqual(
+            sorted(type(i).__name__ for i in obj.exporters),
+            ["ExportSamtoolsFlagstats", "ExportSamtoolsStats"],
+        )
+        with sqlite3.connect(self.output) as conn:
+            tables = set(get_table_list(conn.cursor()))
+        conn.close()
+        self.assertIn("samtools_flagstat", tables)
+        self.assertIn("samtools_stats", tables)
+
+    def test_missing_bam(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "job_uuid": "job",
+            "output": self.output,
+            "export_format": "sqlite",
+        }
+        with self.assertRaises(ParserException), captured_output() as (_, _):
+            ExportAuto(options=opts).do_work()
@@ -0,0 +1,124 @@
+"""Tests for `bio_qcmetrics_tool.utils.cache`"""
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.utils.cache import ParseCache, dumps, loads
+from tests.utils import get_test_data_path
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, "cache")
+        self.input = os.path.join(self.tmpdir, "input.txt")
+        with open(self.input, "wt") as fh:
+            fh.write("abc")
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def parse(self):
+        self.calls += 1
+        with open(self.input, "rt") as fh:
+            return {"value": fh.read()}
+
+    def test_get_or_parse(self):
+        cache = ParseCache(self.cache_dir)
+        self.assertEqual(
+            cache.get_or_parse("t", self.input, self.parse), {"value": "abc"}
+        )
+        self.assertEqual(
+            cache.get_or_parse("t", self.input, self.parse), {"value": "abc"}
+        )
+        self.assertEqual(self.calls, 1)
+
+        # Different namespaces and extra options are cached separately
+        cache.get_or_parse("u", self.input, self.parse)
+        cache.get_or_parse("t", self.input, self.parse, extra=("a",))
+        self.assertEqual(self.calls, 3)
+
+    def test_invalidated_by_change(self):
+        cache = ParseCache(self.cache_dir)
+        cache.get_or_parse("t", self.input, self.parse)
+        with open(self.input, "wt") as fh:
+            fh.write("abcd")
+        self.assertEqual(
+            cache.get_or_parse("t", self.input, self.parse), {"value": "abcd"}
+        )
+        self.assertEqual(self.calls, 2)
+
+    def test_corrupt_entry(self):
+        cache = ParseCache(self.cache_dir)
+        key = cache.key("t", self.input)
+        cache.set(key, [1, 2])
+        with open(os.path.join(self.cache_dir, key + ParseCache.SUFFIX), "wb") as fh:
+            fh.write(b"garbage")
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_json_values(self):
+        value = {
+            "metrics": ("class", [{"a": 1, "b": float("inf")}, (2.5, None)]),
+            "raw": b"\x00abc",
+            "keys": {1: "x", ("a", 2): "y", "__tuple__": True},
+        }
+        self.assertEqual(loads(dumps(value)), value)
+        with self.assertRaises(TypeError):
+            dumps(object())
+
+    def test_pickle_not_loaded(self):
+        cache = ParseCache(self.cache_dir)
+        key = cache.key("t", self.input)
+        with open(cache._path(key), "wb") as fh:
+            fh.write(pickle.dumps({"value": "abc"}))
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_lru_eviction(self):
+        cache = ParseCache(self.cache_dir, max_size=2500)
+        blobs = [os.urandom(1000) for _ in range(3)]
+        cache.set("a", blobs[0])
+        cache.set("b", blobs[1])
+        os.utime(cache._path("a"), ns=(1, 1))
+        os.utime(cache._path("b"), ns=(2, 2))
+        # Reading refreshes "a", so "b" is the least recently used
+        self.assertEqual(cache.get("a"), blobs[0])
+        cache.set("c", blobs[2])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), blobs[0])
+        self.assertEqual(cache.get("c"), blobs[2])
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_exporter_cache(self):
+        flagstat = os.path.join(self.tmpdir, "x.flagstat")
+        shutil.copy(get_test_data_path("samtools.flagstat.log.txt"), flagstat)
+        output = os.path.join(self.tmpdir, "out.db")
+        for i in range(2):
+            opts = {
+                "inputs": [flagstat],
+                "export_format": "sqlite",
+                "output": output,
+                "bam": "x{0}.bam".format(i),
+                "job_uuid": "job{0}".format(i),
+                "cache_dir": self.cache_dir,
+                "cache_size": 1,
+            }
+            obj = ExportSamtoolsFlagstats(options=opts)
+            obj._parse_flagstat = None if i else obj._parse_flagstat
+            obj.do_work()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with sqlite3.connect(output) as conn:
+            res = conn.execute(
+                "SELECT job_uuid, COUNT(*) FROM samtools_flagstat GROUP BY job_uuid"
+            ).fetchall()
+        conn.close()
+        self.assertEqual(len(res), 2)
+        self.assertEqual(res[0][1], res[1][1])
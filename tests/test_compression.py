@@ -0,0 +1,112 @@
+"""Tests for `bio_qcmetrics_tool.utils.compression`"""
+import gzip
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from bio_qcmetrics_tool.utils import compression
+from bio_qcmetrics_tool.utils.parse import get_read_func, open_buffer, open_file
+
+# The empty block that ends every BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def bgzf_compress(data, block_size=1000):
+    """
+    Compresses data into BGZF blocks of at most ``block_size`` bytes.
+    """
+    out = []
+    for i in range(0, len(data), block_size):
+        chunk = data[i : i + block_size]
+        comp = zlib.compressobj(6, zlib.DEFLATED, -15)
+        cdata = comp.compress(chunk) + comp.flush()
+        header = b"\037\213\010\004" + b"\0" * 4 + b"\0\377" + struct.pack("<H", 6)
+        extra = b"BC" + struct.pack("<HH", 2, len(cdata) + 25)
+        trailer = struct.pack("<II", zlib.crc32(chunk), len(chunk))
+        out.append(header + extra + cdata + trailer)
+    out.append(BGZF_EOF)
+    return b"".join(out)
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.data = "".join(
+            "chr{0}\t{1}\t{2}\t0\n".format(i, i * 1000, i * 7) for i in range(5000)
+        ).encode("ascii")
+        self.bgzf = os.path.join(self.tmpdir, "x.txt.bgz")
+        with open(self.bgzf, "wb") as fh:
+            fh.write(bgzf_compress(self.data))
+        self.gz = os.path.join(self.tmpdir, "x.txt.gz")
+        with gzip.open(self.gz, "wb") as fh:
+            fh.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_bgzf_compress(self):
+        with open(self.bgzf, "rb") as fh:
+            self.assertEqual(gzip.decompress(fh.read()), self.data)
+
+    def test_is_bgzf(self):
+        with open(self.bgzf, "rb") as fh:
+            self.assertTrue(compression.is_bgzf(fh.read(18)))
+        with open(self.gz, "rb") as fh:
+            self.assertFalse(compression.is_bgzf(fh.read(18)))
+
+    def test_select_backend(self):
+        with open(self.bgzf, "rb") as fh:
+            self.assertEqual(
+                compression.select_backend(fh, fh.read(18), threads=4), "bgzf"
+            )
+            self.assertNotEqual(compression.select_backend(fh, b"", threads=1), "bgzf")
+
+    def test_bgzf_backend(self):
+        with compression.open_gzip(self.bgzf, "rb", backend="bgzf", threads=3) as fh:
+            self.assertEqual(fh.read(), self.data)
+        with compression.open_gzip(self.bgzf, "rt", backend="bgzf", threads=2) as fh:
+            lines = fh.readlines()
+        self.assertEqual(len(lines), 5000)
+        self.assertEqual(lines[-1], "chr4999\t4999000\t34993\t0\n")
+
+    def test_bgzf_corrupt(self):
+        data = bytearray(bgzf_compress(self.data))
+        data[-40] ^= 0xFF
+        with self.assertRaises((OSError, zlib.error)):
+            with compression.open_gzip_fileobj(
+                io.BytesIO(bytes(data)), backend="bgzf", threads=2
+            ) as fh:
+                fh.read()
+
+    def test_gzip_backend(self):
+        for path in (self.gz, self.bgzf):
+            with compression.open_gzip(path, "rb", backend="gzip") as fh:
+                self.assertEqual(fh.read(), self.data)
+
+    @unittest.skipUnless(shutil.which("gzip"), "gzip is not installed")
+    def test_pipe_reader(self):
+        with open(self.gz, "rb") as raw:
+            raw.peek(18)
+            reader = compression.PipeReader(["gzip", "-dc"], raw)
+            with io.BufferedReader(reader) as fh:
+                self.assertEqual(fh.read(), self.data)
+        self.assertTrue(raw.closed)
+
+    @unittest.skipUnless(compression.external_command(), "pigz/bgzip not installed")
+    def test_external_backend(self):
+        with compression.open_gzip(self.gz, "rb", backend="external") as fh:
+            self.assertEqual(fh.read(), self.data)
+
+    def test_open_file(self):
+        for path in (self.gz, self.bgzf):
+            with open_file(path, "rt") as fh:
+                self.assertEqual(fh.read().encode("ascii"), self.data)
+            with get_read_func(path)(path, "rb") as fh:
+                self.assertEqual(fh.read(), self.data)
+        with open(self.bgzf, "rb") as fh:
+            with open_buffer(fh.read(), "rb") as bfh:
+                self.assertEqual(bfh.read(), self.data)
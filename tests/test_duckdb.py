@@ -0,0 +1,137 @@
+"""Tests for the duckdb export format"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from bio_qcmetrics_tool.modules.fastqc import ExportFastqc
+from bio_qcmetrics_tool.modules.picard import ExportPicardMetrics
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.utils import duckdb
+from tests.utils import captured_output, get_test_data_path
+
+
+@unittest.skipUnless(duckdb.duckdb, "duckdb is not installed")
+class TestDuckdb(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.duckdb")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def query(self, sql):
+        conn = duckdb.duckdb.connect(self.output, read_only=True)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_append_frame(self):
+        with duckdb.connect(self.output) as conn:
+            duckdb.append_frame(conn, "t", pd.DataFrame({"a": [1, 2], "b": ["x", 3]}))
+            duckdb.append_frame(conn, "t", pd.DataFrame({"c": [1.5], "a": [3]}))
+        self.assertEqual(
+            self.query("SELECT a, b, c FROM t ORDER BY a"),
+            [(1, "x", None), (2, "3", None), (3, None, 1.5)],
+        )
+
+    def test_append_widens_integers(self):
+        with duckdb.connect(self.output) as conn:
+            duckdb.append_frame(conn, "t", pd.DataFrame({"PCT": [0], "n": [1]}))
+        with duckdb.connect(self.output) as conn:
+            duckdb.append_frame(conn, "t", pd.DataFrame({"PCT": [0.53], "n": [2]}))
+            duckdb.upsert_sample_summary(conn, {"x.bam": {"pct": 0}}, "job")
+            duckdb.upsert_sample_summary(conn, {"y.bam": {"pct": 0.98}}, "job")
+        self.assertEqual(
+            self.query("SELECT PCT, n FROM t ORDER BY n"), [(0.0, 1), (0.53, 2)]
+        )
+        self.assertEqual(
+            self.query("SELECT pct FROM sample_qc_summary ORDER BY bam"),
+            [(0.0,), (0.98,)],
+        )
+
+    def test_append_widens_to_text(self):
+        with duckdb.connect(self.output) as conn:
+            duckdb.append_frame(conn, "t", pd.DataFrame({"v": [1], "n": [1]}))
+            duckdb.upsert_sample_summary(conn, {"x.bam": {"pct": 0.5}}, "job")
+        with duckdb.connect(self.output) as conn:
+            df = pd.DataFrame({"v": pd.Series([None, None], dtype=object)})
+            df["n"] = [2, 3]
+            duckdb.append_frame(conn, "t", df)
+            duckdb.upsert_sample_summary(conn, {"y.bam": {"pct": None}}, "job")
+        self.assertEqual(
+            self.query(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 't' AND column_name = 'v'"
+            ),
+            [("BIGINT",)],
+        )
+        with duckdb.connect(self.output) as conn:
+            duckdb.append_frame(conn, "t", pd.DataFrame({"v": ["NA"], "n": [4]}))
+            duckdb.upsert_sample_summary(conn, {"z.bam": {"pct": "NA"}}, "job")
+        self.assertEqual(
+            self.query("SELECT v, n FROM t ORDER BY n"),
+            [("1", 1), (None, 2), (None, 3), ("NA", 4)],
+        )
+        self.assertEqual(
+            self.query("SELECT pct FROM sample_qc_summary ORDER BY bam"),
+            [("0.5",), (None,), ("NA",)],
+        )
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with duckdb.connect(self.output) as conn:
+                duckdb.append_frame(conn, "t", pd.DataFrame({"a": [1]}))
+                raise ValueError("fail")
+        self.assertEqual(self.query("SHOW TABLES"), [])
+
+    def test_export(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "duckdb",
+            "output": self.output,
+            "bam": "x.bam",
+            "job_uuid": "job",
+        }
+        ExportSamtoolsFlagstats(options=opts).do_work()
+        ExportSamtoolsFlagstats(options=dict(opts, job_uuid="job2")).do_work()
+        opts = {
+            "inputs": [get_test_data_path("CTC-1-AA-B2.star.bam.rnaseqmetrics.txt")],
+            "export_format": "duckdb",
+            "output": self.output,
+            "derived_from_file": "x.bam",
+            "job_uuid": "job",
+        }
+        ExportPicardMetrics(options=opts).do_work()
+        opts = {
+            "inputs": [get_test_data_path("SRR1067505_1_fastqc.zip")],
+            "export_format": "sqlite,duckdb",
+            "output": os.path.join(self.tmpdir, "out.db"),
+            "job_uuid": "job",
+        }
+        with captured_output() as (_, _):
+            ExportFastqc(options=opts).do_work()
+
+        counts = self.query(
+            "SELECT job_uuid, COUNT(*) FROM samtools_flagstat GROUP BY job_uuid "
+            "ORDER BY job_uuid"
+        )
+        self.assertEqual([i[0] for i in counts], ["job", "job2"])
+        self.assertEqual(counts[0][1], counts[1][1])
+        tables = set(i[0] for i in self.query("SHOW TABLES"))
+        for table in [
+            "picard_RnaSeqMetrics_histogram",
+            "fastqc_data_Per_base_sequence_quality",
+            "sample_qc_summary",
+        ]:
+            self.assertIn(table, tables)
+        self.assertEqual(
+            self.query(
+                "SELECT job_uuid, bam, flagstat_job_uuid FROM sample_qc_summary "
+                "ORDER BY job_uuid"
+            ),
+            [("job", "x.bam", "job"), ("job2", "x.bam", "job2")],
+        )
@@ -202,3 +202,132 @@ class TestExportFastqc(unittest.TestCase):
                 self.assertEqual(res, expected_tables)
         finally:
             cleanup_files(fn)
+
+    def test_parse_fastqc_zip_closes_input(self):
+        obj = ExportFastqc(options={"inputs": [], "job_uuid": "fakeuuid"})
+        handles = []
+        open_input = obj.open_input
+
+        def tracked(*args, **kwargs):
+            handles.append(open_input(*args, **kwargs))
+            return handles[-1]
+
+        obj.open_input = tracked
+        obj.parse_fastqc_zip(get_test_data_path("SRR1067505_1_fastqc.zip"), "x")
+        self.assertEqual(len(handles), 1)
+        self.assertTrue(handles[0].closed)
+        self.assertIn("fastqc_summary", obj.data["x"])
+
+    def test_do_work_sections(self):
+        fqc_zip = get_test_data_path("SRR1067505_1_fastqc.zip")
+        (fd, fn) = tempfile.mkstemp()
+        try:
+            opts = {
+                "inputs": [fqc_zip],
+                "job_uuid": "fakeuuid",
+                "output": fn,
+                "export_format": "sqlite",
+                "sections": ["fastqc_summary,Basic Statistics"],
+            }
+            obj = ExportFastqc(options=opts)
+            with captured_output() as (_, _):
+                obj.do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                res = set(get_table_list(cur))
+                self.assertEqual(
+                    res, set(["fastqc_summary", "fastqc_data_Basic_Statistics"])
+                )
+        finally:
+            cleanup_files(fn)
+
+    def test_do_work_wide(self):
+        fqc_zip = get_test_data_path("SRR1067505_1_fastqc.zip")
+        (fd, fn) = tempfile.mkstemp()
+        try:
+            opts = {
+                "inputs": [fqc_zip],
+                "job_uuid": "fakeuuid",
+                "output": fn,
+                "export_format": "sqlite",
+                "sections": ["Basic Statistics"],
+                "layout": "wide",
+            }
+            with captured_output() as (_, _):
+                ExportFastqc(options=opts).do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                self.assertEqual(
+                    set(get_table_list(cur)), set(["fastqc_data_Basic_Statistics_wide"])
+                )
+                res = cur.execute(
+                    'SELECT fastqc_zip, "Total Sequences", "%GC" '
+                    "FROM fastqc_data_Basic_Statistics_wide"
+                ).fetchall()
+            conn.close()
+            self.assertEqual(len(res), 1)
+            self.assertEqual(res[0][0], "SRR1067505_1_fastqc.zip")
+            self.assertIsInstance(res[0][1], int)
+            self.assertIsInstance(res[0][2], int)
+        finally:
+            cleanup_files(fn)
+
+    def test_do_work_exclude_sections(self):
+        fqc_zip = get_test_data_path("SRR1067505_1_fastqc.zip")
+        (fd, fn) = tempfile.mkstemp()
+        try:
+            opts = {
+                "inputs": [fqc_zip],
+                "job_uuid": "fakeuuid",
+                "output": fn,
+                "export_format": "sqlite",
+                "exclude_sections": ["fastqc_summary", "Per_tile_sequence_quality"],
+            }
+            obj = ExportFastqc(options=opts)
+            with captured_output() as (_, _):
+                obj.do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                res = set(get_table_list(cur))
+                self.assertNotIn("fastqc_summary", res)
+                self.assertNotIn("fastqc_data_Per_tile_sequence_quality", res)
+                self.assertIn("fastqc_data_Kmer_Content", res)
+                dedup = cur.execute(
+                    "SELECT Value FROM fastqc_data_Basic_Statistics "
+                    "WHERE Measure = 'Total Deduplicated Percentage'"
+                ).fetchone()
+                self.assertIsNotNone(dedup[0])
+        finally:
+            cleanup_files(fn)
+
+    def test_do_work_sections_basic_statistics(self):
+        fqc_zip = get_test_data_path("SRR1067505_1_fastqc.zip")
+        query = (
+            "SELECT Measure, Value FROM fastqc_data_Basic_Statistics "
+            "ORDER BY Measure"
+        )
+        rows = []
+        for extra in (
+            {},
+            {"sections": ["Basic_Statistics"]},
+            {"exclude_sections": ["Sequence_Duplication_Levels"]},
+        ):
+            (fd, fn) = tempfile.mkstemp()
+            try:
+                opts = {
+                    "inputs": [fqc_zip],
+                    "job_uuid": "fakeuuid",
+                    "output": fn,
+                    "export_format": "sqlite",
+                }
+                opts.update(extra)
+                with captured_output() as (_, _):
+                    ExportFastqc(options=opts).do_work()
+                with sqlite3.connect(fn) as conn:
+                    rows.append(conn.execute(query).fetchall())
+                conn.close()
+            finally:
+                cleanup_files(fn)
+        self.assertIn(("Total Deduplicated Percentage", "91.78842860607058"), rows[0])
+        self.assertEqual(rows[1], rows[0])
+        self.assertEqual(rows[2], rows[0])
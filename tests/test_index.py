@@ -0,0 +1,49 @@
+"""Tests for `bio_qcmetrics_tool.commands.index`"""
+import sqlite3
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.commands.index import BuildIndexes
+from bio_qcmetrics_tool.modules.star import ExportStarStats
+from tests.utils import cleanup_files, get_test_data_path
+
+
+class TestBuildIndexes(unittest.TestCase):
+    def test_do_work(self):
+        (fd, fn) = tempfile.mkstemp()
+        opts = {
+            "final_log_inputs": [get_test_data_path("star.log.final.out")],
+            "gene_counts_inputs": [get_test_data_path("test_star_counts.txt")],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": ["fake.bam"],
+            "job_uuid": "fakeuuid",
+            "defer_indexes": True,
+        }
+        try:
+            ExportStarStats(options=opts).do_work()
+            with sqlite3.connect(fn) as conn:
+                res = conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'star_stats_key'"
+                ).fetchall()
+                self.assertEqual(res, [])
+            conn.close()
+
+            created = BuildIndexes(options={"output": fn, "unique": True}).do_work()
+            self.assertEqual(
+                set(created),
+                set(
+                    [
+                        "star_stats_key",
+                        "star_stats_bam",
+                        "star_gene_counts_key",
+                        "star_gene_counts_bam",
+                    ]
+                ),
+            )
+            with sqlite3.connect(fn) as conn:
+                tables = conn.execute("SELECT tbl FROM sqlite_stat1").fetchall()
+                self.assertIn(("star_stats",), tables)
+            conn.close()
+        finally:
+            cleanup_files(fn)
@@ -0,0 +1,110 @@
+"""Tests for journaled exports with `--journal` and `--resume`"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from bio_qcmetrics_tool.__main__ import main
+from bio_qcmetrics_tool.modules.picard import ExportPicardMetrics
+from tests.utils import get_test_data_path
+
+PICARD = "CTC-1-AA-B2.star.bam.rnaseqmetrics.txt"
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.db")
+        self.inputs = []
+        for name in ["a", "b", "c"]:
+            path = os.path.join(self.tmpdir, name + ".rnaseqmetrics.txt")
+            shutil.copy(get_test_data_path(PICARD), path)
+            self.inputs.append(path)
+        self.bad = os.path.join(self.tmpdir, "bad.rnaseqmetrics.txt")
+        with open(get_test_data_path(PICARD), "rt") as fh:
+            data = fh.read().replace("picard.analysis.rnaseqmetrics", "picard.Nope")
+        with open(self.bad, "wt") as fh:
+            fh.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_export(self, inputs, *args):
+        argv = ["export", "picardmetrics", "-j", "job", "--derived_from_file", "x.bam"]
+        for path in inputs:
+            argv.extend(["-i", path])
+        main(argv + ["--export_format", "sqlite", "-o", self.output] + list(args))
+
+    def query(self, sql):
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(sql).fetchall()
+        conn.close()
+        return res
+
+    def test_quarantine(self):
+        self.run_export([self.inputs[0], self.bad, self.inputs[1]], "--journal")
+        self.assertEqual(
+            sorted(i[0] for i in self.query("SELECT input FROM qc_journal")),
+            sorted(self.inputs[:2]),
+        )
+        self.assertEqual(
+            self.query("SELECT tool, input, error_type FROM qc_quarantine"),
+            [("picardmetrics", self.bad, "ClassNotFoundException")],
+        )
+        self.assertEqual(
+            self.query("SELECT DISTINCT picard_metrics FROM picard_RnaSeqMetrics"),
+            [(os.path.basename(self.inputs[0]),), (os.path.basename(self.inputs[1]),)],
+        )
+        self.assertIn(
+            ("picard_RnaSeqMetrics_key",),
+            self.query("SELECT name FROM sqlite_master WHERE type = 'index'"),
+        )
+
+    def test_resume(self):
+        # The run is killed while exporting the second input
+        do_work = ExportPicardMetrics.do_work
+        calls = []
+
+        def crash(obj):
+            calls.append(obj.options["inputs"])
+            if len(calls) == 2:
+                raise KeyboardInterrupt()
+            return do_work(obj)
+
+        with mock.patch.object(ExportPicardMetrics, "do_work", crash):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_export(self.inputs, "--journal")
+        self.assertEqual(len(self.query("SELECT * FROM qc_journal")), 1)
+        counts = self.query(
+            "SELECT picard_metrics, COUNT(*) FROM picard_RnaSeqMetrics "
+            "GROUP BY picard_metrics"
+        )
+        self.assertEqual([i[0] for i in counts], [os.path.basename(self.inputs[0])])
+
+        calls = []
+        with mock.patch.object(
+            ExportPicardMetrics,
+            "do_work",
+            lambda obj: calls.append(obj.options["inputs"]) or do_work(obj),
+        ):
+            self.run_export(self.inputs + [self.bad], "--resume")
+        self.assertEqual(calls, [[self.inputs[1]], [self.inputs[2]], [self.bad]])
+        self.assertEqual(
+            self.query(
+                "SELECT picard_metrics, COUNT(*) FROM picard_RnaSeqMetrics "
+                "GROUP BY picard_metrics"
+            ),
+            [(os.path.basename(i), counts[0][1]) for i in self.inputs],
+        )
+
+        # Finished and quarantined inputs are not parsed again
+        calls = []
+        with mock.patch.object(
+            ExportPicardMetrics,
+            "do_work",
+            lambda obj: calls.append(obj.options["inputs"]) or do_work(obj),
+        ):
+            self.run_export(self.inputs + [self.bad], "--resume")
+        self.assertEqual(calls, [])
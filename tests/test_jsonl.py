@@ -0,0 +1,150 @@
+"""Tests for the jsonl export format"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.modules.star import ExportStarStats
+from bio_qcmetrics_tool.utils.jsonl import JsonlWriter, clean_value
+from tests.utils import captured_output, get_test_data_path
+
+
+class TestJsonl(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_clean_value(self):
+        self.assertIsNone(clean_value(float("nan")))
+        self.assertIsNone(clean_value(np.float64("inf")))
+        self.assertEqual(clean_value(np.int64(3)), 3)
+        self.assertIsInstance(clean_value(np.int64(3)), int)
+        self.assertEqual(clean_value("a"), "a")
+
+    def test_writer(self):
+        with JsonlWriter(self.output) as writer:
+            writer.write("t", {"a": 1, "b": float("nan")})
+        with JsonlWriter(self.output) as writer:
+            writer.write("u", {"c": "x"})
+        with open(self.output, "rt") as fh:
+            lines = [json.loads(line) for line in fh]
+        self.assertEqual(
+            lines,
+            [
+                {"table": "t", "row": {"a": 1, "b": None}},
+                {"table": "u", "row": {"c": "x"}},
+            ],
+        )
+
+    def test_export_to_file(self):
+        opts = {
+            "final_log_inputs": [get_test_data_path("star.log.final.out")],
+            "gene_counts_inputs": [get_test_data_path("test_star_counts.txt")],
+            "export_format": "jsonl",
+            "output": self.output,
+            "bam": ["x.bam"],
+            "job_uuid": "job",
+        }
+        ExportStarStats(options=opts).do_work()
+        with open(self.output, "rt") as fh:
+            lines = [json.loads(line) for line in fh]
+        tables = set(i["table"] for i in lines)
+        self.assertEqual(tables, set(["star_stats", "star_gene_counts"]))
+        stats = [i["row"] for i in lines if i["table"] == "star_stats"]
+        self.assertIn(
+            {
+                "category": "uniquely_mapped_percent",
+                "value": 79.49,
+                "star_file": "star.log.final.out",
+                "bam": "x.bam",
+                "job_uuid": "job",
+            },
+            stats,
+        )
+
+    def test_export_to_stdout(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "jsonl",
+            "output": "-",
+            "bam": "x.bam",
+            "job_uuid": "job",
+        }
+        with captured_output() as (stdout, _):
+            ExportSamtoolsFlagstats(options=opts).do_work()
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertTrue(lines)
+        self.assertTrue(all(i["table"] == "samtools_flagstat" for i in lines))
+        self.assertFalse(os.path.exists("-"))
+
+    def test_export_many_formats(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "sqlite,jsonl",
+            "output": os.path.join(self.tmpdir, "out.db"),
+            "bam": "x.bam",
+            "job_uuid": "job",
+        }
+        obj = ExportSamtoolsFlagstats(options=opts)
+        self.assertEqual(obj.output_path("sqlite"), opts["output"])
+        self.assertEqual(obj.output_path("jsonl"), self.output)
+        obj.do_work()
+
+        with open(self.output, "rt") as fh:
+            lines = [json.loads(line) for line in fh]
+        with sqlite3.connect(opts["output"]) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM samtools_flagstat").fetchone()
+        conn.close()
+        self.assertEqual(
+            len([i for i in lines if i["table"] == "samtools_flagstat"]), res[0]
+        )
+
+        obj.options["output"] = "-"
+        with self.assertRaises(ValueError):
+            obj.output_path("sqlite")
+
+    def test_export_streams_each_input(self):
+        inputs = []
+        for name in ["a.flagstat", "b.flagstat"]:
+            inputs.append(os.path.join(self.tmpdir, name))
+            shutil.copy(get_test_data_path("samtools.flagstat.log.txt"), inputs[-1])
+        opts = {
+            "inputs": inputs,
+            "export_format": "jsonl",
+            "output": self.output,
+            "bam": "x.bam",
+            "job_uuid": "job",
+        }
+        obj = ExportSamtoolsFlagstats(options=opts)
+        written = []
+        open_input = obj.open_input
+
+        def tracked(path, *args, **kwargs):
+            if os.path.exists(self.output):
+                with open(self.output, "rt") as fh:
+                    written.append((path, len(fh.readlines())))
+            else:
+                written.append((path, 0))
+            return open_input(path, *args, **kwargs)
+
+        obj.open_input = tracked
+        obj.do_work()
+
+        self.assertEqual(written[0], (inputs[0], 0))
+        self.assertEqual(written[1][0], inputs[1])
+        self.assertGreater(written[1][1], 0)
+        with open(self.output, "rt") as fh:
+            lines = [json.loads(line) for line in fh]
+        self.assertEqual(len(lines), 2 * written[1][1])
+        self.assertEqual(
+            [i["row"]["flagstat_file"] for i in lines],
+            ["a.flagstat"] * written[1][1] + ["b.flagstat"] * written[1][1],
+        )
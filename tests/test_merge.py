@@ -0,0 +1,206 @@
+"""Tests for `bio_qcmetrics_tool.commands.merge`"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from bio_qcmetrics_tool.commands.merge import MergeOutputs, merge_dbs
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.modules.star import ExportStarStats
+from bio_qcmetrics_tool.utils import sketch
+from tests.utils import get_table_list, get_test_data_path
+
+
+class TestMergeOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "merged.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_flagstat_db(self, idx, job_uuid=None):
+        fn = os.path.join(self.tmpdir, "job{0}.db".format(idx))
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake{0}.bam".format(idx),
+            "job_uuid": job_uuid or "job{0}".format(idx),
+        }
+        ExportSamtoolsFlagstats(options=opts).do_work()
+        return fn
+
+    def make_star_db(self, idx, job_uuid=None):
+        job_uuid = job_uuid or "star{0}".format(idx)
+        fn = os.path.join(self.tmpdir, "{0}.db".format(job_uuid))
+        opts = {
+            "final_log_inputs": [get_test_data_path("star.log.final.out")],
+            "gene_counts_inputs": [],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": ["fake{0}.bam".format(idx)],
+            "job_uuid": job_uuid,
+        }
+        ExportStarStats(options=opts).do_work()
+        return fn
+
+    def count(self, table, fn=None):
+        with sqlite3.connect(fn or self.output) as conn:
+            return conn.execute("SELECT COUNT(*) FROM {0}".format(table)).fetchone()[0]
+
+    def test_merge_dbs(self):
+        sources = [self.make_flagstat_db(i) for i in range(12)]
+        sources.append(self.make_star_db(0))
+        per_job = self.count("samtools_flagstat", sources[0])
+
+        merge_dbs(self.output, sources)
+        with sqlite3.connect(self.output) as conn:
+            tables = set(get_table_list(conn.cursor()))
+        self.assertEqual(
+            tables, set(["samtools_flagstat", "star_stats", "sample_qc_summary"])
+        )
+        self.assertEqual(self.count("samtools_flagstat"), 12 * per_job)
+
+        # Merging again skips job_uuid/source pairs already present
+        merge_dbs(self.output, sources[:3])
+        self.assertEqual(self.count("samtools_flagstat"), 12 * per_job)
+
+        merge_dbs(self.output, sources[:3], dedup=False)
+        self.assertEqual(self.count("samtools_flagstat"), 15 * per_job)
+
+    def test_merge_sample_summary(self):
+        flagstat = self.make_flagstat_db(0)
+        star = self.make_star_db(0, job_uuid="job0")
+        # Another job with a bam of the same name
+        other = self.make_star_db(0)
+        merge_dbs(self.output, [flagstat, star, other])
+        merge_dbs(self.output, [other])
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(
+                "SELECT job_uuid, bam, flagstat_job_uuid, star_job_uuid "
+                "FROM sample_qc_summary ORDER BY job_uuid"
+            ).fetchall()
+        self.assertEqual(
+            res,
+            [
+                ("job0", "fake0.bam", "job0", "job0"),
+                ("star0", "fake0.bam", None, "star0"),
+            ],
+        )
+
+    def test_merge_schema_growth(self):
+        first = self.make_flagstat_db(0)
+        second = self.make_flagstat_db(1)
+        with sqlite3.connect(second) as conn:
+            conn.execute("ALTER TABLE samtools_flagstat ADD COLUMN extra TEXT")
+            conn.execute("UPDATE samtools_flagstat SET extra = 'x'")
+
+        merge_dbs(self.output, [first, second])
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(
+                "SELECT job_uuid, COUNT(extra) FROM samtools_flagstat "
+                "GROUP BY job_uuid ORDER BY job_uuid"
+            ).fetchall()
+        per_job = self.count("samtools_flagstat", first)
+        self.assertEqual(res, [("job0", 0), ("job1", per_job)])
+
+    def test_merge_journal(self):
+        sources = []
+        for idx in range(2):
+            fn = os.path.join(self.tmpdir, "journal{0}.db".format(idx))
+            opts = {
+                "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+                "export_format": "sqlite",
+                "output": fn,
+                "bam": "fake.bam",
+                "job_uuid": "job0",
+                "journal": True,
+            }
+            ExportSamtoolsFlagstats(options=opts).run()
+            sources.append(fn)
+
+        merge_dbs(self.output, sources)
+        merge_dbs(self.output, sources[:1])
+        self.assertEqual(self.count("qc_journal"), 1)
+        self.assertEqual(self.count("qc_quarantine"), 0)
+        self.assertEqual(
+            self.count("samtools_flagstat"), self.count("samtools_flagstat", sources[0])
+        )
+
+    def test_merge_sketches(self):
+        values = np.random.default_rng(0).normal(50, 10, 3000)
+        sources = []
+        for idx, chunk in enumerate(np.array_split(values, 3)):
+            fn = os.path.join(self.tmpdir, "sketch{0}.db".format(idx))
+            with sqlite3.connect(fn) as conn:
+                sketch.update_sketches(conn, {"x": chunk, "y": [float(idx)]})
+            conn.close()
+            sources.append(fn)
+
+        merge_dbs(self.output, sources[:1])
+        merge_dbs(self.output, sources[1:])
+        with sqlite3.connect(self.output) as conn:
+            x = sketch.get_sketch(conn, "x")
+            y = sketch.get_sketch(conn, "y")
+        conn.close()
+        self.assertEqual(x.count, len(values))
+        self.assertAlmostEqual(x.mean, values.mean())
+        self.assertAlmostEqual(x.variance, values.var(ddof=1))
+        self.assertAlmostEqual(x.digest.quantile(0.5), np.median(values), delta=0.5)
+        self.assertEqual((y.count, y.mean, y.digest.max), (3, 1.0, 2.0))
+
+    def test_merge_summary_sketches(self):
+        sources = []
+        for idx in range(2):
+            fn = os.path.join(self.tmpdir, "job{0}.db".format(idx))
+            opts = {
+                "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+                "export_format": "sqlite",
+                "output": fn,
+                "bam": "fake.bam",
+                "job_uuid": "job{0}".format(idx),
+                "sketches": True,
+            }
+            ExportSamtoolsFlagstats(options=opts).do_work()
+            sources.append(fn)
+
+        merge_dbs(self.output, sources)
+        # Samples already in the summary are not added to the sketches again
+        merge_dbs(self.output, sources[:1])
+        merge_dbs(self.output, sources)
+        with sqlite3.connect(self.output) as conn:
+            counts = conn.execute("SELECT count FROM qc_metric_sketches").fetchall()
+        conn.close()
+        self.assertTrue(counts)
+        self.assertTrue(all(row[0] == 2 for row in counts))
+
+    def test_do_work_tree(self):
+        sources = [self.make_flagstat_db(i) for i in range(9)]
+        # Duplicate of job0 in another chunk
+        sources.append(self.make_flagstat_db(9, job_uuid="job0"))
+        list_file = os.path.join(self.tmpdir, "inputs.txt")
+        with open(list_file, "wt") as fh:
+            fh.write("\n".join(sources[2:]) + "\n")
+
+        obj = MergeOutputs(
+            options={
+                "inputs": sources[:2],
+                "input_list": list_file,
+                "output": self.output,
+                "threads": 2,
+                "chunk_size": 3,
+            }
+        )
+        obj.do_work()
+        per_job = self.count("samtools_flagstat", sources[0])
+        self.assertEqual(self.count("samtools_flagstat"), 9 * per_job)
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)),
+            sorted(
+                [os.path.basename(i) for i in sources] + ["inputs.txt", "merged.db"]
+            ),
+        )
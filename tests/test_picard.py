@@ -118,7 +118,13 @@ class TestConcreteMetrics(unittest.TestCase):
             "derived_from_file": "bam",
             "job_uuid": jid,
         }
-        exp_tables = set(["picard_RnaSeqMetrics", "picard_RnaSeqMetrics_histogram"])
+        exp_tables = set(
+            [
+                "picard_RnaSeqMetrics",
+                "picard_RnaSeqMetrics_histogram",
+                "sample_qc_summary",
+            ]
+        )
         try:
             obj = ExportPicardMetrics(options=opts)
             obj.do_work()
@@ -0,0 +1,162 @@
+"""Tests for the postgres export format.
+
+The export tests need a throwaway database, e.g., from
+``docker run -e POSTGRES_PASSWORD=x -p 5432:5432 postgres`` and
+``BIO_QCMETRICS_TEST_POSTGRES_DSN=postgresql://postgres:x@localhost/postgres``.
+They are skipped when the variable is not set.
+"""
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.utils import postgres
+from tests.utils import get_test_data_path
+
+TEST_DSN = os.environ.get("BIO_QCMETRICS_TEST_POSTGRES_DSN")
+
+
+class TestPostgresUtils(unittest.TestCase):
+    def test_column_type(self):
+        df = pd.DataFrame(
+            {"i": [1, 2], "f": [1.5, np.nan], "b": [True, False], "s": ["a", None]}
+        )
+        self.assertEqual(
+            [postgres.column_type(df[c].dtype) for c in df.columns],
+            ["bigint", "double precision", "boolean", "text"],
+        )
+        self.assertEqual(postgres.value_type(np.int64(3)), "bigint")
+        self.assertEqual(postgres.value_type("x"), "text")
+
+    def test_frame_types(self):
+        df = pd.DataFrame(
+            {
+                "i": [1, 2],
+                "none": pd.Series([None, None], dtype=object),
+                "mixed": pd.Series([1, "NA"], dtype=object),
+                "ints": pd.Series([1, None], dtype=object),
+            }
+        )
+        self.assertEqual(
+            postgres.frame_types(df),
+            {"i": "bigint", "none": None, "mixed": "text", "ints": "bigint"},
+        )
+
+    def test_widened_type(self):
+        self.assertEqual(
+            postgres.widened_type("bigint", "double precision"), "double precision"
+        )
+        self.assertEqual(postgres.widened_type("bigint", "text"), "text")
+        self.assertEqual(postgres.widened_type("double precision", "text"), "text")
+        self.assertIsNone(postgres.widened_type("double precision", "bigint"))
+        self.assertIsNone(postgres.widened_type("text", "bigint"))
+        self.assertIsNone(postgres.widened_type("bigint", None))
+
+    def test_csv_chunks(self):
+        df = pd.DataFrame({"f": [1.5, np.nan, 3.0], "s": ["a,b", "", 7]}, dtype=object)
+        types = {"f": "double precision", "s": "text"}
+        rows = list(postgres.iter_rows(df, types))
+        self.assertEqual(rows, [(1.5, "a,b"), (None, ""), (3.0, "7")])
+        chunks = list(postgres.csv_chunks(rows, chunk_rows=2))
+        self.assertEqual(chunks, ['1.5,"a,b"\n\\N,\n', "3.0,7\n"])
+
+    def test_output_path(self):
+        opts = {"export_format": "sqlite,postgres", "output": "out.db"}
+        obj = ExportSamtoolsFlagstats(options=opts)
+        with self.assertRaises(ValueError):
+            obj.output_path("postgres")
+        opts["postgres_dsn"] = "postgresql://localhost/qc"
+        self.assertEqual(obj.output_path("postgres"), opts["postgres_dsn"])
+        self.assertEqual(obj.output_path("sqlite"), "out.db")
+
+
+@unittest.skipUnless(
+    TEST_DSN and postgres.psycopg, "BIO_QCMETRICS_TEST_POSTGRES_DSN is not set"
+)
+class TestPostgresExport(unittest.TestCase):
+    def setUp(self):
+        self.pool = postgres.DEFAULT_POOL
+        with self.pool.connection(TEST_DSN) as conn:
+            for table in ["samtools_flagstat", "sample_qc_summary", "widen"]:
+                conn.execute("DROP TABLE IF EXISTS {0}".format(table))
+
+    def tearDown(self):
+        self.pool.close()
+
+    def export(self, copy_format):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "postgres",
+            "output": TEST_DSN,
+            "postgres_copy_format": copy_format,
+            "bam": "x.bam",
+            "job_uuid": "job-{0}".format(copy_format),
+        }
+        ExportSamtoolsFlagstats(options=opts).do_work()
+
+    def test_export(self):
+        self.export("csv")
+        self.export("binary")
+        with self.pool.connection(TEST_DSN) as conn:
+            counts = conn.execute(
+                "SELECT job_uuid, COUNT(*) FROM samtools_flagstat GROUP BY job_uuid "
+                "ORDER BY job_uuid"
+            ).fetchall()
+            indexes = conn.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s",
+                ("samtools_flagstat",),
+            ).fetchall()
+            summary = conn.execute(
+                "SELECT job_uuid, bam, flagstat_job_uuid FROM sample_qc_summary "
+                "ORDER BY job_uuid"
+            ).fetchall()
+        self.assertEqual([i[0] for i in counts], ["job-binary", "job-csv"])
+        self.assertEqual(counts[0][1], counts[1][1])
+        self.assertIn(("samtools_flagstat_key",), indexes)
+        self.assertEqual(
+            summary,
+            [("job-binary", "x.bam", "job-binary"), ("job-csv", "x.bam", "job-csv")],
+        )
+
+    def test_copy_widens_integers(self):
+        for copy_format in postgres.COPY_FORMATS:
+            with self.pool.connection(TEST_DSN) as conn:
+                conn.execute("DROP TABLE IF EXISTS widen")
+                postgres.copy_frame(
+                    conn, "widen", pd.DataFrame({"pct": [0], "n": [1]}), copy_format
+                )
+            with self.pool.connection(TEST_DSN) as conn:
+                postgres.copy_frame(
+                    conn, "widen", pd.DataFrame({"pct": [0.53], "n": [2]}), copy_format
+                )
+            with self.pool.connection(TEST_DSN) as conn:
+                rows = conn.execute("SELECT pct, n FROM widen ORDER BY n").fetchall()
+                types = postgres.get_table_columns(conn, "widen")
+            self.assertEqual(rows, [(0.0, 1), (0.53, 2)])
+            self.assertEqual(types, {"pct": "double precision", "n": "bigint"})
+
+    def test_copy_widens_to_text(self):
+        for copy_format in postgres.COPY_FORMATS:
+            with self.pool.connection(TEST_DSN) as conn:
+                conn.execute("DROP TABLE IF EXISTS widen")
+                postgres.copy_frame(
+                    conn, "widen", pd.DataFrame({"v": [1], "n": [1]}), copy_format
+                )
+                postgres.upsert_sample_summary(conn, {"x.bam": {"pct": 0.5}}, "job")
+            with self.pool.connection(TEST_DSN) as conn:
+                df = pd.DataFrame({"v": pd.Series(["NA", None], dtype=object)})
+                df["n"] = [2, 3]
+                postgres.copy_frame(conn, "widen", df, copy_format)
+                postgres.upsert_sample_summary(conn, {"y.bam": {"pct": "NA"}}, "job")
+            with self.pool.connection(TEST_DSN) as conn:
+                rows = conn.execute("SELECT v, n FROM widen ORDER BY n").fetchall()
+                types = postgres.get_table_columns(conn, "widen")
+                summary = conn.execute(
+                    "SELECT pct FROM sample_qc_summary ORDER BY bam"
+                ).fetchall()
+                conn.execute("DROP TABLE sample_qc_summary")
+            self.assertEqual(rows, [("1", 1), ("NA", 2), (None, 3)])
+            self.assertEqual(types, {"v": "text", "n": "bigint"})
+            self.assertEqual(summary, [("0.5",), ("NA",)])
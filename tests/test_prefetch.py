@@ -0,0 +1,127 @@
+"""Tests for `bio_qcmetrics_tool.utils.prefetch`"""
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.modules.star import ExportStarStats
+from bio_qcmetrics_tool.utils.parse import open_buffer
+from bio_qcmetrics_tool.utils.prefetch import (
+    export_async,
+    export_many_async,
+    prefetch,
+    prefetch_files,
+)
+from tests.utils import get_test_data_path
+
+
+class TestPrefetch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_prefetch_files(self):
+        small = os.path.join(self.tmpdir, "small.txt")
+        large = os.path.join(self.tmpdir, "large.txt")
+        with open(small, "wb") as fh:
+            fh.write(b"abc")
+        with open(large, "wb") as fh:
+            fh.write(b"x" * 100)
+
+        missing = os.path.join(self.tmpdir, "missing.txt")
+        res = asyncio.run(
+            prefetch_files(
+                [small, large, self.tmpdir, missing, small], workers=2, max_size=10
+            )
+        )
+        self.assertEqual(res, {small: b"abc"})
+        self.assertEqual(prefetch([]), {})
+
+    def test_open_buffer(self):
+        data = gzip.compress(b"line1\nline2\n")
+        with open_buffer(data, "rt") as fh:
+            self.assertEqual(fh.readlines(), ["line1\n", "line2\n"])
+        with open_buffer(b"raw", "rb") as fh:
+            self.assertEqual(fh.read(), b"raw")
+
+    def test_exporter_reads_prefetched(self):
+        flagstat = get_test_data_path("samtools.flagstat.log.txt")
+        with open(flagstat, "rb") as fh:
+            data = fh.read()
+        # The path does not exist, so it can only be read from memory
+        missing = os.path.join(self.tmpdir, "x.flagstat")
+        opts = {
+            "inputs": [missing],
+            "export_format": "sqlite",
+            "output": self.output,
+            "bam": "x.bam",
+            "job_uuid": "job",
+        }
+        obj = ExportSamtoolsFlagstats(options=opts)
+        obj.prefetched[missing] = data
+        obj.do_work()
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM samtools_flagstat").fetchone()
+        conn.close()
+        self.assertGreater(res[0], 0)
+
+    def test_prefetch_option(self):
+        opts = {
+            "final_log_inputs": [get_test_data_path("star.log.final.out")],
+            "gene_counts_inputs": [get_test_data_path("test_star_counts.txt")],
+            "export_format": "sqlite",
+            "output": self.output,
+            "bam": ["x.bam"],
+            "job_uuid": "job",
+            "prefetch": 4,
+        }
+        obj = ExportStarStats(options=opts)
+        obj.do_work()
+        self.assertEqual(
+            sorted(obj.prefetched),
+            sorted(opts["final_log_inputs"] + opts["gene_counts_inputs"]),
+        )
+
+    def test_export_many_async(self):
+        exporters = []
+        for i in range(3):
+            opts = {
+                "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+                "export_format": "sqlite",
+                "output": self.output,
+                "bam": "x{0}.bam".format(i),
+                "job_uuid": "job{0}".format(i),
+            }
+            exporters.append(ExportSamtoolsFlagstats(options=opts))
+
+        asyncio.run(export_many_async(exporters, workers=2))
+        for obj in exporters:
+            self.assertEqual(len(obj.prefetched), 1)
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(
+                "SELECT COUNT(DISTINCT job_uuid) FROM samtools_flagstat"
+            ).fetchone()
+        conn.close()
+        self.assertEqual(res, (3,))
+
+    def test_export_async_journal(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "sqlite",
+            "output": self.output,
+            "bam": "x.bam",
+            "job_uuid": "job",
+            "journal": True,
+        }
+        asyncio.run(export_async(ExportSamtoolsFlagstats(options=opts), workers=2))
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT input FROM qc_journal").fetchall()
+        conn.close()
+        self.assertEqual(res, [(opts["inputs"][0],)])
@@ -3,6 +3,7 @@ import sqlite3
 import tempfile
 import unittest
 
+from bio_qcmetrics_tool.modules.exceptions import DuplicateInputException
 from bio_qcmetrics_tool.modules.readgroups import ExportReadgroup
 from tests.utils import cleanup_files, get_table_list, get_test_data_path
 
@@ -34,3 +35,89 @@ class TestExportReadgroup(unittest.TestCase):
                 self.assertEqual(tables, exp_tables)
         finally:
             cleanup_files(fn)
+
+    def test_do_work_ndjson(self):
+        (fd, fn) = tempfile.mkstemp()
+        ifil = get_test_data_path("readgroups.ndjson")
+        opts = {
+            "inputs": [ifil],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "fakeuuid",
+        }
+        try:
+            obj = ExportReadgroup(options=opts)
+            obj.do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                res = cur.execute(
+                    "SELECT DISTINCT ID FROM readgroups ORDER BY ID"
+                ).fetchall()
+                self.assertEqual(res, [("fake_id_1",), ("fake_id_2",)])
+        finally:
+            cleanup_files(fn)
+
+    def test_do_work_wide(self):
+        (fd, fn) = tempfile.mkstemp()
+        opts = {
+            "inputs": [
+                get_test_data_path("readgroups.json"),
+                get_test_data_path("readgroups.ndjson"),
+            ],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "fakeuuid",
+            "layout": "wide",
+        }
+        try:
+            obj = ExportReadgroup(options=opts)
+            obj.do_work()
+
+            # Second export adds a new readgroup field
+            (afd, afn) = tempfile.mkstemp(suffix=".json")
+            with open(afn, "wt") as fh:
+                fh.write('[{"ID": "fake_id_3", "DS": "new_field"}]')
+            opts["inputs"] = [afn]
+            obj = ExportReadgroup(options=opts)
+            obj.do_work()
+
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                tables = set(get_table_list(cur))
+                self.assertEqual(tables, set(["readgroups_wide"]))
+                res = cur.execute(
+                    "SELECT ID, PU, CN, DS FROM readgroups_wide ORDER BY ID"
+                ).fetchall()
+                self.assertEqual(
+                    res,
+                    [
+                        ("fake_id", "fake_pu", "fake_cn", None),
+                        ("fake_id_1", "fake_pu_1", None, None),
+                        ("fake_id_2", "fake_pu_2", "fake_cn", None),
+                        ("fake_id_3", None, None, "new_field"),
+                    ],
+                )
+        finally:
+            cleanup_files([fn, afn])
+
+    def test_duplicate_readgroup(self):
+        (fd, fn) = tempfile.mkstemp()
+        ifil = get_test_data_path("readgroups.ndjson")
+        (afd, afn) = tempfile.mkstemp(suffix=".json")
+        with open(afn, "wt") as fh:
+            fh.write('{"ID": "fake_id_1"}')
+        opts = {
+            "inputs": [ifil, afn],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "fakeuuid",
+        }
+        try:
+            obj = ExportReadgroup(options=opts)
+            with self.assertRaises(DuplicateInputException):
+                obj.do_work()
+        finally:
+            cleanup_files([fn, afn])
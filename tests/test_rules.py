@@ -0,0 +1,188 @@
+"""Tests for the QC gating rules of `bio_qcmetrics_tool.utils.rules`"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bio_qcmetrics_tool import api
+from bio_qcmetrics_tool.modules.fastqc import ExportFastqc
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.utils import rules
+from tests.utils import captured_output, get_test_data_path
+
+RULES = """
+[[rules]]
+name = "flagstat_mapped"
+table = "samtools_flagstat_wide"
+check = "mapped_passed / total_passed >= 0.99"
+value = "mapped_passed / total_passed"
+
+[[rules]]
+name = "flagstat_duplicates"
+table = "samtools_flagstat_wide"
+check = "duplicates_passed > 0"
+severity = "warn"
+
+[[rules]]
+name = "fastqc_base_quality"
+table = "fastqc_summary"
+check = "`Per base sequence quality` != 'FAIL'"
+
+[[rules]]
+name = "star_unique_mapping"
+table = "star_stats"
+where = "category == 'uniquely_mapped_percent'"
+check = "value >= 70"
+"""
+
+
+class TestRules(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.db")
+        self.rules = os.path.join(self.tmpdir, "rules.toml")
+        with open(self.rules, "wt") as fh:
+            fh.write(RULES)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_rules(self, text):
+        path = os.path.join(self.tmpdir, "bad.toml")
+        with open(path, "wt") as fh:
+            fh.write(text)
+        return path
+
+    def test_load_rules(self):
+        loaded = rules.load_rules(self.rules)
+        self.assertEqual(
+            [i.name for i in loaded],
+            [
+                "flagstat_mapped",
+                "flagstat_duplicates",
+                "fastqc_base_quality",
+                "star_unique_mapping",
+            ],
+        )
+        self.assertEqual(loaded[1].severity, "warn")
+        for text in [
+            '[[rules]]\nname = "a"\ntable = "t"\n',
+            '[[rules]]\nname = "a"\ntable = "t"\ncheck = "x"\nbad = 1\n',
+            '[[rules]]\nname = "a"\ntable = "t"\ncheck = "x"\nseverity = "bad"\n',
+            '[[rules]]\nname = "a"\ntable = "t"\ncheck = "x"\n' * 2,
+            "[[rules]\n",
+            '[[rules]]\nname = "a"\ntable = "samtools_flagstats"\ncheck = "x"\n',
+        ]:
+            with self.assertRaises(rules.RuleError):
+                rules.load_rules(self.write_rules(text))
+
+    def test_known_tables(self):
+        tables = api.export_star(
+            job_uuid="job",
+            bam="x.bam",
+            final_log_inputs=get_test_data_path("star.log.final.out"),
+            gene_counts_inputs=get_test_data_path("test_star_counts.txt"),
+            layout="wide",
+        )
+        tables += api.export_picard(
+            inputs=get_test_data_path("CTC-1-AA-B2.star.bam.rnaseqmetrics.txt"),
+            job_uuid="job",
+        )
+        tables += api.export_tenx_barcode_metrics(
+            inputs=get_test_data_path("scrna.per_barcode_metrics.csv"),
+            job_uuid="job",
+            bam="x.bam",
+        )
+        names = [table.name for table in tables]
+        self.assertIn("star_stats_wide", names)
+        self.assertTrue(all(rules.is_known_table(name) for name in names), names)
+        self.assertFalse(rules.is_known_table(rules.FLAGS_TABLE))
+
+    def test_evaluate_rules(self):
+        n = 50000
+        df = pd.DataFrame(
+            {
+                "job_uuid": "job",
+                "bam": ["{0}.bam".format(i) for i in range(n)],
+                "star_file": "Log.final.out",
+                "category": "uniquely_mapped_percent",
+                "value": np.linspace(0, 100, n),
+            }
+        )
+        df.loc[0, "value"] = np.nan
+        flags = rules.evaluate_rules(
+            rules.load_rules(self.rules), {"star_stats": df, "other": df}
+        )
+        self.assertEqual(list(flags.columns), rules.FLAG_COLUMNS)
+        self.assertEqual(len(flags), n)
+        self.assertEqual(set(flags["rule"]), set(["star_unique_mapping"]))
+        self.assertEqual(set(flags["source_file"]), set(["Log.final.out"]))
+        self.assertEqual(int(flags["passed"].sum()), (df["value"] >= 70).sum())
+        self.assertFalse(flags["passed"][0])
+
+        bad = rules.Rule("bad", "star_stats", "missing_column > 1")
+        with self.assertRaises(rules.RuleError):
+            rules.evaluate_rules([bad], {"star_stats": df})
+
+    def test_export(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "sqlite",
+            "output": self.output,
+            "bam": "x.bam",
+            "job_uuid": "job",
+            "layout": "wide",
+            "rules": self.rules,
+        }
+        with self.assertLogs("gdc_qc_tool", "WARNING") as logs:
+            ExportSamtoolsFlagstats(options=opts).do_work()
+        self.assertIn("fastqc_base_quality (fastqc_summary)", logs.output[0])
+        opts = {
+            "inputs": [get_test_data_path("SRR1067505_1_fastqc.zip")],
+            "export_format": "sqlite",
+            "output": self.output,
+            "job_uuid": "job",
+            "rules": self.rules,
+        }
+        with captured_output() as (_, _):
+            ExportFastqc(options=opts).do_work()
+
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute(
+                "SELECT rule, severity, bam, source_file, passed, value "
+                "FROM qc_flags ORDER BY rule"
+            ).fetchall()
+        conn.close()
+        self.assertEqual(
+            res,
+            [
+                (
+                    "fastqc_base_quality",
+                    "fail",
+                    None,
+                    "SRR1067505_1_fastqc.zip",
+                    1,
+                    None,
+                ),
+                (
+                    "flagstat_duplicates",
+                    "warn",
+                    "x.bam",
+                    "samtools.flagstat.log.txt",
+                    0,
+                    None,
+                ),
+                (
+                    "flagstat_mapped",
+                    "fail",
+                    "x.bam",
+                    "samtools.flagstat.log.txt",
+                    1,
+                    11540643 / 11540659,
+                ),
+            ],
+        )
@@ -85,7 +85,7 @@ class TestExportSamtoolsFlagstats(unittest.TestCase):
             "bam": "fake.bam",
             "job_uuid": jid,
         }
-        exp_tables = set(["samtools_flagstat"])
+        exp_tables = set(["samtools_flagstat", "sample_qc_summary"])
         try:
             obj = ExportSamtoolsFlagstats(options=opts)
             obj.do_work()
@@ -96,6 +96,47 @@ class TestExportSamtoolsFlagstats(unittest.TestCase):
         finally:
             cleanup_files(fn)
 
+    def test_do_work_wide(self):
+        (fd, fn) = tempfile.mkstemp()
+        (afd, afn) = tempfile.mkstemp(suffix=".flagstat")
+        ifil = get_test_data_path("samtools.flagstat.log.txt")
+        with open(ifil, "rt") as fh, open(afn, "wt") as out:
+            out.writelines(line for line in fh if "mapped (" not in line)
+        opts = {
+            "inputs": [afn],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "a",
+            "layout": "wide",
+        }
+        try:
+            ExportSamtoolsFlagstats(options=opts).do_work()
+
+            # The full file adds the mapped columns
+            opts.update(inputs=[ifil], job_uuid="b")
+            ExportSamtoolsFlagstats(options=opts).do_work()
+
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                tables = set(get_table_list(cur))
+                res = cur.execute(
+                    "SELECT job_uuid, total_passed, mapped_passed "
+                    "FROM samtools_flagstat_wide ORDER BY job_uuid"
+                ).fetchall()
+                types = dict(
+                    (row[1], row[2])
+                    for row in cur.execute("PRAGMA table_info(samtools_flagstat_wide)")
+                )
+            conn.close()
+            self.assertEqual(
+                tables, set(["samtools_flagstat_wide", "sample_qc_summary"])
+            )
+            self.assertEqual(res, [("a", 11540659, None), ("b", 11540659, 11540643)])
+            self.assertEqual(types["mapped_passed"], "INTEGER")
+        finally:
+            cleanup_files([fn, afn])
+
 
 class TestExportSamtoolsIdxstats(unittest.TestCase):
     def test_init(self):
@@ -172,7 +213,7 @@ class TestExportExportSamtoolsStats(unittest.TestCase):
             "bam": "fake.bam",
             "job_uuid": jid,
         }
-        exp_tables = set(["samtools_stats"])
+        exp_tables = set(["samtools_stats", "sample_qc_summary"])
         try:
             obj = ExportSamtoolsStats(options=opts)
             obj.do_work()
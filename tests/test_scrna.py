@@ -1,10 +1,19 @@
 """Tests for `bio_qcmetrics_tool.modules.samtools`"""
+import gzip
 import sqlite3
 import tempfile
 import unittest
 
+import numpy as np
+import pandas as pd
+
 from bio_qcmetrics_tool.modules.exceptions import ParserException  # noqa: F401
-from bio_qcmetrics_tool.modules.scrna import ExportTenXScrnaMetrics
+from bio_qcmetrics_tool.modules.scrna import (
+    ExportTenXBarcodeMetrics,
+    ExportTenXMatrixMetrics,
+    ExportTenXScrnaMetrics,
+)
+from bio_qcmetrics_tool.modules.scrna.distribution import LogHistogram
 from tests.utils import cleanup_files, get_table_list, get_test_data_path
 
 
@@ -66,3 +75,174 @@ class TestExportScrnaMetrics(unittest.TestCase):
                 self.assertEqual(tables, exp_tables)
         finally:
             cleanup_files(fn)
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_quantiles(self):
+        values = np.random.default_rng(0).lognormal(7, 1, 100000).round()
+        hist = LogHistogram()
+        for chunk in np.array_split(values, 7):
+            hist.update(chunk)
+        self.assertEqual(hist.n, len(values))
+        self.assertAlmostEqual(hist.mean(), values.mean())
+        for res, exp in zip(
+            hist.quantiles([0.05, 0.5, 0.95]), np.quantile(values, [0.05, 0.5, 0.95])
+        ):
+            self.assertLess(abs(res - exp) / exp, 0.05)
+
+    def test_knee_points(self):
+        hist = LogHistogram()
+        hist.update([0, 0, 1, 100, 100, 5000])
+        points = hist.knee_points()
+        self.assertEqual([p[0] for p in points], [1, 3, 4, 6])
+        self.assertEqual(points[-1][1], 0.0)
+        self.assertEqual(sum(i[2] for i in hist.nonempty_bins()), 6)
+
+    def test_empty(self):
+        hist = LogHistogram()
+        self.assertEqual(hist.quantiles([0.5]), [None])
+        self.assertIsNone(hist.mean())
+        self.assertEqual(hist.knee_points(), [])
+
+
+class TestExportTenXBarcodeMetrics(unittest.TestCase):
+    def test_init(self):
+        cls = ExportTenXBarcodeMetrics(options={})
+        self.assertEqual(cls.name, "10x scrna barcode metrics")
+
+    def test__parse_barcodes(self):
+        ifil = get_test_data_path("scrna.per_barcode_metrics.csv")
+        obj = ExportTenXBarcodeMetrics(options={"chunksize": 17})
+        stats, histograms = obj._parse_barcodes(ifil)
+
+        df = pd.read_csv(ifil)
+        cells = df[df["is_cell"] == 1]
+        self.assertEqual(stats["n_barcodes"], 200)
+        self.assertEqual(stats["n_cells"], 40)
+        self.assertAlmostEqual(
+            stats["fraction_reads_in_cells"],
+            cells["gex_raw_reads"].sum() / df["gex_raw_reads"].sum(),
+        )
+        self.assertEqual(histograms[("umis", "cell")].n, 40)
+        self.assertEqual(
+            histograms[("umis", "cell")].max, cells["gex_umis_count"].max()
+        )
+        self.assertEqual(histograms[("genes", "barcode")].n, 200)
+
+    def test__parse_barcodes_missing_column(self):
+        ifil = get_test_data_path("scrna.per_barcode_metrics.csv")
+        obj = ExportTenXBarcodeMetrics(options={"umi_column": "umi"})
+        with self.assertRaises(ParserException):
+            obj._parse_barcodes(ifil)
+
+    def test_do_work(self):
+        (fd, fn) = tempfile.mkstemp()
+        ifil = get_test_data_path("scrna.per_barcode_metrics.csv")
+        opts = {
+            "inputs": [ifil],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "fakeuuid",
+        }
+        exp_tables = set(
+            [
+                "10x_scrna_barcode_stats",
+                "10x_scrna_barcode_summary",
+                "10x_scrna_barcode_histogram",
+                "10x_scrna_barcode_knee",
+            ]
+        )
+        try:
+            obj = ExportTenXBarcodeMetrics(options=opts)
+            obj.do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                tables = set(get_table_list(cur))
+                self.assertEqual(tables, exp_tables)
+                res = cur.execute(
+                    "SELECT SUM(n_barcodes) FROM [10x_scrna_barcode_histogram] "
+                    "WHERE metric = 'umis' AND population = 'barcode'"
+                ).fetchone()
+                self.assertEqual(res[0], 200)
+                res = cur.execute(
+                    "SELECT MAX(rank) FROM [10x_scrna_barcode_knee]"
+                ).fetchone()
+                self.assertEqual(res[0], 200)
+        finally:
+            cleanup_files(fn)
+
+
+class TestExportTenXMatrixMetrics(unittest.TestCase):
+    def load_dense(self, matrix_dir):
+        """Dense reference matrix for the small test dataset"""
+        with gzip.open(matrix_dir + "/matrix.mtx.gz", "rt") as fh:
+            lines = [i for i in fh if not i.startswith("%")]
+        nrows, ncols, _ = map(int, lines[0].split())
+        dense = np.zeros((nrows, ncols))
+        for line in lines[1:]:
+            r, c, v = line.split()
+            dense[int(r) - 1, int(c) - 1] = float(v)
+        return dense
+
+    def test_init(self):
+        cls = ExportTenXMatrixMetrics(options={})
+        self.assertEqual(cls.name, "10x scrna matrix metrics")
+
+    def test__parse_matrix_dir(self):
+        matrix_dir = get_test_data_path("filtered_feature_bc_matrix")
+        obj = ExportTenXMatrixMetrics(options={"chunksize": 7, "per_cell": True})
+        res = obj._parse_matrix_dir(matrix_dir)
+
+        # Last row is an antibody capture feature and is not counted
+        dense = self.load_dense(matrix_dir)[:-1]
+        total = dense.sum(axis=0)
+        mito = dense[[3, 7]].sum(axis=0)
+        self.assertEqual(res["stats"]["n_cells"], 6)
+        self.assertEqual(res["stats"]["n_mito_features"], 2)
+        self.assertEqual(len(res["barcodes"]), 6)
+        np.testing.assert_array_equal(res["cells"]["total_umis"], total)
+        np.testing.assert_array_equal(res["cells"]["n_genes"], (dense > 0).sum(axis=0))
+        np.testing.assert_allclose(
+            res["cells"]["pct_mito"][:5], 100.0 * mito[:5] / total[:5]
+        )
+        self.assertTrue(np.isnan(res["cells"]["pct_mito"][5]))
+
+    def test__parse_matrix_dir_missing(self):
+        obj = ExportTenXMatrixMetrics(options={})
+        with self.assertRaises(ParserException):
+            obj._parse_matrix_dir(tempfile.gettempdir())
+
+    def test_do_work(self):
+        (fd, fn) = tempfile.mkstemp()
+        matrix_dir = get_test_data_path("filtered_feature_bc_matrix")
+        opts = {
+            "inputs": [matrix_dir],
+            "export_format": "sqlite",
+            "output": fn,
+            "bam": "fake.bam",
+            "job_uuid": "fakeuuid",
+            "per_cell": True,
+        }
+        exp_tables = set(
+            [
+                "10x_scrna_cell_qc_stats",
+                "10x_scrna_cell_qc_summary",
+                "10x_scrna_cell_qc_histogram",
+                "10x_scrna_cell_qc",
+            ]
+        )
+        try:
+            obj = ExportTenXMatrixMetrics(options=opts)
+            obj.do_work()
+            with sqlite3.connect(fn) as conn:
+                cur = conn.cursor()
+                tables = set(get_table_list(cur))
+                self.assertEqual(tables, exp_tables)
+                res = cur.execute(
+                    "SELECT n FROM [10x_scrna_cell_qc_summary] "
+                    "WHERE metric = 'total_umis'"
+                ).fetchone()
+                self.assertEqual(res[0], 6)
+        finally:
+            cleanup_files(fn)
@@ -0,0 +1,114 @@
+"""Tests for `bio_qcmetrics_tool.commands.serve`"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from bio_qcmetrics_tool.commands.serve import ExportServer, UnixHTTPConnection
+from tests.utils import cleanup_files, get_table_list, get_test_data_path
+
+
+class TestExportServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.tmpdir, "qc.sock")
+        self.output = os.path.join(self.tmpdir, "out.db")
+        self.obj = ExportServer(options={"socket": self.socket, "workers": 2})
+        self.server = self.obj.make_server()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.obj.close(self.server)
+        cleanup_files(self.output)
+        os.rmdir(self.tmpdir)
+
+    def request(self, method, path, payload=None):
+        conn = UnixHTTPConnection(self.socket, timeout=30)
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            conn.request(method, path, body=body)
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read())
+        finally:
+            conn.close()
+
+    def flagstat_args(self, bam):
+        return [
+            "export",
+            "samtoolsflagstats",
+            "-i",
+            get_test_data_path("samtools.flagstat.log.txt"),
+            "-j",
+            "fakeuuid",
+            "-b",
+            bam,
+            "--export_format",
+            "sqlite",
+            "-o",
+            self.output,
+        ]
+
+    def test_health(self):
+        status, res = self.request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(res["status"], "ok")
+
+    def test_export(self):
+        results = []
+
+        def run(bam):
+            results.append(
+                self.request("POST", "/export", {"args": self.flagstat_args(bam)})
+            )
+
+        threads = [
+            threading.Thread(target=run, args=("fake{0}.bam".format(i),))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([i[0] for i in results], [200] * 4)
+        with sqlite3.connect(self.output) as conn:
+            cur = conn.cursor()
+            self.assertEqual(
+                set(get_table_list(cur)),
+                set(["samtools_flagstat", "sample_qc_summary"]),
+            )
+            res = cur.execute(
+                "SELECT COUNT(DISTINCT bam) FROM samtools_flagstat"
+            ).fetchone()
+            self.assertEqual(res[0], 4)
+
+    def test_journal(self):
+        args = self.flagstat_args("fake.bam") + ["--journal"]
+        status, _ = self.request("POST", "/export", {"args": args})
+        self.assertEqual(status, 200)
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM qc_journal").fetchone()
+        conn.close()
+        self.assertEqual(res, (1,))
+
+    def test_bad_request(self):
+        status, res = self.request("POST", "/export", {"args": ["nothing"]})
+        self.assertEqual(status, 400)
+        self.assertEqual(res["status"], "error")
+
+        status, res = self.request("POST", "/export", {"nothing": []})
+        self.assertEqual(status, 400)
+
+    def test_failed_export(self):
+        args = self.flagstat_args("fake.bam")
+        args[3] = get_test_data_path(
+            "SRR1067503_1.fastq.gz_bowtie_srtd.bam_dedup.bam_samtools_stats.txt"
+        )
+        status, res = self.request("POST", "/export", {"args": args[1:]})
+        self.assertEqual(status, 500)
+        self.assertTrue(res["error"].startswith("ParserException"))
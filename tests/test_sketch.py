@@ -0,0 +1,121 @@
+"""Tests for the cohort statistics of `bio_qcmetrics_tool.utils.sketch`"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from bio_qcmetrics_tool.modules.exceptions import ParserException
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from bio_qcmetrics_tool.utils import sketch
+from tests.utils import get_test_data_path
+
+
+class TestSketch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.values = np.random.default_rng(0).normal(50, 10, 20000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_merge(self):
+        whole = sketch.MetricSketch()
+        for chunk in np.array_split(self.values, 50):
+            whole.update(chunk)
+        merged = sketch.MetricSketch()
+        for chunk in np.array_split(self.values, 7):
+            part = sketch.MetricSketch()
+            part.update(chunk)
+            merged.merge(part)
+
+        for obj in (whole, merged):
+            self.assertEqual(obj.count, len(self.values))
+            self.assertAlmostEqual(obj.mean, self.values.mean())
+            self.assertAlmostEqual(obj.variance, self.values.var(ddof=1))
+            self.assertLess(len(obj.digest.means), 100)
+            for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+                self.assertAlmostEqual(
+                    obj.digest.quantile(q), np.quantile(self.values, q), delta=0.5
+                )
+            self.assertAlmostEqual(
+                obj.percentile(60), 100 * (self.values < 60).mean(), delta=0.5
+            )
+        self.assertEqual(whole.percentile(1000), 100)
+
+        restored = sketch.TDigest.from_json(merged.digest.to_json())
+        self.assertEqual(restored.quantile(0.5), merged.digest.quantile(0.5))
+        self.assertIsNone(sketch.MetricSketch().zscore(1))
+
+    def test_sqlite(self):
+        conn = sqlite3.connect(":memory:")
+        self.assertIsNone(sketch.describe_value(conn, "x", 1))
+        for chunk in np.array_split(self.values, 4):
+            sketch.update_sketches(conn, {"x": chunk, "y": [1.0, 2.0]})
+        res = sketch.describe_value(conn, "x", 60)
+        self.assertEqual(res["count"], len(self.values))
+        self.assertAlmostEqual(
+            res["zscore"], (60 - self.values.mean()) / self.values.std(ddof=1)
+        )
+        self.assertAlmostEqual(
+            res["percentile"], 100 * (self.values < 60).mean(), delta=0.5
+        )
+        self.assertEqual(sketch.get_sketch(conn, "y").count, 8)
+        conn.close()
+
+    def test_export(self):
+        output = os.path.join(self.tmpdir, "out.db")
+        for bam in ["a.bam", "b.bam", "c.bam"]:
+            opts = {
+                "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+                "export_format": "sqlite",
+                "output": output,
+                "bam": bam,
+                "job_uuid": "job",
+                "sketches": True,
+            }
+            ExportSamtoolsFlagstats(options=opts).do_work()
+        with sqlite3.connect(output) as conn:
+            rows = conn.execute(
+                "SELECT metric, count, mean, stddev FROM qc_metric_sketches"
+            ).fetchall()
+        conn.close()
+        self.assertTrue(rows)
+        metrics = dict((row[0], row[1:]) for row in rows)
+        self.assertNotIn("flagstat_job_uuid", metrics)
+        self.assertTrue(all(row[0] == 3 and row[2] == 0 for row in metrics.values()))
+
+    def test_export_again(self):
+        output = os.path.join(self.tmpdir, "out.db")
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "sqlite",
+            "output": output,
+            "bam": "a.bam",
+            "job_uuid": "job",
+            "sketches": True,
+        }
+        ExportSamtoolsFlagstats(options=dict(opts)).do_work()
+        ExportSamtoolsFlagstats(options=dict(opts)).do_work()
+        opts["job_uuid"] = "job2"
+        ExportSamtoolsFlagstats(options=dict(opts)).do_work()
+        with sqlite3.connect(output) as conn:
+            counts = conn.execute("SELECT count FROM qc_metric_sketches").fetchall()
+        conn.close()
+        self.assertTrue(counts)
+        self.assertTrue(all(row[0] == 2 for row in counts))
+
+    def test_requires_sqlite(self):
+        opts = {
+            "inputs": [get_test_data_path("samtools.flagstat.log.txt")],
+            "export_format": "jsonl",
+            "output": os.path.join(self.tmpdir, "out.jsonl"),
+            "bam": "a.bam",
+            "job_uuid": "job",
+            "sketches": True,
+        }
+        with self.assertRaises(ParserException):
+            ExportSamtoolsFlagstats(options=opts).do_work()
+        self.assertFalse(os.path.exists(opts["output"]))
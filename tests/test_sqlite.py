@@ -0,0 +1,156 @@
+"""Tests for the `bio_qcmetrics_tool.utils.sqlite` module."""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import pandas as pd
+
+from bio_qcmetrics_tool.utils.sqlite import (
+    SharedTransaction,
+    SqliteConnectionPool,
+    add_missing_columns,
+    ensure_indexes,
+    get_natural_key,
+    get_source_key,
+    summary_columns,
+    upsert_sample_summary,
+)
+
+
+class TestSqliteUtils(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmpdir, "test.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_source_key(self):
+        self.assertEqual(
+            get_source_key(["job_uuid", "bam", "star_file"]), ("job_uuid", "star_file")
+        )
+        self.assertEqual(get_source_key(["job_uuid", "bam"]), ("job_uuid", "bam"))
+        self.assertIsNone(get_source_key(["bam"]))
+
+    def test_get_natural_key(self):
+        cols = ["index", "job_uuid", "bam", "star_file", "strand", "category", "value"]
+        self.assertEqual(
+            get_natural_key("star_gene_counts", cols),
+            ["job_uuid", "star_file", "strand", "category"],
+        )
+        cols = ["job_uuid", "picard_metrics", "bam", "CYCLE", "colname", "value"]
+        self.assertEqual(
+            get_natural_key("picard_QualityByCycleMetrics_histogram", cols),
+            ["job_uuid", "picard_metrics", "colname"],
+        )
+
+    def test_ensure_indexes(self):
+        df = pd.DataFrame(
+            {
+                "job_uuid": ["a", "a"],
+                "fastq": ["x.fq", "x.fq"],
+                "fastqc_zip": ["x.zip", "x.zip"],
+                "Measure": ["m1", "m2"],
+            }
+        )
+        with sqlite3.connect(self.db) as conn:
+            df.to_sql("fastqc_data_Basic_Statistics", conn)
+            created = ensure_indexes(conn)
+            self.assertEqual(
+                created,
+                [
+                    "fastqc_data_Basic_Statistics_key",
+                    "fastqc_data_Basic_Statistics_fastq",
+                ],
+            )
+            self.assertEqual(ensure_indexes(conn), [])
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM fastqc_data_Basic_Statistics "
+                "WHERE fastq = 'x.fq'"
+            ).fetchall()
+            self.assertIn("fastqc_data_Basic_Statistics_fastq", str(plan))
+
+            # Upgrade to a unique natural key
+            created = ensure_indexes(conn, unique=True)
+            self.assertEqual(created, ["fastqc_data_Basic_Statistics_key"])
+            with self.assertRaises(sqlite3.IntegrityError):
+                conn.execute(
+                    "INSERT INTO fastqc_data_Basic_Statistics "
+                    "(job_uuid, fastqc_zip, Measure) VALUES ('a', 'x.zip', 'm1')"
+                )
+        conn.close()
+
+    def test_add_missing_columns(self):
+        with sqlite3.connect(self.db) as conn:
+            self.assertEqual(add_missing_columns(conn, "t", ["a"]), [])
+            conn.execute("CREATE TABLE t (a)")
+            self.assertEqual(add_missing_columns(conn, "t", ["a", "b"]), ["b"])
+        conn.close()
+
+    def test_upsert_sample_summary(self):
+        with sqlite3.connect(self.db) as conn:
+            upsert_sample_summary(conn, {"a.bam": {"x": 1}, "b.bam": {"x": 2}}, "j")
+            upsert_sample_summary(conn, {"a.bam": {"y": 3}}, "j")
+            upsert_sample_summary(conn, {"a.bam": {"x": 4}}, "j")
+            # Same bam name in another job
+            upsert_sample_summary(conn, {"a.bam": {"x": 5}}, "k")
+            res = conn.execute(
+                "SELECT job_uuid, bam, x, y FROM sample_qc_summary "
+                "ORDER BY job_uuid, bam"
+            ).fetchall()
+            self.assertEqual(
+                res,
+                [
+                    ("j", "a.bam", 4, 3),
+                    ("j", "b.bam", 2, None),
+                    ("k", "a.bam", 5, None),
+                ],
+            )
+            self.assertEqual(ensure_indexes(conn), [])
+        conn.close()
+
+    def test_summary_columns(self):
+        summary = {
+            "a.bam": {"n": 1, "pct": float("nan"), "mixed": "x", "none": None},
+            "b.bam": {"n": 2, "pct": 0.5, "mixed": 3},
+        }
+        self.assertEqual(
+            summary_columns(summary, lambda v: type(v).__name__, "str"),
+            {"mixed": "str", "n": "int", "none": None, "pct": "float"},
+        )
+        self.assertEqual(
+            summary_columns(summary),
+            {"mixed": None, "n": None, "none": None, "pct": None},
+        )
+
+    def test_connection_pool(self):
+        pool = SqliteConnectionPool()
+        with pool.connection(self.db) as conn:
+            conn.execute("CREATE TABLE t (a)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        with pool.connection(self.db) as conn2:
+            self.assertIs(conn, conn2)
+        pool.close()
+        with sqlite3.connect(self.db) as conn:
+            self.assertEqual(conn.execute("SELECT a FROM t").fetchall(), [(1,)])
+        conn.close()
+
+    def test_shared_transaction(self):
+        with SharedTransaction(self.db) as txn:
+            with txn.connection() as conn:
+                pd.DataFrame({"a": [1, 2]}).to_sql("t", conn)
+            with self.assertRaises(ValueError):
+                with txn.connection() as conn:
+                    pd.DataFrame({"a": [3]}).to_sql("t", conn, if_exists="append")
+                    raise ValueError("failed export")
+            # Nothing is visible before the batch commits
+            with sqlite3.connect(self.db) as other:
+                res = other.execute("SELECT name FROM sqlite_master").fetchall()
+                self.assertEqual(res, [])
+            other.close()
+
+        with sqlite3.connect(self.db) as conn:
+            self.assertEqual(conn.execute("SELECT a FROM t").fetchall(), [(1,), (2,)])
+        conn.close()
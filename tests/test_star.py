@@ -106,10 +106,10 @@ class TestExportStarStats(unittest.TestCase):
             "gene_counts_inputs": [icts],
             "export_format": "sqlite",
             "output": fn,
-            "bam": "fake.bam",
+            "bam": ["fake.bam"],
             "job_uuid": jid,
         }
-        exp_tables = set(["star_stats", "star_gene_counts"])
+        exp_tables = set(["star_stats", "star_gene_counts", "sample_qc_summary"])
         try:
             obj = ExportStarStats(options=opts)
             obj.do_work()
@@ -117,5 +117,10 @@ class TestExportStarStats(unittest.TestCase):
                 cur = conn.cursor()
                 tables = set(get_table_list(cur))
                 self.assertEqual(tables, exp_tables)
+                res = cur.execute(
+                    "SELECT bam, star_job_uuid, star_uniquely_mapped_percent "
+                    "FROM sample_qc_summary"
+                ).fetchall()
+                self.assertEqual(res, [("fake.bam", jid, 79.49)])
         finally:
             cleanup_files(fn)
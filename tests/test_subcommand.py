@@ -67,7 +67,10 @@ class TestExportQcModule(unittest.TestCase):
             return "DESCRIPTION"
 
     def test_exporters(self):
-        self.assertEqual(TestExportQcModule.Example.exporters(), ["sqlite"])
+        self.assertEqual(
+            TestExportQcModule.Example.exporters(),
+            ["sqlite", "jsonl", "postgres", "duckdb"],
+        )
 
     def test_add(self):
         parser = argparse.ArgumentParser()
@@ -88,3 +91,15 @@ class TestExportQcModule(unittest.TestCase):
             assert opts
 
         self.assertEqual(stderr.getvalue().rstrip("\r\n"), "")
+
+    def test_add_export_formats(self):
+        parser = argparse.ArgumentParser()
+        sp = parser.add_subparsers(dest="subcommand")
+        TestExportQcModule.Example.add(subparsers=sp)
+        opts = parser.parse_args(
+            ["example", "--export_format", "sqlite, jsonl,sqlite", "-o", "out"]
+        )
+        self.assertEqual(opts.export_format, "sqlite,jsonl")
+
+        with self.assertRaises(SystemExit), captured_output() as (_, _):
+            parser.parse_args(["example", "--export_format", "sqlite,csv", "-o", "x"])
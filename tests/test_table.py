@@ -0,0 +1,72 @@
+"""Tests for `bio_qcmetrics_tool.modules.table`"""
+import unittest
+
+import numpy as np
+
+from bio_qcmetrics_tool.modules.table import MetricTable
+
+
+class TestMetricTable(unittest.TestCase):
+    def test_from_rows(self):
+        table = MetricTable.from_rows(
+            "t", ["a", "b"], [[1, "x"], [2, "y"]], constants={"job_uuid": "j"}
+        )
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.column_names(), ["a", "b", "job_uuid"])
+        self.assertEqual(
+            list(table.rows()),
+            [{"a": 1, "b": "x", "job_uuid": "j"}, {"a": 2, "b": "y", "job_uuid": "j"}],
+        )
+        self.assertFalse(hasattr(table, "__dict__"))
+
+    def test_append_and_extend(self):
+        table = MetricTable("t", columns={"a": []})
+        table.append({"a": 1})
+        table.append({"b": 2})
+        self.assertEqual(table.columns, {"a": [1, None], "b": [None, 2]})
+        table.extend({"a": [3, 4], "b": [5, 6]})
+        self.assertEqual(len(table), 4)
+        with self.assertRaises(ValueError):
+            table.extend({"a": [7]})
+        with self.assertRaises(ValueError):
+            MetricTable("t", columns={"a": [1], "b": [1, 2]})
+
+    def test_to_frame(self):
+        table = MetricTable(
+            "t",
+            constants={"bam": "x.bam"},
+            columns={"a": ["1", "2"], "b": np.array([0.5, np.nan])},
+            dtypes={"a": "int64"},
+        )
+        df = table.to_frame()
+        self.assertEqual(list(df.columns), ["a", "b", "bam"])
+        self.assertEqual(df["a"].dtype, np.dtype("int64"))
+        self.assertEqual(list(df["bam"]), ["x.bam", "x.bam"])
+        self.assertTrue(np.isnan(df["b"][1]))
+
+    def test_to_wide(self):
+        table = MetricTable(
+            "t",
+            constants={"bam": "x.bam"},
+            columns={
+                "category": ["total", "%GC", "length"],
+                "passed": ["10", "45.5", "35-76"],
+                "failed": [1, 2, None],
+            },
+        )
+        wide = table.to_wide("t_wide", "category", {"passed": "{0}", "failed": "{0}_f"})
+        self.assertEqual(wide.name, "t_wide")
+        self.assertEqual(
+            list(wide.rows()),
+            [
+                {
+                    "total": 10,
+                    "total_f": 1,
+                    "%GC": 45.5,
+                    "%GC_f": 2,
+                    "length": "35-76",
+                    "length_f": None,
+                    "bam": "x.bam",
+                }
+            ],
+        )
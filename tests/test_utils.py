@@ -1,7 +1,7 @@
 """Tests for the `bio_qcmetrics_tool.utils.parse` module."""
 import unittest
 
-from bio_qcmetrics_tool.utils.parse import parse_type
+from bio_qcmetrics_tool.utils.parse import parse_json_records, parse_type
 
 
 class TestUtils(unittest.TestCase):
@@ -20,3 +20,13 @@ class TestUtils(unittest.TestCase):
 
         val = parse_type("abc")
         self.assertEqual("abc", val)
+
+    def test_parse_json_records(self):
+        res = parse_json_records('{"ID": "a"}')
+        self.assertEqual(res, [{"ID": "a"}])
+
+        res = parse_json_records(b'[{"ID": "a"}, {"ID": "b"}]')
+        self.assertEqual(res, [{"ID": "a"}, {"ID": "b"}])
+
+        res = parse_json_records(b'{"ID": "a"}\n\n{"ID": "b"}\n')
+        self.assertEqual(res, [{"ID": "a"}, {"ID": "b"}])
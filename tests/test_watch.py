@@ -0,0 +1,167 @@
+"""Tests for `bio_qcmetrics_tool.commands.watch`"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bio_qcmetrics_tool.commands.watch import WatchFolders, infer_bam, match_rule
+from bio_qcmetrics_tool.modules.picard import ExportPicardMetrics
+from bio_qcmetrics_tool.modules.samtools import ExportSamtoolsFlagstats
+from tests.utils import get_table_list, get_test_data_path
+
+
+class TestWatchFolders(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.watched = os.path.join(self.tmpdir, "watched")
+        self.output = os.path.join(self.tmpdir, "out.db")
+        os.makedirs(os.path.join(self.watched, "job1"))
+        os.makedirs(os.path.join(self.watched, "job2"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_obj(self):
+        return WatchFolders(
+            options={
+                "directory": [self.watched],
+                "output": self.output,
+                "settle": 0.0,
+                "interval": 0.0,
+                "once": True,
+            }
+        )
+
+    def test_infer_bam(self):
+        self.assertEqual(infer_bam("sample.bam.flagstat"), "sample.bam")
+        self.assertEqual(infer_bam("sampleLog.final.out"), "sample.bam")
+        self.assertEqual(infer_bam("sample.idxstats.txt"), "sample.bam")
+
+    def test_match_rule(self):
+        self.assertEqual(match_rule("x.flagstat.txt")[0], ExportSamtoolsFlagstats)
+        self.assertEqual(match_rule("x.rnaseq_metrics.txt")[0], ExportPicardMetrics)
+        for fname in [
+            "x.alignment_summary_metrics",
+            "x.metrics",
+            "x.bam.rnaseqmetrics.txt",
+        ]:
+            self.assertEqual(match_rule(fname)[0], ExportPicardMetrics)
+        self.assertIsNone(match_rule("x.bam"))
+        self.assertIsNone(match_rule("metrics_report.html"))
+        self.assertIsNone(match_rule("x.per_barcode_metrics.csv"))
+
+    def test_ingest(self):
+        shutil.copy(
+            get_test_data_path("samtools.flagstat.log.txt"),
+            os.path.join(self.watched, "job1", "a.bam.flagstat"),
+        )
+        shutil.copy(
+            get_test_data_path("CTC-1-AA-B2.star.bam.rnaseqmetrics.txt"),
+            os.path.join(self.watched, "job2", "b.bam.rnaseq_metrics.txt"),
+        )
+        # Ignored files
+        shutil.copy(
+            get_test_data_path("star.log.final.out"),
+            os.path.join(self.watched, "job1", ".hidden.flagstat"),
+        )
+        with open(os.path.join(self.watched, "job1", "a.bam"), "wt") as fh:
+            fh.write("not a metrics file")
+
+        obj = self.make_obj()
+        obj.do_work()
+
+        with sqlite3.connect(self.output) as conn:
+            cur = conn.cursor()
+            tables = set(get_table_list(cur))
+            self.assertIn("samtools_flagstat", tables)
+            self.assertIn("picard_RnaSeqMetrics", tables)
+            res = cur.execute(
+                "SELECT DISTINCT job_uuid, bam FROM samtools_flagstat"
+            ).fetchall()
+            self.assertEqual(res, [("job1", "a.bam")])
+            res = cur.execute(
+                "SELECT DISTINCT job_uuid, bam FROM picard_RnaSeqMetrics"
+            ).fetchall()
+            self.assertEqual(res, [("job2", "b.bam")])
+            nrows = cur.execute("SELECT COUNT(*) FROM samtools_flagstat").fetchone()
+
+        with open(self.output + ".watch.json", "rt") as fh:
+            state = json.load(fh)
+        self.assertEqual(len(state["ingested"]), 2)
+
+        # A second run does not ingest the same files again
+        obj = self.make_obj()
+        obj.do_work()
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT COUNT(*) FROM samtools_flagstat").fetchone()
+            self.assertEqual(res, nrows)
+
+    def test_ingest_failure(self):
+        shutil.copy(
+            get_test_data_path("samtools.flagstat.log.txt"),
+            os.path.join(self.watched, "job1", "a.bam.flagstat"),
+        )
+        shutil.copy(
+            get_test_data_path(
+                "SRR1067503_1.fastq.gz_bowtie_srtd.bam_dedup.bam_samtools_stats.txt"
+            ),
+            os.path.join(self.watched, "job2", "b.bam.flagstat"),
+        )
+        obj = self.make_obj()
+        obj.do_work()
+
+        self.assertEqual(len(obj.state["ingested"]), 1)
+        self.assertEqual(len(obj.state["failed"]), 1)
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT DISTINCT bam FROM samtools_flagstat").fetchall()
+            self.assertEqual(res, [("a.bam",)])
+
+    def test_poll_waits_for_settle(self):
+        path = os.path.join(self.watched, "job1", "a.bam.flagstat")
+        shutil.copy(get_test_data_path("samtools.flagstat.log.txt"), path)
+        obj = self.make_obj()
+        obj.options["settle"] = 3600.0
+        self.assertEqual(obj.poll(), [])
+
+        obj.options["settle"] = 0.0
+        with open(path, "at") as fh:
+            fh.write("\n")
+        # Changed since the previous scan
+        self.assertEqual(obj.poll(), [])
+        self.assertEqual(obj.poll(), [path])
+
+    def test_poll_waits_for_second_scan(self):
+        # An old modification time, as after `cp -p`, is not enough
+        path = os.path.join(self.watched, "job1", "a.bam.flagstat")
+        shutil.copy2(get_test_data_path("samtools.flagstat.log.txt"), path)
+        os.utime(path, (0, 0))
+        obj = self.make_obj()
+        self.assertEqual(obj.poll(), [])
+        with open(path, "at") as fh:
+            fh.write("\n")
+        os.utime(path, (0, 0))
+        self.assertEqual(obj.poll(), [])
+        self.assertEqual(obj.poll(), [path])
+
+    def test_ingest_removed_file(self):
+        kept = os.path.join(self.watched, "job1", "a.bam.flagstat")
+        removed = os.path.join(self.watched, "job2", "b.bam.flagstat")
+        for path in [kept, removed]:
+            shutil.copy(get_test_data_path("samtools.flagstat.log.txt"), path)
+        obj = self.make_obj()
+        obj.poll()
+        ready = obj.poll()
+        self.assertEqual(ready, [kept, removed])
+
+        # Rotated away between the scan and the ingest
+        os.remove(removed)
+        ingested, failed = obj.ingest(ready)
+
+        self.assertEqual(list(ingested), [kept])
+        self.assertEqual(list(failed), [removed])
+        self.assertIn(removed, obj.state["failed"])
+        with sqlite3.connect(self.output) as conn:
+            res = conn.execute("SELECT DISTINCT bam FROM samtools_flagstat").fetchall()
+            self.assertEqual(res, [("a.bam",)])